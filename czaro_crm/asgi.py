@@ -2,6 +2,10 @@
 ASGI config for czaro_crm project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with a single uvicorn process, ``uvicorn czaro_crm.asgi:application``.
+Live NEWS alerts on the department pages are only streamed under ASGI, and only
+reach the screens connected to the process that stored the score, so the
+application must not be spread over several worker processes.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -2,6 +2,8 @@ import os
 
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -53,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -62,6 +65,35 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Opt-in per-request instrumentation: Server-Timing headers with SQL, template and
+# total time, and JSON logs for a sample of requests and for suspected N+1 queries
+REQUEST_INSTRUMENTATION = os.environ.get("REQUEST_INSTRUMENTATION") == "1"
+REQUEST_INSTRUMENTATION_SAMPLE_RATE = float(
+    os.environ.get("REQUEST_INSTRUMENTATION_SAMPLE_RATE", "0.1")
+)
+# Runs of one statement within a request that are reported as an N+1 pattern
+REQUEST_INSTRUMENTATION_REPEAT_THRESHOLD = 5
+if REQUEST_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, "main.middleware.RequestInstrumentationMiddleware")
+
+# Bearer token Prometheus scrapes /metrics with; without one only admins can read it.
+# Metrics are kept in memory by the single process serving the application (NEWS
+# alerts need every screen on that process, see README), which is the scrape target.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "main.instrumentation": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
 ROOT_URLCONF = "czaro_crm.urls"
 
 TEMPLATES = [
@@ -86,12 +118,120 @@ WSGI_APPLICATION = "czaro_crm.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# "sqlite" for development, "sqlite-wal" for small single-node sites, "postgres" for
+# production (pip install -r requirements-postgres.txt). SQLite serializes writes, so
+# wards charting at the same time queue behind each other.
+DATABASE_PROFILE = os.environ.get("DATABASE_PROFILE", "sqlite")
+# How PostgreSQL connections are pooled: "none" keeps one persistent connection per
+# worker thread, "pgbouncer" connects through PgBouncer in transaction pooling mode
+DATABASE_POOLER = os.environ.get("DATABASE_POOLER", "none")
+
+if DATABASE_PROFILE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+elif DATABASE_PROFILE == "sqlite-wal":
+    DATABASES = {
+        "default": {
+            "ENGINE": "czaro_crm.sqlite",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                # Readers no longer wait for the writer and commits skip most fsyncs;
+                # writers wait up to five seconds for the lock; up to 256 MiB of the
+                # file is memory-mapped and 64 MiB of pages cached per connection
+                "init_command": (
+                    "PRAGMA journal_mode = WAL;"
+                    "PRAGMA busy_timeout = 5000;"
+                    "PRAGMA synchronous = NORMAL;"
+                    "PRAGMA mmap_size = 268435456;"
+                    "PRAGMA cache_size = -65536"
+                ),
+                # Write transactions queue for the lock up front
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
     }
+elif DATABASE_PROFILE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "czaro_crm"),
+            "USER": os.environ.get("POSTGRES_USER", "czaro_crm"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "127.0.0.1"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            # Connections are reused across requests for this many seconds and checked
+            # before reuse, so a restarted server or pooler costs one failed ping
+            "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"application_name": "czaro_crm", "connect_timeout": 5},
+        }
+    }
+    # The trigram lookups patient search filters with
+    INSTALLED_APPS.append("django.contrib.postgres")
+    if DATABASE_POOLER == "pgbouncer":
+        # Each transaction may run on a different server connection, which a named
+        # cursor cannot outlive. Without server-side cursors .iterator() fetches the
+        # whole result set at once, so hospitalization exports are held in memory whole;
+        # run large exports against a direct connection (DATABASE_POOLER=none).
+        DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+    elif DATABASE_POOLER != "none":
+        raise ImproperlyConfigured(f"Unknown DATABASE_POOLER {DATABASE_POOLER!r}.")
+else:
+    raise ImproperlyConfigured(f"Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}.")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# Ward dashboard cache: "locmem", "file" or "redis" (any Redis-compatible server).
+# Entries are invalidated when stays change, so in the file and Redis caches, which
+# every worker process shares, they never expire on their own. Each process has its
+# own locmem cache and never sees invalidations made by the others, so its entries
+# expire after DASHBOARD_CACHE_TIMEOUT seconds, the most a page can lag behind. Run
+# several worker processes with "file" (one host) or "redis".
+DASHBOARD_CACHE = os.environ.get("DASHBOARD_CACHE", "locmem")
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get("DASHBOARD_CACHE_TIMEOUT", "30"))
+DASHBOARD_CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "dashboard"),
+    "file": (
+        "django.core.cache.backends.filebased.FileBasedCache",
+        str(BASE_DIR / "cache" / "dashboard"),
+    ),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379/1"),
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "dashboard": {
+        "BACKEND": DASHBOARD_CACHE_BACKENDS[DASHBOARD_CACHE][0],
+        "LOCATION": os.environ.get(
+            "DASHBOARD_CACHE_LOCATION", DASHBOARD_CACHE_BACKENDS[DASHBOARD_CACHE][1]
+        ),
+        "TIMEOUT": DASHBOARD_CACHE_TIMEOUT if DASHBOARD_CACHE == "locmem" else None,
+    },
 }
+if DASHBOARD_CACHE != "redis":
+    # Room for the rendered chart sections of every hospitalization page in use
+    CACHES["dashboard"]["OPTIONS"] = {"MAX_ENTRIES": 10000}
+
+
+# Optional columnar history of vital signs: append-only chunks on local disk, one
+# directory per hospitalization. Disabled unless a directory is given.
+VITALS_STORE_PATH = os.environ.get("VITALS_STORE_PATH") or None
+
+
+# Patient search backend: "auto" uses pg_trgm on PostgreSQL and an in-process
+# n-gram index elsewhere, "memory" or "postgres" force one of them.
+PATIENT_SEARCH_BACKEND = os.environ.get("PATIENT_SEARCH_BACKEND", "auto")
+
+# Seconds between refreshes of the in-process index from rows modified elsewhere
+PATIENT_SEARCH_REFRESH_SECONDS = 30
 
 
 # Password validation
@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # SQLite with the two OPTIONS Django only gains in 5.1: "init_command", statements
+    # separated by semicolons that run on every new connection, and "transaction_mode",
+    # the mode transactions BEGIN in. IMMEDIATE takes the write lock when a transaction
+    # starts, so a transaction reading before it writes waits for the lock under
+    # busy_timeout instead of failing with "database is locked" when it upgrades.
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Not arguments of sqlite3.connect()
+        kwargs.pop("init_command", None)
+        kwargs.pop("transaction_mode", None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        init_command = self.settings_dict["OPTIONS"].get("init_command", "")
+        for statement in init_command.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        transaction_mode = self.settings_dict["OPTIONS"].get("transaction_mode")
+        if transaction_mode:
+            self.cursor().execute(f"BEGIN {transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
@@ -1,8 +1,15 @@
 from django.contrib import admin
 
-from .models import Consultation, Department, Hospitalization, Observation
+from .models import (
+    Consultation,
+    Department,
+    DepartmentCensus,
+    Hospitalization,
+    Observation,
+)
 
 admin.site.register(Consultation)
 admin.site.register(Department)
+admin.site.register(DepartmentCensus)
 admin.site.register(Hospitalization)
 admin.site.register(Observation)
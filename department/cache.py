@@ -0,0 +1,149 @@
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import DepartmentCensus
+from .services import (
+    achart_versions,
+    admitted_stays,
+    aload_chart_section,
+    current_census,
+)
+
+CACHE_ALIAS = "dashboard"
+# Superseded fragment and roster versions are never read again, so they are left to
+# expire
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+ROSTER_TIMEOUT = 24 * 60 * 60
+
+
+class CacheStats:
+    # Hit, miss and invalidation counters of this process
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def record(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+stats = CacheStats()
+fragment_stats = CacheStats()
+
+
+def version_key(department_id):
+    return f"department:{department_id}:version"
+
+
+def roster_key(department_id, version):
+    return f"department:{department_id}:roster:{version}"
+
+
+async def _acurrent_version(cache, department_id):
+    # Rosters are stored under the department's current version, so invalidating a
+    # department is a single write and a roster loaded before a write is never served.
+    version = await cache.aget(version_key(department_id))
+    if version is None:
+        await cache.aadd(version_key(department_id), time.time_ns())
+        version = await cache.aget(version_key(department_id))
+    return version
+
+
+async def adepartment_roster(department_id):
+    # The admitted stays and the census of a department, from the cache while no stay
+    # of the department changed. Returns (stays, census).
+    cache = caches[CACHE_ALIAS]
+    key = roster_key(department_id, await _acurrent_version(cache, department_id))
+    roster = await cache.aget(key)
+    if roster is None:
+        stats.record("misses")
+        stays = [stay async for stay in admitted_stays(department_id)]
+        census = await DepartmentCensus.objects.filter(
+            department_id=department_id
+        ).afirst()
+        roster = (stays, census)
+        # A per-process cache expires entries sooner, as it misses other processes'
+        # invalidations
+        timeout = min(ROSTER_TIMEOUT, cache.default_timeout or ROSTER_TIMEOUT)
+        await cache.aset(key, roster, timeout)
+    else:
+        stats.record("hits")
+    stays, census = roster
+    # The daily counters roll over at midnight whether or not the entry changed
+    return stays, current_census(census, department_id)
+
+
+def invalidate_departments(*department_ids):
+    # Moves the departments to a new cache version once the current transaction commits
+    department_ids = {
+        department_id for department_id in department_ids if department_id
+    }
+
+    def invalidate():
+        version = time.time_ns()
+        caches[CACHE_ALIAS].set_many(
+            {version_key(department_id): version for department_id in department_ids}
+        )
+        stats.record("invalidations", len(department_ids))
+
+    transaction.on_commit(invalidate)
+
+
+def chart_fragment_key(hospitalization_id, section, version, user_id):
+    # Fragments show edit links only to the authors of entries, so they vary by user
+    return make_template_fragment_key(
+        f"chart:{section}", [hospitalization_id, version, user_id]
+    )
+
+
+async def achart_fragments(hospitalization, user):
+    # The rendered charting sections of a hospitalization, keyed by section name.
+    # Each section is cached under its current version, so after an entry is added or
+    # edited only that section is loaded and rendered again.
+    cache = caches[CACHE_ALIAS]
+    versions = await achart_versions(hospitalization.id)
+    keys = {
+        name: chart_fragment_key(hospitalization.id, name, version, user.id)
+        for name, version in versions.items()
+    }
+    cached = await cache.aget_many(keys.values())
+    fragments = {}
+    rendered = {}
+    for name, key in keys.items():
+        if key in cached:
+            fragment_stats.record("hits")
+            fragments[name] = mark_safe(cached[key])
+            continue
+        fragment_stats.record("misses")
+        entries = await aload_chart_section(hospitalization, name)
+        fragments[name] = render_to_string(
+            f"chart/{name}.html",
+            {"hospitalization": hospitalization, "user": user, name: entries},
+        )
+        rendered[key] = str(fragments[name])
+    if rendered:
+        await cache.aset_many(rendered, FRAGMENT_TIMEOUT)
+    return fragments
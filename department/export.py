@@ -0,0 +1,161 @@
+import csv
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.utils.timezone import make_aware
+
+from .models import Hospitalization
+from .services import CHART_SECTIONS
+
+# Rows fetched from the database at a time and lines sent to the client at a time
+EXPORT_CHUNK_SIZE = 2000
+LINES_PER_WRITE = 500
+PATIENT_FIELDS = (
+    "first_name",
+    "last_name",
+    "date_of_birth",
+    "contact_number",
+    "is_insured",
+    "insurance",
+    "country",
+    "city",
+    "street",
+    "zip_code",
+)
+
+
+def _attnames(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+# Columns of every record type besides the model's own, in export order
+STAY_EXPRESSIONS = {
+    **{f"patient_{name}": F(f"patient__{name}") for name in PATIENT_FIELDS},
+    "department_name": F("department__name"),
+}
+SECTION_EXPRESSIONS = {"created_by_email": F("created_by__email")}
+
+
+def stays_between(first_day, last_day):
+    # Stays that overlap the days from first_day to last_day inclusive
+    start = make_aware(datetime.datetime.combine(first_day, datetime.time.min))
+    end = make_aware(
+        datetime.datetime.combine(
+            last_day + datetime.timedelta(days=1), datetime.time.min
+        )
+    )
+    return Hospitalization.objects.filter(
+        Q(discharged_on__isnull=True) | Q(discharged_on__gte=start),
+        admitted_on__lt=end,
+    )
+
+
+def export_queries(stays):
+    # (record type, rows) for the stays, then for every charting entry of them
+    yield "hospitalization", stays.order_by("admitted_on", "id").values(
+        *_attnames(Hospitalization), **STAY_EXPRESSIONS
+    )
+    stay_ids = stays.values("id")
+    for name, model in CHART_SECTIONS:
+        yield name, (
+            model.objects.filter(hospitalization__in=stay_ids)
+            .order_by("hospitalization_id", "created_at")
+            .values(*_attnames(model), **SECTION_EXPRESSIONS)
+        )
+
+
+def export_records(stays):
+    # Yields (record type, row) of the export. Each table is read with a chunked cursor,
+    # so memory does not grow with the export, except where server-side cursors are
+    # disabled (see DISABLE_SERVER_SIDE_CURSORS in the settings).
+    for record, rows in export_queries(stays):
+        for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield record, row
+
+
+async def aexport_records(stays):
+    # Async counterpart of export_records, for exports served by ASGI
+    for record, rows in export_queries(stays):
+        async for row in rows.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield record, row
+
+
+def ndjson_line(record, row):
+    return json.dumps({"record": record, **row}, cls=DjangoJSONEncoder) + "\n"
+
+
+class Line:
+    # A file-like target that hands back what csv.writer writes to it
+    def write(self, value):
+        return value
+
+
+def csv_columns():
+    # Every column of every record type once; a record leaves the others empty
+    columns = ["record", *_attnames(Hospitalization), *STAY_EXPRESSIONS]
+    for _, model in CHART_SECTIONS:
+        columns.extend(_attnames(model))
+    columns.extend(SECTION_EXPRESSIONS)
+    return list(dict.fromkeys(columns))
+
+
+def csv_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class ExportWriter:
+    # Formats records as lines of the export and groups them into writes of
+    # LINES_PER_WRITE records each
+
+    def __init__(self, export_format):
+        self.export_format = export_format
+        self.lines = []
+        if export_format == "csv":
+            self.csv = csv.DictWriter(Line(), fieldnames=csv_columns())
+            self.lines.append(self.csv.writeheader())
+
+    def add(self, record, row):
+        # Returns the text of a write once enough lines are waiting, otherwise None
+        if self.export_format == "csv":
+            row = {key: csv_value(value) for key, value in row.items()}
+            self.lines.append(self.csv.writerow({"record": record, **row}))
+        else:
+            self.lines.append(ndjson_line(record, row))
+        if len(self.lines) >= LINES_PER_WRITE:
+            return self.flush()
+        return None
+
+    def flush(self):
+        text = "".join(self.lines)
+        self.lines = []
+        return text
+
+
+def export_stream(stays, export_format):
+    # The export as text chunks, for WSGI servers, which iterate responses synchronously
+    writer = ExportWriter(export_format)
+    for record, row in export_records(stays):
+        if (text := writer.add(record, row)) is not None:
+            yield text
+    if text := writer.flush():
+        yield text
+
+
+async def aexport_stream(stays, export_format):
+    # The export as text chunks, for ASGI servers
+    writer = ExportWriter(export_format)
+    async for record, row in aexport_records(stays):
+        if (text := writer.add(record, row)) is not None:
+            yield text
+    if text := writer.flush():
+        yield text
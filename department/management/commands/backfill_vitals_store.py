@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from department.models import VitalSigns
+from department.timeseries import MEASUREMENTS, VitalSignsStore, get_store
+
+
+class Command(BaseCommand):
+    help = "Copies the vital signs table into the columnar vital signs store."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--path", help="Store directory; defaults to the VITALS_STORE_PATH setting."
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Remove the stored history first instead of appending to it.",
+        )
+
+    def handle(self, *args, **options):
+        store = VitalSignsStore(options["path"]) if options["path"] else get_store()
+        if store is None:
+            raise CommandError("Set VITALS_STORE_PATH or pass --path.")
+        if options["rebuild"]:
+            store.clear()
+
+        readings = (
+            VitalSigns.objects.order_by("hospitalization_id", "created_at")
+            .only("id", "hospitalization_id", "created_at", *MEASUREMENTS)
+            .iterator(chunk_size=options["batch_size"])
+        )
+        copied = 0
+        batch = []
+        for vital in readings:
+            batch.append(vital)
+            if len(batch) == options["batch_size"]:
+                copied += store.append(batch)
+                batch = []
+        copied += store.append(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Copied {copied} vital signs readings to {store.root}.")
+        )
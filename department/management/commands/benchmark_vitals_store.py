@@ -0,0 +1,167 @@
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from department.models import Department, Hospitalization, VitalSigns
+from department.timeseries import MEASUREMENTS, VitalSignsStore
+from main.models import User
+from patient.models import Patient
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares insert throughput and range-scan latency of the vital signs table "
+        "and the columnar vital signs store on synthetic readings. Nothing is kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readings", type=int, default=100000)
+        parser.add_argument("--stays", type=int, default=20)
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Readings per insert."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Scans of every range per stay."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        batch_size, repeat = options["batch_size"], options["repeat"]
+        with transaction.atomic():
+            stays = self.create_stays(options["stays"])
+            readings = self.synthetic_readings(
+                stays, options["readings"], np.random.default_rng(options["seed"])
+            )
+            table_inserts = self.insert(
+                VitalSigns.objects.bulk_create, readings, batch_size
+            )
+            # bulk_create stamped created_at, so both engines scan the same windows
+            windows = self.windows(readings, stays)
+            table_scans = self.scan_latencies(self.scan_table, windows, repeat)
+            # Only the measurements are wanted, not the rows
+            transaction.set_rollback(True)
+
+        with tempfile.TemporaryDirectory() as root:
+            store = VitalSignsStore(root)
+            store_inserts = self.insert(store.append, readings, batch_size)
+            store_scans = self.scan_latencies(
+                # The store reads half-open ranges
+                lambda stay_id, start, end: store.read(
+                    stay_id, start, end + timedelta(microseconds=1)
+                ),
+                windows,
+                repeat,
+            )
+            size = sum(
+                path.stat().st_size for path in store.root.rglob("*") if path.is_file()
+            )
+
+        self.stdout.write(
+            f"{len(readings)} readings over {len(stays)} stays, "
+            f"inserted in batches of {batch_size}"
+        )
+        for name, inserts, scans in (
+            ("table", table_inserts, table_scans),
+            ("store", store_inserts, store_scans),
+        ):
+            self.stdout.write(
+                f"{name}: {inserts:.0f} readings/s inserted, "
+                f"whole stay p50 {scans['whole_stay']:.2f} ms, "
+                f"half stay p50 {scans['half_stay']:.2f} ms"
+            )
+        self.stdout.write(f"store size: {size / len(readings):.1f} bytes per reading")
+
+    def create_stays(self, count):
+        user = User.objects.create_user(
+            email="vitals-benchmark@example.com",
+            password=None,
+            first_name="Vitals",
+            last_name="Benchmark",
+            profession="nurses",
+        )
+        department = Department.objects.create(
+            name="Vitals Benchmark", description="Benchmark", created_by=user
+        )
+        stays = []
+        for number in range(count):
+            patient = Patient.objects.create(
+                first_name="Patient",
+                last_name=str(number),
+                date_of_birth=date(1970, 1, 1),
+                contact_number="000000000",
+                insurance=str(number),
+                country="Country",
+                city="City",
+                street="Street",
+                zip_code="00-000",
+                created_by=user,
+            )
+            stays.append(
+                Hospitalization.objects.create(
+                    patient=patient, department=department, main_symptom="Benchmark"
+                )
+            )
+        return stays
+
+    def synthetic_readings(self, stays, count, rng):
+        user = stays[0].department.created_by
+        stay_rows = rng.integers(0, len(stays), count)
+        values = {
+            "respiratory_rate": rng.integers(8, 30, count),
+            "oxygen_saturation": rng.integers(85, 101, count),
+            "systolic_blood_pressure": rng.integers(80, 200, count),
+            "diastolic_blood_pressure": rng.integers(40, 120, count),
+            "heart_rate": rng.integers(40, 160, count),
+            "temperature": np.round(rng.uniform(35, 40, count), 1),
+        }
+        return [
+            VitalSigns(
+                hospitalization=stays[stay_rows[row]],
+                created_by=user,
+                **{field: column[row].item() for field, column in values.items()},
+            )
+            for row in range(count)
+        ]
+
+    def windows(self, readings, stays):
+        # The whole stay and its middle half, from the timestamps of the inserted readings
+        times = {stay.id: [] for stay in stays}
+        for vital in readings:
+            times[vital.hospitalization_id].append(vital.created_at)
+        windows = {}
+        for stay_id, stamps in times.items():
+            stamps.sort()
+            windows[stay_id] = {
+                "whole_stay": (stamps[0], stamps[-1]),
+                "half_stay": (stamps[len(stamps) // 4], stamps[3 * len(stamps) // 4]),
+            }
+        return windows
+
+    def scan_latencies(self, scan, windows, repeat):
+        latencies = {"whole_stay": [], "half_stay": []}
+        for stay_id, ranges in windows.items():
+            for name, (start, end) in ranges.items():
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    scan(stay_id, start, end)
+                    latencies[name].append((time.perf_counter() - started) * 1000)
+        return {name: statistics.median(values) for name, values in latencies.items()}
+
+    def insert(self, write, readings, batch_size):
+        # Readings written per second
+        started = time.perf_counter()
+        for start in range(0, len(readings), batch_size):
+            write(readings[start : start + batch_size])
+        return len(readings) / (time.perf_counter() - started)
+
+    def scan_table(self, stay_id, start, end):
+        return list(
+            VitalSigns.objects.filter(
+                hospitalization_id=stay_id, created_at__gte=start, created_at__lte=end
+            ).values_list("created_at", *MEASUREMENTS)
+        )
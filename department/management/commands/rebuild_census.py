@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from department.services import (
+    admission_history_drift,
+    census_drift,
+    rebuild_admission_history,
+    rebuild_census,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the materialized department census and the admission history of "
+        "patients from hospitalizations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the stored census with the hospitalizations and fail on drift.",
+        )
+
+    def handle(self, *args, **options):
+        drift = census_drift() if options["verify"] else rebuild_census()
+        patients = (
+            admission_history_drift()
+            if options["verify"]
+            else rebuild_admission_history()
+        )
+
+        for department, differences in drift.items():
+            if not differences:
+                self.stdout.write(f"{department}: census row missing")
+            for field, (stored, actual) in differences.items():
+                self.stdout.write(f"{department}: {field} stored {stored}, actual {actual}")
+
+        for patient in patients:
+            self.stdout.write(f"{patient}: admission history out of date")
+
+        if options["verify"]:
+            if drift or patients:
+                raise CommandError(
+                    f"Census drifted in {len(drift)} department(s), admission history "
+                    f"in {len(patients)} patient(s)."
+                )
+            self.stdout.write(self.style.SUCCESS("Census is consistent."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Census rebuilt, {len(drift)} department(s) and "
+                    f"{len(patients)} patient(s) corrected."
+                )
+            )
@@ -0,0 +1,59 @@
+# Generated by Django 5.0 on 2026-10-18 09:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_census(apps, schema_editor):
+    # Seeds the census of every existing department from its hospitalizations
+    Department = apps.get_model("department", "Department")
+    DepartmentCensus = apps.get_model("department", "DepartmentCensus")
+    Hospitalization = apps.get_model("department", "Hospitalization")
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    censuses = []
+    for department in Department.objects.all():
+        stays = Hospitalization.objects.filter(department=department)
+        censuses.append(
+            DepartmentCensus(
+                department=department,
+                census_date=today.date(),
+                admitted=stays.filter(is_discharged=False).count(),
+                admitted_today=stays.filter(admitted_on__gte=today).count(),
+                discharged_today=stays.filter(
+                    is_discharged=True, discharged_on__gte=today
+                ).count(),
+            )
+        )
+    DepartmentCensus.objects.bulk_create(censuses)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0004_alter_hospitalization_discharged_on"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DepartmentCensus",
+            fields=[
+                (
+                    "department",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="census",
+                        serialize=False,
+                        to="department.department",
+                    ),
+                ),
+                ("census_date", models.DateField()),
+                ("admitted", models.PositiveIntegerField(default=0)),
+                ("admitted_today", models.PositiveIntegerField(default=0)),
+                ("discharged_today", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_census, migrations.RunPython.noop),
+    ]
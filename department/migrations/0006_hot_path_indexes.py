@@ -0,0 +1,61 @@
+# Generated by Django 5.0 on 2026-10-18 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0005_departmentcensus"),
+        ("patient", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["hospitalization", "-created_at"], name="consultation_chart_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hospitalization",
+            index=models.Index(
+                fields=["department", "is_discharged"],
+                name="hosp_department_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hospitalization",
+            index=models.Index(
+                fields=["patient", "is_discharged"], name="hosp_patient_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hospitalization",
+            index=models.Index(
+                fields=["patient", "-admitted_on"], name="hosp_patient_stays_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hospitalization",
+            index=models.Index(
+                condition=models.Q(("is_discharged", False)),
+                fields=["department", "-admitted_on"],
+                name="hosp_ongoing_roster_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="observation",
+            index=models.Index(
+                fields=["hospitalization", "-created_at"], name="observation_chart_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vitalsigns",
+            index=models.Index(
+                fields=["hospitalization", "-created_at"], name="vitals_chart_idx"
+            ),
+        ),
+    ]
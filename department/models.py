@@ -38,6 +38,24 @@ class Hospitalization(models.Model):
 
     class Meta:
         ordering = ("-admitted_on",)
+        indexes = [
+            models.Index(
+                fields=["department", "is_discharged"], name="hosp_department_status_idx"
+            ),
+            models.Index(
+                fields=["patient", "is_discharged"], name="hosp_patient_status_idx"
+            ),
+            # Stays of a patient in display order
+            models.Index(
+                fields=["patient", "-admitted_on"], name="hosp_patient_stays_idx"
+            ),
+            # Admitted roster of a department, already in display order
+            models.Index(
+                fields=["department", "-admitted_on"],
+                name="hosp_ongoing_roster_idx",
+                condition=models.Q(is_discharged=False),
+            ),
+        ]
 
 
 class Consultation(models.Model):
@@ -55,6 +73,11 @@ class Consultation(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["hospitalization", "-created_at"], name="consultation_chart_idx"
+            ),
+        ]
 
 
 class Observation(models.Model):
@@ -71,6 +94,11 @@ class Observation(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["hospitalization", "-created_at"], name="observation_chart_idx"
+            ),
+        ]
 
 
 class VitalSigns(models.Model):
@@ -105,4 +133,23 @@ class VitalSigns(models.Model):
         return f"{self.created_by} - {self.created_at}"
 
     class Meta:
-        ordering = ("-created_at",)
\ No newline at end of file
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["hospitalization", "-created_at"], name="vitals_chart_idx"
+            ),
+        ]
+
+class DepartmentCensus(models.Model):
+    department = models.OneToOneField(
+        Department, primary_key=True, related_name="census", on_delete=models.CASCADE
+    )
+    census_date = models.DateField()
+    admitted = models.PositiveIntegerField(default=0)
+    admitted_today = models.PositiveIntegerField(default=0)
+    discharged_today = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        # String representation of the Department Census record
+        return f"{self.department} - {self.admitted} admitted"
@@ -0,0 +1,567 @@
+import heapq
+import json
+import uuid
+from collections import namedtuple
+from functools import partial
+from operator import attrgetter
+
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .forms import VitalSignsForm
+from .models import (
+    Consultation,
+    Department,
+    DepartmentCensus,
+    Hospitalization,
+    Observation,
+    VitalSigns,
+)
+from . import timeseries
+from main import metrics
+from patient.models import Patient
+from scales import alerts, news
+from scales.models import (
+    BodyMassIndex,
+    GlasgowComaScale,
+    NewsScale,
+    NortonScale,
+    PainScale,
+)
+
+VITAL_SIGNS_BATCH_LIMIT = 5000
+# NEWS inputs that monitors do not measure and their values when no NEWS was entered yet
+CARRIED_FORWARD_NEWS_FIELDS = {
+    "is_on_oxygen": False,
+    "aecopd_state": False,
+    "level_of_consciousness": "awake",
+}
+
+# Charting tables shown on the hospitalization page, keyed by their template context name
+CHART_SECTIONS = (
+    ("consultations", Consultation),
+    ("observations", Observation),
+    ("vitals", VitalSigns),
+    ("pain_scales", PainScale),
+    ("bmis", BodyMassIndex),
+    ("norton_scales", NortonScale),
+    ("glasgow_scales", GlasgowComaScale),
+    ("news_scales", NewsScale),
+)
+
+TimelineEntry = namedtuple("TimelineEntry", ["kind", "created_at", "entry"])
+
+
+class HospitalizationChart:
+    # Everything charted during a single hospitalization, grouped by section.
+
+    def __init__(self, hospitalization, sections):
+        self.hospitalization = hospitalization
+        self.sections = sections
+
+    def __getitem__(self, name):
+        return self.sections[name]
+
+    @cached_property
+    def timeline(self):
+        # Merges the already ordered sections into one newest-first list of TimelineEntry
+        streams = [
+            [TimelineEntry(name, entry.created_at, entry) for entry in entries]
+            for name, entries in self.sections.items()
+        ]
+        return list(heapq.merge(*streams, key=attrgetter("created_at"), reverse=True))
+
+
+def chart_queryset(model, hospitalization_id):
+    # Entries of one charting table for a hospitalization, newest first, with their authors
+    return model.objects.filter(hospitalization_id=hospitalization_id).select_related(
+        "created_by"
+    )
+
+
+def admitted_stays(department_id):
+    # Ongoing stays of a department, newest admission first, with their patients
+    return Hospitalization.objects.filter(
+        department_id=department_id, is_discharged=False
+    ).select_related("patient")
+
+
+def load_hospitalization_chart(hospitalization_id):
+    # Loads a hospitalization with its patient, department and every charting table.
+    # Costs one query for the hospitalization plus one per charting table, whatever the chart size.
+    hospitalization = get_object_or_404(
+        Hospitalization.objects.select_related("patient", "department"),
+        id=hospitalization_id,
+    )
+    sections = {}
+    for name, model in CHART_SECTIONS:
+        sections[name] = _chart_entries(
+            hospitalization, list(chart_queryset(model, hospitalization.id))
+        )
+    return HospitalizationChart(hospitalization, sections)
+
+
+async def aload_hospitalization(hospitalization_id):
+    return await aget_object_or_404(
+        Hospitalization.objects.select_related("patient", "department"),
+        id=hospitalization_id,
+    )
+
+
+async def aload_chart_section(hospitalization, name):
+    # Entries of one charting section, loaded on their own for fragment caching
+    model = dict(CHART_SECTIONS)[name]
+    entries = [entry async for entry in chart_queryset(model, hospitalization.id)]
+    return _chart_entries(hospitalization, entries)
+
+
+async def aload_hospitalization_chart(hospitalization_id):
+    # Async counterpart of load_hospitalization_chart, for views served by ASGI
+    hospitalization = await aload_hospitalization(hospitalization_id)
+    sections = {}
+    for name, _ in CHART_SECTIONS:
+        sections[name] = await aload_chart_section(hospitalization, name)
+    return HospitalizationChart(hospitalization, sections)
+
+
+def chart_versions(hospitalization_id):
+    # The number of entries and the latest modification of every charting section, in
+    # one query
+    first, *rest = [
+        model.objects.filter(hospitalization_id=hospitalization_id)
+        .annotate(section=Value(name))
+        .order_by()
+        .values("section")
+        .annotate(entries=Count("id"), latest=Max("modified_at"))
+        for name, model in CHART_SECTIONS
+    ]
+    return first.union(*rest, all=True)
+
+
+async def achart_versions(hospitalization_id):
+    # A version of every charting section that changes whenever an entry of the
+    # section is added, edited or removed
+    versions = {name: "0" for name, _ in CHART_SECTIONS}
+    async for row in chart_versions(hospitalization_id):
+        versions[row["section"]] = f"{row['entries']}:{row['latest']}"
+    return versions
+
+
+def _chart_entries(hospitalization, entries):
+    for entry in entries:
+        # Reuse the loaded hospitalization instead of lazily fetching it per row
+        entry.hospitalization = hospitalization
+    return entries
+
+
+def start_of_today():
+    # Midnight of the current day in the project time zone
+    return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def department_census():
+    # Returns every department annotated with its occupancy, computed in one grouped query.
+    today = start_of_today()
+    length_of_stay = ExpressionWrapper(
+        F("hospitalization__discharged_on") - F("hospitalization__admitted_on"),
+        output_field=DurationField(),
+    )
+    return Department.objects.annotate(
+        admitted=Count(
+            "hospitalization", filter=Q(hospitalization__is_discharged=False)
+        ),
+        admitted_today=Count(
+            "hospitalization", filter=Q(hospitalization__admitted_on__gte=today)
+        ),
+        discharged_today=Count(
+            "hospitalization",
+            filter=Q(
+                hospitalization__is_discharged=True,
+                hospitalization__discharged_on__gte=today,
+            ),
+        ),
+        mean_length_of_stay=Avg(
+            length_of_stay, filter=Q(hospitalization__is_discharged=True)
+        ),
+    ).order_by("name")
+
+
+def duration_in_hours(duration):
+    # Converts an optional timedelta into hours rounded to one decimal place
+    if duration is None:
+        return None
+    return round(duration.total_seconds() / 3600, 1)
+
+
+def _locked_census(department_id):
+    # Locks the census row of a department, rolling the daily counters over at midnight.
+    # Must be called inside a transaction.
+    today = timezone.localdate()
+    census, _ = DepartmentCensus.objects.select_for_update().get_or_create(
+        department_id=department_id, defaults={"census_date": today}
+    )
+    census = _current(census, today)
+    census.census_date = today
+    return census
+
+
+def _is_today(value):
+    # Checks whether a (possibly naive) datetime falls on or after today's midnight
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value >= start_of_today()
+
+
+@transaction.atomic
+def record_admission(hospitalization):
+    # Counts a new stay in the census of its department.
+    census = _locked_census(hospitalization.department_id)
+    census.admitted += 1
+    census.admitted_today += 1
+    census.save()
+    record_admission_history(hospitalization.patient_id)
+    transaction.on_commit(
+        partial(metrics.admissions.inc, department_id=hospitalization.department_id)
+    )
+
+
+@transaction.atomic
+def record_transfer(hospitalization, from_department_id):
+    # Moves an ongoing stay from one department census to another.
+    to_department_id = hospitalization.department_id
+    if hospitalization.is_discharged or from_department_id == to_department_id:
+        return
+    # Lock both rows in a stable order so concurrent transfers cannot deadlock
+    censuses = {
+        department_id: _locked_census(department_id)
+        for department_id in sorted([from_department_id, to_department_id])
+    }
+    admitted_today = _is_today(hospitalization.admitted_on)
+    source, target = censuses[from_department_id], censuses[to_department_id]
+    source.admitted = max(source.admitted - 1, 0)
+    target.admitted += 1
+    if admitted_today:
+        source.admitted_today = max(source.admitted_today - 1, 0)
+        target.admitted_today += 1
+    source.save()
+    target.save()
+
+
+@transaction.atomic
+def record_discharge(hospitalization):
+    # Removes a freshly discharged stay from the census of its department.
+    census = _locked_census(hospitalization.department_id)
+    census.admitted = max(census.admitted - 1, 0)
+    if _is_today(hospitalization.discharged_on):
+        census.discharged_today += 1
+    census.save()
+    record_admission_history(hospitalization.patient_id)
+    transaction.on_commit(
+        partial(metrics.discharges.inc, department_id=hospitalization.department_id)
+    )
+
+
+@transaction.atomic
+def record_removal(hospitalizations):
+    # Removes deleted ongoing stays from the census of their departments.
+    for hospitalization in hospitalizations:
+        if not hospitalization.is_discharged:
+            census = _locked_census(hospitalization.department_id)
+            census.admitted = max(census.admitted - 1, 0)
+            census.save()
+
+
+# The admission history of a patient never admitted
+NO_ADMISSION_HISTORY = {
+    "ongoing_admissions": False,
+    "discharged_admissions": 0,
+    "total_admissions": 0,
+    "latest_discharge_date": None,
+}
+
+
+def _admission_histories(stays):
+    # The admission history of every patient owning one of the stays, by patient id
+    histories = (
+        stays.order_by()
+        .values("patient_id")
+        .annotate(
+            ongoing=Count("id", filter=Q(is_discharged=False)),
+            discharged=Count("id", filter=Q(is_discharged=True)),
+            total=Count("id"),
+            latest=Max("discharged_on", filter=Q(is_discharged=True)),
+        )
+    )
+    return {
+        history["patient_id"]: {
+            "ongoing_admissions": history["ongoing"] > 0,
+            "discharged_admissions": history["discharged"],
+            "total_admissions": history["total"],
+            "latest_discharge_date": history["latest"],
+        }
+        for history in histories
+    }
+
+
+@transaction.atomic
+def record_admission_history(patient_id):
+    # Rewrites the registry sort keys of a patient from their stays, a handful of rows
+    # read through hosp_patient_status_idx. The patient row is locked first so
+    # concurrent admissions of one patient are counted in turn.
+    list(Patient.objects.select_for_update().filter(id=patient_id).values_list("id"))
+    history = _admission_histories(
+        Hospitalization.objects.filter(patient_id=patient_id)
+    ).get(patient_id, NO_ADMISSION_HISTORY)
+    Patient.objects.filter(id=patient_id).update(**history)
+
+
+def admission_history_drift():
+    # Patients whose stored admission history differs from their stays, with the
+    # history their stays give
+    histories = _admission_histories(Hospitalization.objects.all())
+    drift = []
+    for patient in Patient.objects.only(*NO_ADMISSION_HISTORY).iterator(
+        chunk_size=2000
+    ):
+        history = histories.get(patient.id, NO_ADMISSION_HISTORY)
+        if any(getattr(patient, field) != value for field, value in history.items()):
+            for field, value in history.items():
+                setattr(patient, field, value)
+            drift.append(patient)
+    return drift
+
+
+@transaction.atomic
+def rebuild_admission_history():
+    # Rewrites the admission history of the patients that drifted and returns them
+    drift = admission_history_drift()
+    Patient.objects.bulk_update(drift, list(NO_ADMISSION_HISTORY), batch_size=500)
+    return drift
+
+
+def _current(census, today):
+    # Zeroes the daily counters of a census row last touched on an earlier day
+    if census.census_date != today:
+        census.admitted_today = 0
+        census.discharged_today = 0
+    return census
+
+
+def read_census(department_id):
+    # Reads the materialized census of a department in a single primary key lookup.
+    census = DepartmentCensus.objects.filter(department_id=department_id).first()
+    return current_census(census, department_id)
+
+
+async def aread_census(department_id):
+    census = await DepartmentCensus.objects.filter(department_id=department_id).afirst()
+    return current_census(census, department_id)
+
+
+def current_census(census, department_id):
+    today = timezone.localdate()
+    if census is None:
+        return DepartmentCensus(department_id=department_id, census_date=today)
+    return _current(census, today)
+
+
+def census_drift(lock=False):
+    # Compares the materialized census with the hospitalizations it summarizes.
+    # Returns {department: {field: (stored, actual)}} for every department that differs.
+    today = timezone.localdate()
+    censuses = DepartmentCensus.objects.all()
+    if lock:
+        censuses = censuses.select_for_update()
+    stored = {census.department_id: _current(census, today) for census in censuses}
+    drift = {}
+    for department in department_census():
+        census = stored.get(department.id) or DepartmentCensus(census_date=today)
+        differences = {
+            field: (getattr(census, field), getattr(department, field))
+            for field in ("admitted", "admitted_today", "discharged_today")
+            if getattr(census, field) != getattr(department, field)
+        }
+        if differences or department.id not in stored:
+            drift[department] = differences
+    return drift
+
+
+@transaction.atomic
+def rebuild_census():
+    # Rewrites the census rows that drifted from the hospitalizations and returns the drift.
+    today = timezone.localdate()
+    drift = census_drift(lock=True)
+    for department, differences in drift.items():
+        DepartmentCensus.objects.update_or_create(
+            department=department,
+            defaults={
+                "census_date": today,
+                "admitted": department.admitted,
+                "admitted_today": department.admitted_today,
+                "discharged_today": department.discharged_today,
+            },
+        )
+    return drift
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+def parse_readings(body, content_type):
+    # Decodes a batch of readings sent as a JSON array, a {"readings": [...]} object,
+    # or NDJSON with one reading per line.
+    try:
+        text = body.decode()
+        if content_type in ("application/x-ndjson", "application/jsonl"):
+            readings = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            readings = json.loads(text)
+            if isinstance(readings, dict):
+                readings = readings.get("readings")
+    except ValueError as error:
+        raise InvalidBatch(f"Malformed request body: {error}")
+    if not isinstance(readings, list):
+        raise InvalidBatch("Expected a list of readings.")
+    if len(readings) > VITAL_SIGNS_BATCH_LIMIT:
+        raise InvalidBatch(f"A batch holds at most {VITAL_SIGNS_BATCH_LIMIT} readings.")
+    return readings
+
+
+def ingest_vital_signs(readings, user):
+    # Validates monitor readings like VitalSignsForm does and stores the valid ones with a
+    # single bulk insert. Returns the stored count and the errors of the rejected readings.
+    errors = []
+    accepted = []
+    for index, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            errors.append(
+                {"index": index, "errors": {"__all__": ["Expected an object."]}}
+            )
+            continue
+        form = VitalSignsForm(reading)
+        reading_errors = {field: list(messages) for field, messages in form.errors.items()}
+        try:
+            hospitalization_id = uuid.UUID(str(reading.get("hospitalization")))
+        except ValueError:
+            reading_errors["hospitalization"] = ["Enter a valid hospitalization id."]
+        if reading_errors:
+            errors.append({"index": index, "errors": reading_errors})
+        else:
+            accepted.append((index, hospitalization_id, form))
+
+    known = set(
+        Hospitalization.objects.filter(
+            id__in={hospitalization_id for _, hospitalization_id, _ in accepted}
+        )
+        .order_by()
+        .values_list("id", flat=True)
+    )
+    vital_signs = []
+    for index, hospitalization_id, form in accepted:
+        if hospitalization_id not in known:
+            reading_errors = {"hospitalization": ["Hospitalization not found."]}
+            errors.append({"index": index, "errors": reading_errors})
+            continue
+        vital = form.save(commit=False)
+        vital.hospitalization_id = hospitalization_id
+        vital.created_by = user
+        vital_signs.append(vital)
+
+    with transaction.atomic():
+        VitalSigns.objects.bulk_create(vital_signs, batch_size=500)
+        derive_news_scores(vital_signs)
+        timeseries.record_on_commit(vital_signs)
+    errors.sort(key=lambda error: error["index"])
+    return len(vital_signs), errors
+
+
+def carried_forward_news(hospitalization_ids):
+    # The oxygen, AECOPD and consciousness state of the latest NEWS of each hospitalization
+    latest = NewsScale.objects.filter(hospitalization=OuterRef("pk")).order_by(
+        "-created_at"
+    )
+    stays = Hospitalization.objects.filter(id__in=hospitalization_ids).annotate(
+        **{
+            field: Subquery(latest.values(field)[:1])
+            for field in CARRIED_FORWARD_NEWS_FIELDS
+        }
+    )
+    carried = {}
+    for stay in stays.order_by().values("id", *CARRIED_FORWARD_NEWS_FIELDS):
+        carried[stay.pop("id")] = {
+            field: default if stay[field] is None else stay[field]
+            for field, default in CARRIED_FORWARD_NEWS_FIELDS.items()
+        }
+    return carried
+
+
+def derive_news_scores(vital_signs):
+    # Scores a NEWS for every new vital signs reading in one vectorized pass and stores
+    # the scores with a bulk insert, so monitors feed early-warning scoring directly.
+    if not vital_signs:
+        return []
+    carried = carried_forward_news({vital.hospitalization_id for vital in vital_signs})
+    states = [carried[vital.hospitalization_id] for vital in vital_signs]
+    totals, codes = news.score_news(
+        [vital.respiratory_rate for vital in vital_signs],
+        [vital.oxygen_saturation for vital in vital_signs],
+        [state["is_on_oxygen"] for state in states],
+        [state["aecopd_state"] for state in states],
+        [vital.temperature for vital in vital_signs],
+        [vital.systolic_blood_pressure for vital in vital_signs],
+        [vital.heart_rate for vital in vital_signs],
+        [state["level_of_consciousness"] for state in states],
+    )
+    scores = [
+        NewsScale(
+            hospitalization_id=vital.hospitalization_id,
+            created_by_id=vital.created_by_id,
+            vital_signs=vital,
+            respiratory_rate=vital.respiratory_rate,
+            oxygen_saturation=vital.oxygen_saturation,
+            temperature=vital.temperature,
+            systolic_blood_pressure=vital.systolic_blood_pressure,
+            diastolic_blood_pressure=vital.diastolic_blood_pressure,
+            heart_rate=vital.heart_rate,
+            total_score=int(total),
+            score_interpretation=news.interpretation_text(int(total), int(code)),
+            **state,
+        )
+        for vital, state, total, code in zip(vital_signs, states, totals, codes)
+    ]
+    scores = NewsScale.objects.bulk_create(scores, batch_size=500)
+    alerts.alert_on_commit(scores)
+    return scores
+
+
+def rescore_derived_news(vital):
+    # Keeps the NEWS derived from a reading in step when the reading is corrected
+    score = NewsScale.objects.filter(vital_signs=vital).first()
+    if score is None:
+        return None
+    for field in (
+        "respiratory_rate",
+        "oxygen_saturation",
+        "temperature",
+        "systolic_blood_pressure",
+        "diastolic_blood_pressure",
+        "heart_rate",
+    ):
+        setattr(score, field, getattr(vital, field))
+    score.save()
+    return score
@@ -0,0 +1,91 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+
+from department.models import Department, Hospitalization, VitalSigns
+from main.models import User
+from patient.models import Patient
+
+
+class AsyncReadViewsTest(TestCase):
+    # The read pages are async views; these requests run them on an event loop, where
+    # any lazy database access left in the templates would raise SynchronousOnlyOperation.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.discharged = Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.department,
+            main_symptom="Fever",
+            is_discharged=True,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient, department=cls.department, main_symptom="Cough"
+        )
+        VitalSigns.objects.create(
+            hospitalization=cls.hospitalization,
+            created_by=cls.user,
+            systolic_blood_pressure=120,
+            diastolic_blood_pressure=80,
+            respiratory_rate=16,
+            oxygen_saturation=97,
+            temperature=36.6,
+            heart_rate=70,
+        )
+
+    def pages(self):
+        return [
+            reverse("department:department_list"),
+            reverse("department:department_detail", args=[self.department.id]),
+            reverse("patient:detail", args=[self.patient.id]),
+            reverse("department:hospitalization", args=[self.hospitalization.id]),
+        ]
+
+    async def test_pages_render_on_the_event_loop(self):
+        await self.async_client.aforce_login(self.user)
+        for url in self.pages():
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertContains(response, "Logout")
+
+    async def test_patient_detail_finds_the_ongoing_admission(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("patient:detail", args=[self.patient.id])
+        )
+        self.assertEqual(response.context["ongoing_admission"], self.hospitalization)
+        self.assertEqual(len(response.context["hospitalizations"]), 2)
+        self.assertContains(response, "Admitted to the Test Department Department")
+
+    async def test_login_required(self):
+        for url in self.pages():
+            response = await self.async_client.get(url)
+            self.assertRedirects(
+                response, f"/login/?next={url}", fetch_redirect_response=False
+            )
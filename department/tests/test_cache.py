@@ -0,0 +1,287 @@
+import time
+from datetime import date
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from department.cache import (
+    CACHE_ALIAS,
+    ROSTER_TIMEOUT,
+    fragment_stats,
+    roster_key,
+    stats,
+    version_key,
+)
+from department.models import Department, Hospitalization, Observation
+from main.models import User
+from patient.models import Patient
+
+
+class DepartmentRosterCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.other_department = Department.objects.create(
+            name="Other Department",
+            description="This is another department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        stats.reset()
+        fragment_stats.reset()
+        self.client.force_login(self.user)
+
+    def roster(self, department):
+        response = self.client.get(
+            reverse("department:department_detail", args=[department.id])
+        )
+        return [stay.id for stay in response.context["hospitalizations"]]
+
+    def admit(self, department):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("department:admit_patient", args=[self.patient.id]),
+                {"department_id": department.id, "main_symptom": "Cough"},
+            )
+        return Hospitalization.objects.get(is_discharged=False)
+
+    def test_repeated_views_are_served_from_the_cache(self):
+        self.roster(self.department)
+        # Session, user and department; the roster and census come from the cache
+        with self.assertNumQueries(3):
+            self.roster(self.department)
+        self.assertEqual(stats.snapshot()["hits"], 1)
+        self.assertEqual(stats.snapshot()["misses"], 1)
+
+    def test_rosters_expire_in_caches_without_a_timeout(self):
+        # The file and Redis caches keep entries until they are invalidated, which
+        # would leave every superseded roster behind
+        cache = caches[CACHE_ALIAS]
+        with mock.patch.object(cache, "default_timeout", None):
+            self.roster(self.department)
+        version = cache.get(version_key(self.department.id))
+        key = cache.make_key(roster_key(self.department.id, version))
+        self.assertLessEqual(cache._expire_info[key], time.time() + ROSTER_TIMEOUT)
+
+    def test_admission_invalidates_the_department(self):
+        self.assertEqual(self.roster(self.department), [])
+        self.roster(self.other_department)
+        stay = self.admit(self.department)
+        self.assertEqual(self.roster(self.department), [stay.id])
+        # The other department keeps its entry
+        self.roster(self.other_department)
+        self.assertEqual(stats.snapshot()["hits"], 1)
+
+    def test_transfer_invalidates_both_departments(self):
+        stay = self.admit(self.department)
+        self.assertEqual(self.roster(self.department), [stay.id])
+        self.assertEqual(self.roster(self.other_department), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("department:transfer", args=[self.patient.id, stay.id]),
+                {"department": self.other_department.id},
+            )
+        self.assertEqual(self.roster(self.department), [])
+        self.assertEqual(self.roster(self.other_department), [stay.id])
+
+    def test_discharge_invalidates_the_department(self):
+        stay = self.admit(self.department)
+        self.assertEqual(self.roster(self.department), [stay.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("department:discharge", args=[stay.id]),
+                {"discharge_date": "2024-01-01", "discharge_time": "12:00"},
+            )
+        self.assertEqual(self.roster(self.department), [])
+        response = self.client.get(
+            reverse("department:department_detail", args=[self.department.id])
+        )
+        self.assertEqual(response.context["num_admitted_patients"], 0)
+
+    def test_symptom_edit_invalidates_the_department(self):
+        stay = self.admit(self.department)
+        self.roster(self.department)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse(
+                    "department:hospitalization_update",
+                    args=[self.patient.id, stay.id],
+                ),
+                {"main_symptom": "Fever", "department_id": self.department.id},
+            )
+        response = self.client.get(
+            reverse("department:department_detail", args=[self.department.id])
+        )
+        self.assertContains(response, "Fever")
+
+    def test_patient_rename_invalidates_their_departments(self):
+        self.admit(self.department)
+        self.roster(self.department)
+        data = {
+            "first_name": "Zofia",
+            "last_name": "Master",
+            "date_of_birth": "1999-09-09",
+            "contact_number": "+48600500400",
+            "is_insured": True,
+            "insurance": "1234567890",
+            "country": "Country",
+            "city": "City",
+            "street": "Street",
+            "zip_code": "00-00",
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("patient:update", args=[self.patient.id]), data)
+        response = self.client.get(
+            reverse("department:department_detail", args=[self.department.id])
+        )
+        self.assertContains(response, "Zofia")
+
+    def test_stats_endpoint(self):
+        self.roster(self.department)
+        self.roster(self.department)
+        response = self.client.get(reverse("department:cache_stats"))
+        self.assertEqual(
+            response.json(),
+            {
+                "backend": "django.core.cache.backends.locmem.LocMemCache",
+                "hits": 1,
+                "misses": 1,
+                "invalidations": 0,
+                "hit_ratio": 0.5,
+                "fragments": {
+                    "hits": 0,
+                    "misses": 0,
+                    "invalidations": 0,
+                    "hit_ratio": None,
+                },
+            },
+        )
+
+
+class ChartFragmentCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.other_user = User.objects.create_user(
+            first_name="DoctorTest",
+            last_name="User",
+            email="testdoctor@doctor.com",
+            password="doctorpassword",
+            profession="doctors",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.department,
+            main_symptom="Fever",
+        )
+        cls.observation = Observation.objects.create(
+            hospitalization=cls.hospitalization,
+            observation="<p>Patient is stable</p>",
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        fragment_stats.reset()
+        self.client.force_login(self.user)
+
+    def detail(self):
+        response = self.client.get(
+            reverse("department:hospitalization", args=[self.hospitalization.id])
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_sections_are_served_from_cache(self):
+        first = self.detail()
+        self.assertEqual(fragment_stats.snapshot()["misses"], 8)
+        with self.assertNumQueries(4):
+            second = self.detail()
+        self.assertEqual(fragment_stats.snapshot()["hits"], 8)
+        self.assertEqual(first.content, second.content)
+        self.assertContains(second, "<p>Patient is stable</p>", html=True)
+
+    def test_only_changed_section_is_rendered_again(self):
+        self.detail()
+        self.client.post(
+            reverse(
+                "department:observation_create",
+                args=[self.patient.id, self.hospitalization.id],
+            ),
+            {"observation": "<p>Patient is eating</p>"},
+        )
+        fragment_stats.reset()
+        response = self.detail()
+        self.assertEqual(fragment_stats.snapshot()["misses"], 1)
+        self.assertContains(response, "Patient is eating")
+
+        self.observation.observation = "<p>Patient is asleep</p>"
+        self.observation.save()
+        fragment_stats.reset()
+        response = self.detail()
+        self.assertEqual(fragment_stats.snapshot()["misses"], 1)
+        self.assertContains(response, "Patient is asleep")
+        self.assertNotContains(response, "Patient is stable")
+
+    def test_edit_links_are_shown_to_authors_only(self):
+        edit_url = reverse(
+            "department:observation_update",
+            args=[self.patient.id, self.hospitalization.id, self.observation.id],
+        )
+        self.assertContains(self.detail(), edit_url)
+        self.client.force_login(self.other_user)
+        response = self.detail()
+        self.assertContains(response, "Patient is stable")
+        self.assertNotContains(response, edit_url)
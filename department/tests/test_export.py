@@ -0,0 +1,231 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timezone
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from department.models import (
+    Department,
+    Hospitalization,
+    Observation,
+    VitalSigns,
+)
+from main.models import User
+from patient.models import Patient
+from scales.models import NewsScale, PainScale
+
+
+class HospitalizationExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.admin = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.department = Department.objects.create(
+            name="Cardiology", description="Heart", created_by=cls.user
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient, department=cls.department, main_symptom="Fever"
+        )
+        cls.old_stay = Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.department,
+            main_symptom="Cough",
+            is_discharged=True,
+        )
+        Hospitalization.objects.filter(id=cls.old_stay.id).update(
+            admitted_on=datetime(2023, 1, 10, tzinfo=timezone.utc),
+            discharged_on=datetime(2023, 1, 20, tzinfo=timezone.utc),
+        )
+        Observation.objects.create(
+            hospitalization=cls.hospitalization,
+            observation="<p>Patient is stable, eating well</p>",
+            created_by=cls.user,
+        )
+        VitalSigns.objects.create(
+            hospitalization=cls.hospitalization,
+            created_by=cls.user,
+            systolic_blood_pressure=120,
+            diastolic_blood_pressure=80,
+            respiratory_rate=16,
+            oxygen_saturation=97,
+            temperature="36.6",
+            heart_rate=70,
+        )
+        PainScale.objects.create(
+            hospitalization=cls.hospitalization, created_by=cls.user, pain_level="3"
+        )
+        NewsScale.objects.create(
+            hospitalization=cls.old_stay,
+            created_by=cls.user,
+            respiratory_rate=16,
+            oxygen_saturation=98,
+            temperature="36.6",
+            systolic_blood_pressure=120,
+            diastolic_blood_pressure=80,
+            heart_rate=70,
+        )
+
+    async def export(self, url, **params):
+        response = await self.async_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = [chunk async for chunk in response.streaming_content]
+        return response, chunks, b"".join(chunks).decode()
+
+    async def test_ndjson_export_of_a_stay(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse(
+            "department:hospitalization_export", args=[self.hospitalization.id]
+        )
+        response, _, body = await self.export(url, format="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn(
+            f'filename="hospitalization-{self.hospitalization.id}.ndjson"',
+            response["Content-Disposition"],
+        )
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [record["record"] for record in records],
+            ["hospitalization", "observations", "vitals", "pain_scales"],
+        )
+        stay, observation, vitals, pain = records
+        self.assertEqual(stay["id"], str(self.hospitalization.id))
+        self.assertEqual(stay["patient_last_name"], "Master")
+        self.assertEqual(stay["department_name"], "Cardiology")
+        self.assertEqual(
+            observation["observation"], "<p>Patient is stable, eating well</p>"
+        )
+        self.assertEqual(observation["created_by_email"], "testnurse@nurse.com")
+        self.assertEqual(vitals["heart_rate"], 70)
+        self.assertEqual(vitals["temperature"], "36.6")
+        self.assertEqual(pain["pain_level"], "3")
+
+    async def test_csv_export_of_a_stay(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse(
+            "department:hospitalization_export", args=[self.hospitalization.id]
+        )
+        response, _, body = await self.export(url)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(
+            [row["record"] for row in rows],
+            ["hospitalization", "observations", "vitals", "pain_scales"],
+        )
+        self.assertEqual(rows[0]["patient_date_of_birth"], "1999-09-09")
+        self.assertEqual(
+            rows[1]["observation"], "<p>Patient is stable, eating well</p>"
+        )
+        # Columns of other record types stay empty
+        self.assertEqual(rows[1]["heart_rate"], "")
+        self.assertEqual(rows[2]["heart_rate"], "70")
+
+    async def test_export_is_sent_in_chunks(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse(
+            "department:hospitalization_export", args=[self.hospitalization.id]
+        )
+        with mock.patch("department.export.LINES_PER_WRITE", 2):
+            _, chunks, body = await self.export(url, format="ndjson")
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(len(body.splitlines()), 4)
+
+    def test_wsgi_export_is_a_sync_stream(self):
+        # The test client is a WSGI client, which cannot drive an async iterator
+        self.client.force_login(self.user)
+        url = reverse(
+            "department:hospitalization_export", args=[self.hospitalization.id]
+        )
+        with mock.patch("department.export.LINES_PER_WRITE", 2):
+            response = self.client.get(url, {"format": "ndjson"})
+            self.assertFalse(response.is_async)
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(
+            [json.loads(line)["record"] for line in b"".join(chunks).splitlines()],
+            ["hospitalization", "observations", "vitals", "pain_scales"],
+        )
+
+    async def test_unknown_format(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse(
+            "department:hospitalization_export", args=[self.hospitalization.id]
+        )
+        response = await self.async_client.get(url, {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_range_export_covers_overlapping_stays(self):
+        await self.async_client.aforce_login(self.admin)
+        url = reverse("department:hospitalizations_export")
+        response, _, body = await self.export(
+            url, **{"from": "2023-01-15", "to": "2023-02-01", "format": "ndjson"}
+        )
+        self.assertIn(
+            'filename="hospitalizations-2023-01-15-2023-02-01.ndjson"',
+            response["Content-Disposition"],
+        )
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [
+                (record["record"], record.get("hospitalization_id", record["id"]))
+                for record in records
+            ],
+            [
+                ("hospitalization", str(self.old_stay.id)),
+                ("news_scales", str(self.old_stay.id)),
+            ],
+        )
+        _, _, body = await self.export(
+            url, **{"from": "2023-01-01", "to": "2099-01-01", "format": "ndjson"}
+        )
+        self.assertEqual(len(body.splitlines()), 6)
+
+    async def test_range_export_is_for_admins(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("department:hospitalizations_export"),
+            {"from": "2023-01-01", "to": "2023-12-31"},
+        )
+        self.assertRedirects(
+            response, reverse("access_denied"), fetch_redirect_response=False
+        )
+
+    async def test_range_export_needs_a_valid_range(self):
+        await self.async_client.aforce_login(self.admin)
+        url = reverse("department:hospitalizations_export")
+        for params in (
+            {},
+            {"from": "2023-01-01"},
+            {"from": "2023-02-30", "to": "2023-03-01"},
+            {"from": "2023-03-01", "to": "2023-01-01"},
+        ):
+            response = await self.async_client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
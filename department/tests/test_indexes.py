@@ -0,0 +1,109 @@
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+
+from department.models import Department, Hospitalization
+from department.services import CHART_SECTIONS, admitted_stays, chart_queryset
+from main.models import User
+from patient.models import Patient
+from patient.services import (
+    after_cursor,
+    encode_cursor,
+    patient_page,
+    patient_registry,
+    stay_summaries,
+)
+
+
+def query_plan(queryset):
+    # Returns the EXPLAIN output of a queryset on the current database.
+    # PostgreSQL prefers sequential scans on tiny test tables, so they are disabled
+    # for the surrounding test transaction to see which indexes the planner can use.
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+class IndexUsageTestMixin:
+    # Plan fragments that betray a full table scan or an explicit sort
+    FULL_SCAN_MARKERS = {
+        "sqlite": ["SCAN {table}\n", "USE TEMP B-TREE FOR ORDER BY"],
+        "postgresql": ["Seq Scan on {table}"],
+    }
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = query_plan(queryset)
+        table = queryset.model._meta.db_table
+        self.assertTrue(
+            any(index_name in plan for index_name in index_names),
+            f"None of {index_names} used for {table}:\n{plan}",
+        )
+        for marker in self.FULL_SCAN_MARKERS.get(connection.vendor, []):
+            self.assertNotIn(marker.format(table=table), plan + "\n")
+
+
+class HotPathIndexTest(IndexUsageTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.department,
+            main_symptom="Cough",
+        )
+
+    def test_department_detail_roster(self):
+        self.assertUsesIndex(
+            admitted_stays(self.department.id),
+            "hosp_ongoing_roster_idx",
+            "hosp_department_status_idx",
+        )
+
+    def test_patient_detail_stays(self):
+        summaries = stay_summaries(self.patient.id)
+        self.assertUsesIndex(summaries, "hosp_patient_stays_idx")
+        # Every per-stay count and latest value is a correlated subquery, which must
+        # search an index of its charting table rather than scan it
+        self.assertNotRegex(query_plan(summaries), r"\bSCAN\b|Seq Scan|TEMP B-TREE")
+
+    def test_patient_registry_page(self):
+        first_page, cursor = patient_page(patient_registry(), page_size=1)
+        self.assertUsesIndex(patient_registry()[:50], "patient_registry_idx")
+        self.assertUsesIndex(
+            patient_registry().filter(after_cursor(encode_cursor(first_page[0])))[:50],
+            "patient_registry_idx",
+        )
+
+    def test_hospitalization_detail_sections(self):
+        for name, model in CHART_SECTIONS:
+            with self.subTest(section=name):
+                index_name = model._meta.indexes[0].name
+                self.assertUsesIndex(
+                    chart_queryset(model, self.hospitalization.id), index_name
+                )
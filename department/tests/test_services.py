@@ -0,0 +1,648 @@
+import json
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from department.models import (
+    Consultation,
+    Department,
+    DepartmentCensus,
+    Hospitalization,
+    Observation,
+    VitalSigns,
+)
+from department.services import (
+    admission_history_drift,
+    CHART_SECTIONS,
+    census_drift,
+    department_census,
+    duration_in_hours,
+    load_hospitalization_chart,
+    read_census,
+)
+from main.models import User
+from patient.models import Patient
+from scales.models import (
+    BodyMassIndex,
+    GlasgowComaScale,
+    NewsScale,
+    NortonScale,
+    PainScale,
+)
+
+ENTRIES_PER_SECTION = 500
+
+
+class LoadHospitalizationChartTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.department,
+            main_symptom="Cough",
+            additional_symptoms="Fever",
+        )
+        common = {"hospitalization": cls.hospitalization, "created_by": cls.user}
+        size = range(ENTRIES_PER_SECTION)
+        Consultation.objects.bulk_create(
+            Consultation(
+                consultation_name="Cardiology", consultation="<p>Ok</p>", **common
+            )
+            for _ in size
+        )
+        Observation.objects.bulk_create(
+            Observation(observation="<p>Stable</p>", **common) for _ in size
+        )
+        VitalSigns.objects.bulk_create(
+            VitalSigns(
+                systolic_blood_pressure=120,
+                diastolic_blood_pressure=80,
+                respiratory_rate=16,
+                oxygen_saturation=98,
+                temperature=36.6,
+                heart_rate=70,
+                **common,
+            )
+            for _ in size
+        )
+        PainScale.objects.bulk_create(
+            PainScale(pain_level="2", pain_interpretation="Mild Pain", **common)
+            for _ in size
+        )
+        BodyMassIndex.objects.bulk_create(
+            BodyMassIndex(body_height=180, body_weight=80, bmi=24.7, **common)
+            for _ in size
+        )
+        NortonScale.objects.bulk_create(
+            NortonScale(
+                physical_condition="4",
+                mental_condition="4",
+                activity="4",
+                mobility="4",
+                incontinence="4",
+                total_points=20,
+                pressure_risk="Low Risk",
+                **common,
+            )
+            for _ in size
+        )
+        GlasgowComaScale.objects.bulk_create(
+            GlasgowComaScale(
+                eye_response="4",
+                verbal_response="5",
+                motor_response="6",
+                total_points=15,
+                **common,
+            )
+            for _ in size
+        )
+        NewsScale.objects.bulk_create(
+            NewsScale(
+                respiratory_rate=16,
+                oxygen_saturation=98,
+                temperature=36.6,
+                systolic_blood_pressure=120,
+                diastolic_blood_pressure=80,
+                heart_rate=70,
+                total_score=0,
+                score_interpretation="Low",
+                **common,
+            )
+            for _ in size
+        )
+
+    def test_query_count_is_constant(self):
+        # One query for the hospitalization and one per charting table
+        with self.assertNumQueries(1 + len(CHART_SECTIONS)):
+            chart = load_hospitalization_chart(self.hospitalization.id)
+            for name, _ in CHART_SECTIONS:
+                for entry in chart[name]:
+                    entry.created_by.first_name
+                    entry.hospitalization.patient.first_name
+            chart.hospitalization.department.name
+
+    def test_sections_are_complete(self):
+        chart = load_hospitalization_chart(self.hospitalization.id)
+        for name, _ in CHART_SECTIONS:
+            self.assertEqual(len(chart[name]), ENTRIES_PER_SECTION)
+
+    def test_timeline_is_newest_first(self):
+        chart = load_hospitalization_chart(self.hospitalization.id)
+        timeline = chart.timeline
+        self.assertEqual(len(timeline), ENTRIES_PER_SECTION * len(CHART_SECTIONS))
+        timestamps = [item.created_at for item in timeline]
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+        self.assertEqual(
+            {item.kind for item in timeline}, {name for name, _ in CHART_SECTIONS}
+        )
+
+    def test_view_query_count_does_not_grow_with_chart(self):
+        self.client.force_login(self.user)
+        # Session and user lookups, the hospitalization, the section versions, then
+        # one query per section rendered into the fragment cache
+        with self.assertNumQueries(2 + 1 + 1 + len(CHART_SECTIONS)):
+            response = self.client.get(
+                reverse("department:hospitalization", args=[self.hospitalization.id])
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class DepartmentCensusTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.first_department = Department.objects.create(
+            name="Cardiology", description="Heart", created_by=cls.user
+        )
+        cls.second_department = Department.objects.create(
+            name="Surgery", description="Knives", created_by=cls.user
+        )
+        cls.empty_department = Department.objects.create(
+            name="Urology", description="Empty", created_by=cls.user
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        for _ in range(3):
+            Hospitalization.objects.create(
+                patient=cls.patient,
+                department=cls.first_department,
+                main_symptom="Cough",
+            )
+        now = timezone.now()
+        discharged = Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.second_department,
+            main_symptom="Cough",
+            is_discharged=True,
+            discharged_on=now,
+        )
+        Hospitalization.objects.filter(id=discharged.id).update(
+            admitted_on=now - timedelta(days=2)
+        )
+        Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.second_department,
+            main_symptom="Cough",
+        )
+
+    def test_census_is_one_query(self):
+        with self.assertNumQueries(1):
+            census = {department.name: department for department in department_census()}
+        self.assertEqual(len(census), 3)
+
+    def test_census_counts(self):
+        census = {department.name: department for department in department_census()}
+        self.assertEqual(census["Cardiology"].admitted, 3)
+        self.assertEqual(census["Cardiology"].admitted_today, 3)
+        self.assertEqual(census["Cardiology"].discharged_today, 0)
+        self.assertIsNone(census["Cardiology"].mean_length_of_stay)
+        self.assertEqual(census["Surgery"].admitted, 1)
+        self.assertEqual(census["Surgery"].admitted_today, 1)
+        self.assertEqual(census["Surgery"].discharged_today, 1)
+        self.assertEqual(duration_in_hours(census["Surgery"].mean_length_of_stay), 48)
+        self.assertEqual(census["Urology"].admitted, 0)
+
+    def test_department_list_query_count(self):
+        self.client.force_login(self.user)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("department:department_list"))
+        self.assertEqual(response.context["total_admitted_patients"], 4)
+
+    def test_census_json(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("department:census"))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["total_admitted_patients"], 4)
+        surgery = next(
+            item for item in data["departments"] if item["name"] == "Surgery"
+        )
+        self.assertEqual(surgery["discharged_today"], 1)
+        self.assertEqual(surgery["mean_length_of_stay_hours"], 48)
+
+    def test_census_json_authentication_required(self):
+        response = self.client.get(reverse("department:census"))
+        self.assertEqual(response.status_code, 302)
+
+
+class MaterializedCensusTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.first_department = Department.objects.create(
+            name="Cardiology", description="Heart", created_by=cls.user
+        )
+        cls.second_department = Department.objects.create(
+            name="Surgery", description="Knives", created_by=cls.user
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def admit(self, department):
+        self.client.post(
+            reverse("department:admit_patient", args=[self.patient.id]),
+            {"main_symptom": "Cough", "department_id": department.id},
+        )
+        return Hospitalization.objects.filter(patient=self.patient).first()
+
+    def test_admission_transfer_and_discharge(self):
+        hospitalization = self.admit(self.first_department)
+        census = read_census(self.first_department.id)
+        self.assertEqual(census.admitted, 1)
+        self.assertEqual(census.admitted_today, 1)
+
+        self.client.post(
+            reverse("department:transfer", args=[self.patient.id, hospitalization.id]),
+            {"department": self.second_department.id},
+        )
+        self.assertEqual(read_census(self.first_department.id).admitted, 0)
+        self.assertEqual(read_census(self.second_department.id).admitted, 1)
+        self.assertEqual(read_census(self.second_department.id).admitted_today, 1)
+
+        now = timezone.localtime()
+        discharge = {
+            "discharge_date": now.strftime("%Y-%m-%d"),
+            "discharge_time": now.strftime("%H:%M"),
+        }
+        url = reverse("department:discharge", args=[hospitalization.id])
+        self.client.post(url, discharge)
+        # A repeated submission must not be counted twice
+        self.client.post(url, discharge)
+        census = read_census(self.second_department.id)
+        self.assertEqual(census.admitted, 0)
+        self.assertEqual(census.discharged_today, 1)
+        self.assertEqual(census_drift(), {})
+        # The registry sort keys of the patient follow the stay
+        self.patient.refresh_from_db()
+        self.assertFalse(self.patient.ongoing_admissions)
+        self.assertEqual(self.patient.discharged_admissions, 1)
+        self.assertEqual(self.patient.total_admissions, 1)
+        self.assertIsNotNone(self.patient.latest_discharge_date)
+        self.assertEqual(admission_history_drift(), [])
+
+    def test_patient_delete_removes_ongoing_stay(self):
+        self.admit(self.first_department)
+        self.client.post(reverse("patient:delete", args=[self.patient.id]))
+        self.assertEqual(read_census(self.first_department.id).admitted, 0)
+
+    def test_department_delete_rewrites_admission_history(self):
+        self.admit(self.first_department)
+        self.client.post(
+            reverse("department:delete_department", args=[self.first_department.id])
+        )
+        self.assertFalse(Hospitalization.objects.exists())
+        self.assertEqual(admission_history_drift(), [])
+        self.patient.refresh_from_db()
+        self.assertFalse(self.patient.ongoing_admissions)
+        self.assertEqual(self.patient.total_admissions, 0)
+
+    def test_daily_counters_roll_over(self):
+        self.admit(self.first_department)
+        DepartmentCensus.objects.update(census_date=date(2000, 1, 1))
+        census = read_census(self.first_department.id)
+        self.assertEqual(census.admitted, 1)
+        self.assertEqual(census.admitted_today, 0)
+
+    def test_read_census_is_one_query(self):
+        self.admit(self.first_department)
+        with self.assertNumQueries(1):
+            read_census(self.first_department.id)
+
+    def test_command_verifies_and_rebuilds(self):
+        Hospitalization.objects.create(
+            patient=self.patient,
+            department=self.first_department,
+            main_symptom="Cough",
+        )
+        with self.assertRaises(CommandError):
+            call_command("rebuild_census", "--verify", stdout=StringIO())
+        call_command("rebuild_census", stdout=StringIO())
+        call_command("rebuild_census", "--verify", stdout=StringIO())
+        self.assertEqual(read_census(self.first_department.id).admitted, 1)
+        self.patient.refresh_from_db()
+        self.assertTrue(self.patient.ongoing_admissions)
+        self.assertEqual(self.patient.total_admissions, 1)
+
+
+class VitalSignsIngestionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.secretary = User.objects.create_user(
+            first_name="SecretaryTest",
+            last_name="User",
+            email="testsecretary@secretary.com",
+            password="secretarypassword",
+            profession="secretaries",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.hospitalizations = []
+        for number in range(3):
+            patient = Patient.objects.create(
+                first_name=f"Patient{number}",
+                last_name="Master",
+                date_of_birth=date(1999, 9, 9),
+                contact_number="+48600500400",
+                is_insured=True,
+                insurance="1234567890",
+                country="Country",
+                city="City",
+                street="Street",
+                zip_code="00-00",
+                created_by=cls.user,
+            )
+            cls.hospitalizations.append(
+                Hospitalization.objects.create(
+                    patient=patient, department=cls.department, main_symptom="Cough"
+                )
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def reading(self, hospitalization, **overrides):
+        reading = {
+            "hospitalization": str(hospitalization.id),
+            "respiratory_rate": 16,
+            "oxygen_saturation": 97,
+            "temperature": 36.6,
+            "systolic_blood_pressure": 120,
+            "diastolic_blood_pressure": 80,
+            "heart_rate": 72,
+        }
+        reading.update(overrides)
+        return reading
+
+    def post(self, body, content_type="application/json"):
+        return self.client.post(
+            reverse("department:vitals_ingest"), body, content_type=content_type
+        )
+
+    def test_bulk_insert_for_many_hospitalizations(self):
+        readings = [
+            self.reading(hospitalization)
+            for hospitalization in self.hospitalizations
+            for _ in range(100)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(json.dumps(readings))
+        # Session, user, the hospitalization lookup and the carried forward NEWS state,
+        # then whole batches of vital signs and of the NEWS derived from them
+        statements = [query["sql"].split()[0] for query in queries]
+        self.assertEqual(statements.count("SELECT"), 4)
+        batches = sum(
+            -(
+                -300
+                // min(
+                    connection.ops.bulk_batch_size(
+                        model._meta.concrete_fields, readings
+                    ),
+                    500,
+                )
+            )
+            for model in (VitalSigns, NewsScale)
+        )
+        self.assertEqual(statements.count("INSERT"), batches)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"created": 300, "errors": []})
+        for hospitalization in self.hospitalizations:
+            vitals = VitalSigns.objects.filter(hospitalization=hospitalization)
+            self.assertEqual(vitals.count(), 100)
+        self.assertEqual(VitalSigns.objects.filter(created_by=self.user).count(), 300)
+
+    def test_ndjson_batch(self):
+        lines = [json.dumps(self.reading(self.hospitalizations[0])) for _ in range(3)]
+        response = self.post("\n".join(lines) + "\n", "application/x-ndjson")
+        self.assertEqual(response.json()["created"], 3)
+
+    def test_rejected_readings_are_reported_per_row(self):
+        readings = {
+            "readings": [
+                self.reading(self.hospitalizations[0]),
+                self.reading(self.hospitalizations[0], oxygen_saturation=140),
+                self.reading(self.hospitalizations[1], systolic_blood_pressure=60),
+                dict(
+                    self.reading(self.hospitalizations[1]), hospitalization="not-an-id"
+                ),
+                dict(
+                    self.reading(self.hospitalizations[2]),
+                    hospitalization=str(self.user.id),
+                ),
+                "nonsense",
+            ]
+        }
+        response = self.post(json.dumps(readings))
+        body = response.json()
+        self.assertEqual(body["created"], 1)
+        self.assertEqual([error["index"] for error in body["errors"]], [1, 2, 3, 4, 5])
+        self.assertIn("oxygen_saturation", body["errors"][0]["errors"])
+        self.assertIn("__all__", body["errors"][1]["errors"])
+        self.assertIn("hospitalization", body["errors"][2]["errors"])
+        self.assertIn("hospitalization", body["errors"][3]["errors"])
+        self.assertEqual(VitalSigns.objects.count(), 1)
+
+    def test_malformed_body(self):
+        self.assertEqual(self.post("{").status_code, 400)
+        self.assertEqual(self.post(json.dumps({"readings": 3})).status_code, 400)
+
+    def test_secretaries_are_denied(self):
+        self.client.force_login(self.secretary)
+        response = self.post(json.dumps([self.reading(self.hospitalizations[0])]))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(VitalSigns.objects.exists())
+
+    def test_post_only(self):
+        response = self.client.get(reverse("department:vitals_ingest"))
+        self.assertEqual(response.status_code, 405)
+
+
+class DeriveNewsScoresTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient, department=cls.department, main_symptom="Cough"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    vitals = {
+        "respiratory_rate": 22,
+        "oxygen_saturation": 93,
+        "temperature": "38.4",
+        "systolic_blood_pressure": 105,
+        "diastolic_blood_pressure": 70,
+        "heart_rate": 95,
+    }
+
+    def expected_total(self, **state):
+        news = NewsScale(
+            **dict(self.vitals, temperature=38.4, **state),
+            hospitalization=self.hospitalization,
+            created_by=self.user,
+        )
+        return news.calculate_total_score()
+
+    def test_form_entry_derives_news(self):
+        self.client.post(
+            reverse(
+                "department:vitals_create",
+                args=[self.patient.id, self.hospitalization.id],
+            ),
+            self.vitals,
+        )
+        vital = VitalSigns.objects.get()
+        news = NewsScale.objects.get(vital_signs=vital)
+        self.assertEqual(news.total_score, self.expected_total())
+        self.assertEqual(news.created_by, self.user)
+        self.assertFalse(news.is_on_oxygen)
+        self.assertEqual(news.level_of_consciousness, "awake")
+
+    def test_state_is_carried_forward_from_the_latest_news(self):
+        NewsScale.objects.create(
+            **dict(self.vitals, temperature=36.6),
+            hospitalization=self.hospitalization,
+            created_by=self.user,
+            is_on_oxygen=True,
+            aecopd_state=True,
+            level_of_consciousness="verbal",
+        )
+        reading = dict(self.vitals, hospitalization=str(self.hospitalization.id))
+        self.client.post(
+            reverse("department:vitals_ingest"),
+            json.dumps([reading, reading]),
+            content_type="application/json",
+        )
+        derived = NewsScale.objects.filter(vital_signs__isnull=False)
+        self.assertEqual(derived.count(), 2)
+        expected = self.expected_total(
+            is_on_oxygen=True, aecopd_state=True, level_of_consciousness="verbal"
+        )
+        for news in derived:
+            self.assertTrue(news.is_on_oxygen)
+            self.assertTrue(news.aecopd_state)
+            self.assertEqual(news.level_of_consciousness, "verbal")
+            self.assertEqual(news.total_score, expected)
+            self.assertEqual(
+                news.score_interpretation, news.calculate_score_interpretation()
+            )
+
+    def test_correcting_vitals_rescores_the_derived_news(self):
+        url = reverse(
+            "department:vitals_create", args=[self.patient.id, self.hospitalization.id]
+        )
+        self.client.post(url, self.vitals)
+        vital = VitalSigns.objects.get()
+        self.client.post(
+            reverse(
+                "department:vitals_update",
+                args=[self.patient.id, self.hospitalization.id, vital.id],
+            ),
+            dict(self.vitals, heart_rate=70, respiratory_rate=16),
+        )
+        news = NewsScale.objects.get(vital_signs=vital)
+        self.assertEqual(news.heart_rate, 70)
+        self.assertEqual(news.total_score, self.expected_total() - 3)
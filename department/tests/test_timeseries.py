@@ -0,0 +1,199 @@
+import shutil
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from department import timeseries
+from department.models import Department, Hospitalization, VitalSigns
+from department.timeseries import RECORD, VitalSignsStore
+from main.models import User
+from patient.models import Patient
+
+START = datetime(2024, 3, 1, 22, 0, tzinfo=timezone.utc)
+
+
+def reading(hospitalization_id, minutes, heart_rate=70, **fields):
+    values = {
+        "id": uuid.uuid4(),
+        "hospitalization_id": hospitalization_id,
+        "created_at": START + timedelta(minutes=minutes),
+        "respiratory_rate": 16,
+        "oxygen_saturation": 98,
+        "systolic_blood_pressure": 120,
+        "diastolic_blood_pressure": 80,
+        "temperature": Decimal("36.6"),
+        "heart_rate": heart_rate,
+    }
+    values.update(fields)
+    return VitalSigns(**values)
+
+
+class VitalSignsStoreTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.store = VitalSignsStore(self.root)
+        self.stay = uuid.uuid4()
+
+    def test_round_trip_in_time_order(self):
+        # Spans midnight, so the readings land in two daily chunks
+        readings = [reading(self.stay, minutes) for minutes in (180, 0, 90)]
+        self.assertEqual(self.store.append(readings), 3)
+        records = self.store.read(self.stay)
+        self.assertEqual(records.dtype, RECORD)
+        self.assertEqual(
+            [timeseries.reading_id(value) for value in records["id"]],
+            [readings[1].id, readings[2].id, readings[0].id],
+        )
+        self.assertEqual(records["heart_rate"].tolist(), [70, 70, 70])
+        self.assertAlmostEqual(float(records["temperature"][0]), 36.6, places=5)
+        self.assertEqual(len(list((self.store.root / str(self.stay)).iterdir())), 2)
+
+    def test_time_range_is_half_open(self):
+        self.store.append(
+            [reading(self.stay, minutes) for minutes in range(0, 300, 30)]
+        )
+        records = self.store.read(
+            self.stay, START + timedelta(minutes=60), START + timedelta(minutes=150)
+        )
+        self.assertEqual(
+            records["recorded_at"].tolist(),
+            [
+                (START + timedelta(minutes=minutes)).replace(tzinfo=None)
+                for minutes in (60, 90, 120)
+            ],
+        )
+
+    def test_corrections_replace_earlier_records(self):
+        vital = reading(self.stay, 0)
+        self.store.append([vital, reading(self.stay, 10)])
+        vital.heart_rate = 130
+        self.store.append([vital])
+        records = self.store.read(self.stay)
+        self.assertEqual(records["heart_rate"].tolist(), [130, 70])
+
+    def test_partial_record_is_ignored(self):
+        self.store.append([reading(self.stay, 0)])
+        chunk = next((self.store.root / str(self.stay)).iterdir())
+        with open(chunk, "ab") as file:
+            file.write(b"\x01\x02\x03")
+        self.assertEqual(len(self.store.read(self.stay)), 1)
+
+    def test_unknown_hospitalization_and_drop(self):
+        self.assertEqual(len(self.store.read(uuid.uuid4())), 0)
+        self.store.append([reading(self.stay, 0)])
+        self.assertEqual(self.store.hospitalizations(), [self.stay])
+        self.store.drop(self.stay)
+        self.assertEqual(len(self.store.read(self.stay)), 0)
+
+
+class VitalSignsStoreIntegrationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient, department=cls.department, main_symptom="Fever"
+        )
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings = override_settings(VITALS_STORE_PATH=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_login(self.user)
+
+    def vitals_data(self, heart_rate):
+        return {
+            "systolic_blood_pressure": 120,
+            "diastolic_blood_pressure": 80,
+            "respiratory_rate": 16,
+            "oxygen_saturation": 98,
+            "temperature": "36.6",
+            "heart_rate": heart_rate,
+        }
+
+    def test_views_mirror_readings_into_the_store(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse(
+                    "department:vitals_create",
+                    args=[self.patient.id, self.hospitalization.id],
+                ),
+                self.vitals_data(70),
+            )
+        vital = VitalSigns.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse(
+                    "department:vitals_update",
+                    args=[self.patient.id, self.hospitalization.id, vital.id],
+                ),
+                self.vitals_data(95),
+            )
+        records = timeseries.get_store().read(self.hospitalization.id)
+        self.assertEqual(records["heart_rate"].tolist(), [95])
+
+    def test_ingestion_mirrors_readings_into_the_store(self):
+        readings = [
+            dict(self.vitals_data(rate), hospitalization=str(self.hospitalization.id))
+            for rate in (60, 61, 62)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("department:vitals_ingest"),
+                readings,
+                content_type="application/json",
+            )
+        self.assertEqual(response.json()["created"], 3)
+        records = timeseries.get_store().read(self.hospitalization.id)
+        self.assertEqual(sorted(records["heart_rate"].tolist()), [60, 61, 62])
+
+    def test_backfill_command(self):
+        VitalSigns.objects.bulk_create(
+            [
+                VitalSigns(
+                    hospitalization=self.hospitalization,
+                    created_by=self.user,
+                    **self.vitals_data(rate),
+                )
+                for rate in range(60, 70)
+            ]
+        )
+        out = StringIO()
+        call_command("backfill_vitals_store", "--batch-size", "4", stdout=out)
+        self.assertIn("Copied 10", out.getvalue())
+        # Copying twice neither fails nor duplicates readings
+        call_command("backfill_vitals_store", stdout=out)
+        records = timeseries.get_store().read(self.hospitalization.id)
+        self.assertEqual(sorted(records["heart_rate"].tolist()), list(range(60, 70)))
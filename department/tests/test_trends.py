@@ -0,0 +1,191 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from django.test import TestCase
+from django.urls import reverse
+
+from department.models import Department, Hospitalization, VitalSigns
+from department.trends import (
+    InvalidTrend,
+    bucket_bounds,
+    bucket_summary,
+    lttb,
+    parse_bucket,
+)
+from main.models import User
+from patient.models import Patient
+
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+class TrendMathTest(TestCase):
+    def test_parse_bucket(self):
+        self.assertEqual(parse_bucket("5m"), 5 * 60 * 1_000_000)
+        self.assertEqual(parse_bucket("1d"), 24 * 60 * 60 * 1_000_000)
+        for value in ("", "0h", "5s", "h"):
+            with self.assertRaises(InvalidTrend):
+                parse_bucket(value)
+
+    def test_bucket_summary_matches_a_plain_loop(self):
+        rng = np.random.default_rng(1)
+        minutes = np.sort(rng.choice(600, 300, replace=False))
+        times = np.datetime64("2024-03-01T00:00", "us") + minutes.astype(
+            "m8[m]"
+        ).astype("m8[us]")
+        values = rng.integers(40, 160, len(times))
+        bucket = parse_bucket("1h")
+        starts_at, starts, ends = bucket_bounds(times, bucket)
+        low, high, mean, last = bucket_summary(values, starts, ends)
+
+        expected = {}
+        for minute, value in zip(minutes, values):
+            expected.setdefault(minute // 60, []).append(value)
+        self.assertEqual(
+            starts_at.tolist(),
+            [
+                datetime(2024, 3, 1) + timedelta(hours=int(hour))
+                for hour in sorted(expected)
+            ],
+        )
+        for row, hour in enumerate(sorted(expected)):
+            bucket_values = expected[hour]
+            self.assertEqual(low[row], min(bucket_values))
+            self.assertEqual(high[row], max(bucket_values))
+            self.assertAlmostEqual(mean[row], sum(bucket_values) / len(bucket_values))
+            self.assertEqual(last[row], bucket_values[-1])
+
+    def test_lttb_keeps_ends_and_peaks(self):
+        times = np.arange(1000).astype("M8[m]").astype("M8[us]")
+        values = np.full(1000, 70.0)
+        values[437] = 180
+        [kept] = lttb(times, values, 20)
+        self.assertEqual(len(kept), 20)
+        self.assertEqual(kept[0], 0)
+        self.assertEqual(kept[-1], 999)
+        self.assertIn(437, kept)
+        self.assertTrue(np.all(np.diff(kept) > 0))
+
+    def test_lttb_returns_everything_when_short(self):
+        times = np.arange(5).astype("M8[m]").astype("M8[us]")
+        self.assertEqual(lttb(times, np.arange(5), 10).tolist(), [[0, 1, 2, 3, 4]])
+
+    def test_lttb_series_are_independent(self):
+        times = np.arange(300).astype("M8[m]").astype("M8[us]")
+        rng = np.random.default_rng(2)
+        first, second = rng.normal(size=300), rng.normal(size=300)
+        together = lttb(times, [first, second], 30)
+        self.assertEqual(together[0].tolist(), lttb(times, first, 30)[0].tolist())
+        self.assertEqual(together[1].tolist(), lttb(times, second, 30)[0].tolist())
+
+
+class VitalsTrendViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=patient, department=department, main_symptom="Fever"
+        )
+        # Every 20 minutes for three hours, heart rate rising by one per reading
+        for number in range(9):
+            vital = VitalSigns.objects.create(
+                hospitalization=cls.hospitalization,
+                created_by=cls.user,
+                systolic_blood_pressure=120,
+                diastolic_blood_pressure=80,
+                respiratory_rate=16,
+                oxygen_saturation=98,
+                temperature="36.6",
+                heart_rate=70 + number,
+            )
+            VitalSigns.objects.filter(id=vital.id).update(
+                created_at=START + timedelta(minutes=20 * number)
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def trend(self, **params):
+        return self.client.get(
+            reverse("department:vitals_trend", args=[self.hospitalization.id]), params
+        )
+
+    def test_authentication_required(self):
+        self.client.logout()
+        self.assertEqual(self.trend().status_code, 302)
+
+    def test_hourly_buckets(self):
+        response = self.trend(bucket="1h", fields="heart_rate,temperature")
+        self.assertEqual(response.status_code, 200)
+        trend = response.json()
+        self.assertEqual(trend["readings"], 9)
+        self.assertEqual(
+            trend["buckets"],
+            ["2024-03-01T00:00:00Z", "2024-03-01T01:00:00Z", "2024-03-01T02:00:00Z"],
+        )
+        self.assertEqual(
+            trend["series"]["heart_rate"],
+            {
+                "min": [70, 73, 76],
+                "max": [72, 75, 78],
+                "mean": [71, 74, 77],
+                "last": [72, 75, 78],
+            },
+        )
+        self.assertEqual(trend["series"]["temperature"]["mean"], [36.6, 36.6, 36.6])
+        self.assertEqual(set(trend["series"]), {"heart_rate", "temperature"})
+
+    def test_time_range(self):
+        trend = self.trend(
+            bucket="1d", start="2024-03-01T01:00:00Z", end="2024-03-01T02:00:00Z"
+        ).json()
+        self.assertEqual(trend["readings"], 3)
+        self.assertEqual(trend["series"]["heart_rate"]["last"], [75])
+
+    def test_downsampling(self):
+        trend = self.trend(points=4, fields="heart_rate").json()
+        series = trend["series"]["heart_rate"]
+        self.assertEqual(len(series["value"]), 4)
+        self.assertEqual(series["time"][0], "2024-03-01T00:00:00Z")
+        self.assertEqual(series["value"][-1], 78)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {"bucket": "5s"},
+            {"points": "1"},
+            {"points": "many"},
+            {"fields": "pulse"},
+            {"start": "yesterday"},
+        ):
+            response = self.trend(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("error", response.json())
+
+    def test_unknown_hospitalization(self):
+        response = self.client.get(
+            reverse("department:vitals_trend", args=[self.user.id])
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,61 @@
+from django.core.cache import caches
+from django.urls import reverse
+
+from department.cache import CACHE_ALIAS
+from department.models import Hospitalization
+from department.services import CHART_SECTIONS
+from main.testing import SyntheticHospitalTestCase
+
+
+class WardPagesAtVolumeTest(SyntheticHospitalTestCase):
+    # Query counts of the ward pages on the synthetic hospital, where a query per row
+    # would show up as hundreds of queries
+    hospital_size = {"departments": 2, "patients": 150}
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.client.force_login(self.nurse)
+
+    def test_dataset_has_volume(self):
+        self.assertGreater(self.hospital_counts["VitalSigns"], 1000)
+        self.assertGreater(self.hospitalization.vitalsigns_set.count(), 20)
+        self.assertTrue(
+            Hospitalization.objects.filter(
+                department=self.department, is_discharged=False
+            ).exists()
+        )
+
+    def test_hospitalization_page(self):
+        # Session and user lookups, the hospitalization, the section versions, then
+        # one query per section rendered into the fragment cache
+        with self.assertNumQueries(2 + 1 + 1 + len(CHART_SECTIONS)):
+            response = self.client.get(
+                reverse("department:hospitalization", args=[self.hospitalization.id])
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_department_pages(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("department:department_list"))
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                reverse("department:department_detail", args=[self.department.id])
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_patient_page(self):
+        patient = self.hospitalization.patient
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("patient:detail", args=[patient.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_vitals_trend(self):
+        with self.assertNumQueries(2 + 2):
+            response = self.client.get(
+                reverse("department:vitals_trend", args=[self.hospitalization.id]),
+                {"bucket": "1d"},
+            )
+        self.assertEqual(
+            response.json()["readings"], self.hospitalization.vitalsigns_set.count()
+        )
@@ -0,0 +1,173 @@
+import datetime
+import shutil
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+# One packed record per reading, 36 bytes against a few hundred for a table row
+RECORD = np.dtype(
+    [
+        ("id", "S16"),
+        ("recorded_at", "<M8[us]"),
+        ("respiratory_rate", "u1"),
+        ("oxygen_saturation", "u1"),
+        ("systolic_blood_pressure", "<u2"),
+        ("diastolic_blood_pressure", "<u2"),
+        ("heart_rate", "<u2"),
+        ("temperature", "<f4"),
+    ]
+)
+MEASUREMENTS = RECORD.names[2:]
+CHUNK_SUFFIX = ".vitals"
+
+
+def to_datetime64(value):
+    # Aware datetimes are stored as naive UTC microseconds
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "us")
+
+
+def reading_id(value):
+    # NumPy drops trailing zero bytes of fixed-size strings, so they are padded back
+    return uuid.UUID(bytes=bytes(value).ljust(16, b"\0"))
+
+
+def pack(vital_signs):
+    # Packs VitalSigns instances into an array of records
+    records = np.empty(len(vital_signs), dtype=RECORD)
+    records["id"] = [vital.id.bytes for vital in vital_signs]
+    records["recorded_at"] = [to_datetime64(vital.created_at) for vital in vital_signs]
+    for field in MEASUREMENTS:
+        records[field] = [float(getattr(vital, field)) for vital in vital_signs]
+    return records
+
+
+class VitalSignsStore:
+    # Append-only columnar history of vital signs on local disk.
+    # Every hospitalization has a directory with one chunk of packed records per UTC day,
+    # so a time range only reads the days it covers. Corrections are appended as new
+    # records of the same reading and the last one wins when reading.
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _directory(self, hospitalization_id):
+        return self.root / str(hospitalization_id)
+
+    def _chunk(self, hospitalization_id, day):
+        return self._directory(hospitalization_id) / f"{day.isoformat()}{CHUNK_SUFFIX}"
+
+    def append(self, vital_signs):
+        # Appends readings to the chunks of their hospitalizations and days
+        if not vital_signs:
+            return 0
+        records = pack(vital_signs)
+        days = records["recorded_at"].astype("M8[D]").astype(object)
+        chunks = defaultdict(list)
+        for row, vital in enumerate(vital_signs):
+            chunks[self._chunk(vital.hospitalization_id, days[row])].append(row)
+        with self._lock:
+            for path, rows in chunks.items():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # A single write per chunk keeps appends of other processes from interleaving
+                with open(path, "ab") as chunk:
+                    chunk.write(records[rows].tobytes())
+        return len(records)
+
+    def _read_chunk(self, path):
+        data = path.read_bytes()
+        # A write cut short by a crash leaves a partial record at the end
+        whole = len(data) - len(data) % RECORD.itemsize
+        return np.frombuffer(data, dtype=RECORD, count=whole // RECORD.itemsize)
+
+    def read(self, hospitalization_id, start=None, end=None):
+        # Readings of a hospitalization recorded in [start, end), oldest first, as an
+        # array of records whose fields are the columns: read(...)["heart_rate"]
+        directory = self._directory(hospitalization_id)
+        if not directory.is_dir():
+            return np.empty(0, dtype=RECORD)
+        first_day = None if start is None else to_datetime64(start).astype("M8[D]")
+        last_day = None if end is None else to_datetime64(end).astype("M8[D]")
+        chunks = []
+        for path in sorted(directory.glob(f"*{CHUNK_SUFFIX}")):
+            day = np.datetime64(path.name[: -len(CHUNK_SUFFIX)], "D")
+            if first_day is not None and day < first_day:
+                continue
+            if last_day is not None and day > last_day:
+                continue
+            chunks.append(self._read_chunk(path))
+        if not chunks:
+            return np.empty(0, dtype=RECORD)
+        records = np.concatenate(chunks)
+        selected = np.ones(len(records), dtype=bool)
+        if start is not None:
+            selected &= records["recorded_at"] >= to_datetime64(start)
+        if end is not None:
+            selected &= records["recorded_at"] < to_datetime64(end)
+        records = records[selected]
+        records = records[np.argsort(records["recorded_at"], kind="stable")]
+        # A correction keeps the time of the reading it replaces, so readings can only
+        # repeat where times do
+        times = records["recorded_at"]
+        if len(records) and np.any(times[1:] == times[:-1]):
+            records = self._latest(records)
+        return records
+
+    def _latest(self, records):
+        # Keeps the last appended record of every reading, in time order
+        _, last = np.unique(records["id"][::-1], return_index=True)
+        kept = np.sort(len(records) - 1 - last)
+        return records[kept]
+
+    def hospitalizations(self):
+        if not self.root.is_dir():
+            return []
+        return [uuid.UUID(path.name) for path in self.root.iterdir() if path.is_dir()]
+
+    def drop(self, hospitalization_id):
+        with self._lock:
+            shutil.rmtree(self._directory(hospitalization_id), ignore_errors=True)
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+_stores = {}
+
+
+def get_store():
+    # The store configured by VITALS_STORE_PATH, or None when the store is disabled
+    root = getattr(settings, "VITALS_STORE_PATH", None)
+    if not root:
+        return None
+    if root not in _stores:
+        _stores[root] = VitalSignsStore(root)
+    return _stores[root]
+
+
+def record_on_commit(vital_signs):
+    # Mirrors saved readings into the store once the current transaction commits
+    store = get_store()
+    if store is not None and vital_signs:
+        vital_signs = list(vital_signs)
+        transaction.on_commit(lambda: store.append(vital_signs))
+
+
+def drop_on_commit(hospitalization_ids):
+    store = get_store()
+    if store is not None:
+        hospitalization_ids = list(hospitalization_ids)
+
+        def drop():
+            for hospitalization_id in hospitalization_ids:
+                store.drop(hospitalization_id)
+
+        transaction.on_commit(drop)
@@ -0,0 +1,183 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from . import timeseries
+from .models import VitalSigns
+
+MAX_POINTS = 5000
+BUCKET_UNITS = {"m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+BUCKET_PATTERN = re.compile(r"^(\d+)([mhd])$")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class InvalidTrend(ValueError):
+    pass
+
+
+def parse_bucket(value):
+    # "5m", "1h" or "1d" as a number of microseconds
+    match = BUCKET_PATTERN.match(value or "")
+    if match is None or int(match.group(1)) == 0:
+        raise InvalidTrend("The bucket must look like 5m, 1h or 1d.")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)] * 1_000_000
+
+
+def parse_points(value):
+    try:
+        points = int(value)
+    except (TypeError, ValueError):
+        raise InvalidTrend("The number of points must be a whole number.")
+    if not 3 <= points <= MAX_POINTS:
+        raise InvalidTrend(f"The number of points must be between 3 and {MAX_POINTS}.")
+    return points
+
+
+def parse_moment(value):
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise InvalidTrend(f"{value!r} is not a date and time.")
+    if is_naive(moment):
+        moment = make_aware(moment)
+    return moment
+
+
+def parse_fields(value):
+    if not value:
+        return timeseries.MEASUREMENTS
+    fields = tuple(value.split(","))
+    unknown = set(fields) - set(timeseries.MEASUREMENTS)
+    if unknown:
+        raise InvalidTrend(f"Unknown vital signs: {', '.join(sorted(unknown))}.")
+    return fields
+
+
+def load_series(hospitalization_id, start=None, end=None, fields=None):
+    # Readings of a hospitalization recorded in [start, end), oldest first, as records
+    # with microsecond timestamps. Served by the columnar store when it is enabled;
+    # otherwise only the wanted fields are read from the table.
+    store = timeseries.get_store()
+    if store is not None:
+        return store.read(hospitalization_id, start, end)
+    fields = fields or timeseries.MEASUREMENTS
+    readings = VitalSigns.objects.filter(hospitalization_id=hospitalization_id)
+    if start is not None:
+        readings = readings.filter(created_at__gte=start)
+    if end is not None:
+        readings = readings.filter(created_at__lt=end)
+    rows = list(readings.order_by("created_at").values_list("created_at", *fields))
+    records = np.zeros(len(rows), dtype=timeseries.RECORD)
+    if rows:
+        created_at, *columns = zip(*rows)
+        # Integer microseconds convert far faster than datetime objects
+        records["recorded_at"] = np.array(
+            [(value - EPOCH) // MICROSECOND for value in created_at], dtype=np.int64
+        ).astype("M8[us]")
+        for field, column in zip(fields, columns):
+            records[field] = np.array(column, dtype=np.float64)
+    return records
+
+
+def bucket_bounds(times, bucket):
+    # Groups sorted times into buckets of `bucket` microseconds aligned on multiples of
+    # their size since the epoch. Returns the start time, first row and end row of every
+    # non-empty bucket.
+    buckets = times.astype(np.int64) // bucket
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)]
+    return (buckets[starts] * bucket).astype("M8[us]"), starts, ends
+
+
+def bucket_summary(values, starts, ends):
+    # Min, max, mean and last value of every bucket
+    values = values.astype(np.float64)
+    return (
+        np.minimum.reduceat(values, starts),
+        np.maximum.reduceat(values, starts),
+        np.add.reduceat(values, starts) / (ends - starts),
+        values[ends - 1],
+    )
+
+
+def lttb(times, values, points):
+    # Largest-Triangle-Three-Buckets downsampling to `points` samples. Keeps the first
+    # and last sample and from every bucket in between the one forming the largest
+    # triangle with the previously kept sample and the average of the next bucket.
+    # `values` holds one series per row, all downsampled in the same pass.
+    # Returns the indexes of the kept samples of every series.
+    y = np.atleast_2d(values).astype(np.float64)
+    series, count = y.shape
+    if points >= count:
+        return np.tile(np.arange(count), (series, 1))
+    x = times.astype(np.int64).astype(np.float64)
+    edges = np.floor(np.linspace(1, count - 1, points - 1)).astype(np.intp)
+    # Averages of the bucket following each bucket; the last one is the final sample
+    sizes = np.diff(np.r_[edges[1:], count])
+    average_x = np.add.reduceat(x, edges[1:]) / sizes
+    average_y = np.add.reduceat(y, edges[1:], axis=1) / sizes
+    rows = np.arange(series)
+    kept = np.empty((series, points), dtype=np.intp)
+    kept[:, 0] = 0
+    kept[:, -1] = count - 1
+    previous = kept[:, 0].copy()
+    for bucket in range(points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        kept_x = x[previous][:, None]
+        kept_y = y[rows, previous][:, None]
+        areas = np.abs(
+            (kept_x - average_x[bucket]) * (y[:, start:stop] - kept_y)
+            - (kept_x - x[start:stop]) * (average_y[:, bucket, None] - kept_y)
+        )
+        previous = start + np.argmax(areas, axis=1)
+        kept[:, bucket + 1] = previous
+    return kept
+
+
+def _timestamps(times):
+    return np.datetime_as_string(times, unit="s", timezone="UTC").tolist()
+
+
+def _numbers(values):
+    return np.round(values, 2).tolist()
+
+
+def summarize(records, fields, bucket):
+    # The bucket starts and the min, max, mean and last value of every field per bucket
+    if not len(records):
+        empty = {"min": [], "max": [], "mean": [], "last": []}
+        return {"buckets": [], "series": {field: empty for field in fields}}
+    times, starts, ends = bucket_bounds(records["recorded_at"], bucket)
+    summary = {}
+    for field in fields:
+        low, high, mean, last = bucket_summary(records[field], starts, ends)
+        summary[field] = {
+            "min": _numbers(low),
+            "max": _numbers(high),
+            "mean": _numbers(mean),
+            "last": _numbers(last),
+        }
+    return {"buckets": _timestamps(times), "series": summary}
+
+
+def downsample(records, fields, points):
+    # Every field downsampled to at most `points` readings with their times
+    times = records["recorded_at"]
+    kept = lttb(times, [records[field] for field in fields], points)
+    return {
+        "series": {
+            field: {
+                "time": _timestamps(times[indexes]),
+                "value": _numbers(records[field][indexes]),
+            }
+            for field, indexes in zip(fields, kept)
+        }
+    }
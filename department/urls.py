@@ -5,10 +5,14 @@ app_name = "department"
 
 urlpatterns = [
     path("list/", views.department_list, name="department_list"),
+    path("census/", views.department_census_json, name="census"),
+    path("cache-stats/", views.dashboard_cache_stats, name="cache_stats"),
+    path("export/", views.export_hospitalizations, name="hospitalizations_export"),
     path("create/", views.create_department, name="create_department"),
     path("<uuid:department_id>/edit/", views.update_department, name="update_department"),
     path("<uuid:department_id>/delete/", views.delete_department, name="delete_department"),
     path("<uuid:department_id>/", views.department_detail, name="department_detail"),
+    path("<uuid:department_id>/alerts/", views.department_alerts, name="alerts"),
     path("<uuid:patient_id>/admit-patient/", views.admit_patient, name="admit_patient"),
     path(
         "<uuid:hospitalization_id>/hospitalization/",
@@ -55,6 +59,21 @@ urlpatterns = [
         views.create_vital_signs,
         name="vitals_create",
     ),
+    path(
+        "<uuid:hospitalization_id>/hospitalization/export/",
+        views.export_hospitalization,
+        name="hospitalization_export",
+    ),
+    path(
+        "<uuid:hospitalization_id>/hospitalization/vital-signs-trend/",
+        views.vitals_trend,
+        name="vitals_trend",
+    ),
+    path(
+        "vital-signs/ingest/",
+        views.ingest_vital_signs_batch,
+        name="vitals_ingest",
+    ),
     path(
         "<uuid:patient_id>/<uuid:hospitalization_id>/vital-signs-edit/<uuid:vital_id>/",
         views.update_vital_signs,
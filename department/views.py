@@ -1,10 +1,24 @@
 from datetime import datetime
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import redirect, render, get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.urls import reverse
 
+from .cache import (
+    CACHE_ALIAS,
+    achart_fragments,
+    adepartment_roster,
+    fragment_stats,
+    invalidate_departments,
+    stats as cache_stats,
+)
 from .forms import (
     ConsultationForm,
     DepartmentForm,
@@ -15,38 +29,44 @@ from .forms import (
     VitalSignsForm,
 )
 from .models import Consultation, Department, Hospitalization, Observation, VitalSigns
-from patient.models import Patient
-from scales.models import (
-    BodyMassIndex,
-    GlasgowComaScale,
-    NewsScale,
-    NortonScale,
-    PainScale,
+from . import timeseries
+from .export import EXPORT_FORMATS, aexport_stream, export_stream, stays_between
+from .trends import (
+    InvalidTrend,
+    downsample,
+    load_series,
+    parse_bucket,
+    parse_fields,
+    parse_moment,
+    parse_points,
+    summarize,
 )
+from .services import (
+    InvalidBatch,
+    aload_hospitalization,
+    department_census,
+    derive_news_scores,
+    duration_in_hours,
+    ingest_vital_signs,
+    parse_readings,
+    record_admission,
+    record_admission_history,
+    record_discharge,
+    record_transfer,
+    rescore_derived_news,
+)
+from main.decorators import async_login_required
+from patient.models import Patient
+from scales.alerts import alert_events, streams_alerts
 
 
-@login_required(login_url="/login/")
-def hospitalization_detail(request, hospitalization_id):
+@async_login_required(login_url="/login/")
+async def hospitalization_detail(request, hospitalization_id):
     # Retrieves details of a specific hospitalization, including related consultations, scales, and vitals.
-    hospitalization = get_object_or_404(Hospitalization, id=hospitalization_id)
-    consultations = Consultation.objects.filter(hospitalization=hospitalization)
-    bmis = BodyMassIndex.objects.filter(hospitalization=hospitalization)
-    observations = Observation.objects.filter(hospitalization=hospitalization)
-    norton_scales = NortonScale.objects.filter(hospitalization=hospitalization)
-    glasgow_scales = GlasgowComaScale.objects.filter(hospitalization=hospitalization)
-    news_scales = NewsScale.objects.filter(hospitalization=hospitalization)
-    pain_scales = PainScale.objects.filter(hospitalization=hospitalization)
-    vitals = VitalSigns.objects.filter(hospitalization=hospitalization)
+    hospitalization = await aload_hospitalization(hospitalization_id)
     context = {
-        "bmis": bmis,
-        "consultations": consultations,
-        "glasgow_scales": glasgow_scales,
         "hospitalization": hospitalization,
-        "observations": observations,
-        "news_scales": news_scales,
-        "norton_scales": norton_scales,
-        "pain_scales": pain_scales,
-        "vitals": vitals,
+        "fragments": await achart_fragments(hospitalization, request.user),
         "title": "Hospitalization Detail",
         "back_url": reverse("patient:detail", args=[hospitalization.patient.id]),
     }
@@ -67,7 +87,10 @@ def admit_patient(request, patient_id):
             department = get_object_or_404(Department, id=department_id)
             hospitalization.patient = patient
             hospitalization.department = department
-            hospitalization.save()
+            with transaction.atomic():
+                hospitalization.save()
+                record_admission(hospitalization)
+                invalidate_departments(department.id)
             return redirect("department:department_detail", department_id)
     else:
         form = HospitalizationForm()
@@ -103,6 +126,8 @@ def edit_patient_symptoms(request, hospitalization_id, patient_id):
             hospitalization.department = hospitalization.department
 
             hospitalization.save()
+            if not hospitalization.is_discharged:
+                invalidate_departments(hospitalization.department_id)
             return redirect(
                 "department:hospitalization", hospitalization_id
             )
@@ -134,8 +159,17 @@ def transfer_patient(request, patient_id, hospitalization_id):
         form = TransferPatientForm(request.POST)
         if form.is_valid():
             new_department = form.cleaned_data["department"]
-            hospitalization.department = new_department
-            hospitalization.save()
+            with transaction.atomic():
+                # Lock the stay so concurrent transfers see its latest department
+                previous_department_id = (
+                    Hospitalization.objects.select_for_update()
+                    .values_list("department_id", flat=True)
+                    .get(id=hospitalization.id)
+                )
+                hospitalization.department = new_department
+                hospitalization.save()
+                record_transfer(hospitalization, previous_department_id)
+                invalidate_departments(previous_department_id, new_department.id)
             return redirect("department:department_detail", new_department.id)
     else:
         form = TransferPatientForm()
@@ -162,9 +196,19 @@ def discharge_patient(request, hospitalization_id):
             discharge_date = form.cleaned_data["discharge_date"]
             discharge_time = form.cleaned_data["discharge_time"]
             discharge_datetime = datetime.combine(discharge_date, discharge_time)
-            hospitalization.discharged_on = discharge_datetime
-            hospitalization.is_discharged = True
-            hospitalization.save()
+            with transaction.atomic():
+                # Lock the stay so a repeated submission is not counted twice
+                was_discharged = (
+                    Hospitalization.objects.select_for_update()
+                    .values_list("is_discharged", flat=True)
+                    .get(id=hospitalization.id)
+                )
+                hospitalization.discharged_on = discharge_datetime
+                hospitalization.is_discharged = True
+                hospitalization.save()
+                if not was_discharged:
+                    record_discharge(hospitalization)
+                    invalidate_departments(hospitalization.department_id)
             return redirect(
                 "department:department_detail", hospitalization.department.id
             )
@@ -185,18 +229,18 @@ def discharge_patient(request, hospitalization_id):
     return render(request, "discharge_patient.html", context)
 
 
-@login_required(login_url="/login/")
-def department_detail(request, department_id):
+@async_login_required(login_url="/login/")
+async def department_detail(request, department_id):
     # Displays details of a specific department, including current hospitalizations.
-    department = get_object_or_404(Department, id=department_id)
-    hospitalizations = Hospitalization.objects.filter(
-        department__id=department_id, is_discharged=False
-    )
-    num_admitted_patients = hospitalizations.count()
+    department = await aget_object_or_404(Department, id=department_id)
+    hospitalizations, census = await adepartment_roster(department.id)
+    num_admitted_patients = len(hospitalizations)
 
     context = {
+        "census": census,
         "department": department,
         "hospitalizations": hospitalizations,
+        "live_alerts": streams_alerts(request),
         "num_admitted_patients": num_admitted_patients,
         "title": "Department Detail",
     }
@@ -268,7 +312,17 @@ def delete_department(request, department_id):
     department = get_object_or_404(Department, id=department_id)
     name = f"{department.name} Department"
     if request.method == "POST":
-        department.delete()
+        with transaction.atomic():
+            stays = list(
+                department.hospitalization_set.values_list("id", "patient_id")
+            )
+            hospitalization_ids = [stay_id for stay_id, _ in stays]
+            patient_ids = {patient_id for _, patient_id in stays}
+            department.delete()
+            # The deleted stays no longer count towards their patients' history
+            for patient_id in patient_ids:
+                record_admission_history(patient_id)
+        timeseries.drop_on_commit(hospitalization_ids)
         return redirect("department:department_list")
     back_url = reverse("department:department_detail", args=[department.id])
     context= {
@@ -280,36 +334,129 @@ def delete_department(request, department_id):
     return render(request, "confirm_delete.html", context)
 
 
-@login_required(login_url="/login/")
-def department_list(request):
-    # Retrieve a list of all departments and count the total and individual admitted patients.
-    departments = Department.objects.all()
-    # Count the total number of admitted patients
-    total_admitted_patients = Hospitalization.objects.filter(
-        is_discharged=False
-    ).count()
-    # Count the number of patients admitted in each department
-    department_counts = (
-        {}
-    )  
+@async_login_required(login_url="/login/")
+async def department_list(request):
+    # Retrieve a list of all departments with their census and the total of admitted patients.
+    departments = [department async for department in department_census()]
+    department_counts = {}
 
     for department in departments:
-        department_count = Hospitalization.objects.filter(
-            department=department, is_discharged=False
-        ).count()
-        setattr(department, "count", department_count)
-
-        department_counts[department.id] = department_count
+        setattr(department, "count", department.admitted)
+        setattr(
+            department,
+            "mean_length_of_stay_hours",
+            duration_in_hours(department.mean_length_of_stay),
+        )
+        department_counts[department.id] = department.admitted
 
     context = {
         "departments": departments,
         "department_counts": department_counts,
         "title": "Department List",
-        "total_admitted_patients": total_admitted_patients,
+        "total_admitted_patients": sum(department_counts.values()),
     }
     return render(request, "department_list.html", context)
 
 
+@async_login_required(login_url="/login/")
+async def department_alerts(request, department_id):
+    # Streams the early-warning alerts of a department to ward screens as Server-Sent Events.
+    department = await aget_object_or_404(Department, id=department_id)
+    if not streams_alerts(request):
+        # 204 tells EventSource clients to stop reconnecting
+        return HttpResponse(status=204)
+    return StreamingHttpResponse(
+        alert_events(department.id),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _export_response(request, stays, filename):
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse(
+            {"error": f"Unknown format, use one of: {', '.join(EXPORT_FORMATS)}."},
+            status=400,
+        )
+    # A WSGI server iterates the response in its worker thread and would collect an
+    # async stream whole before sending it, so it gets a synchronous one
+    stream = aexport_stream if isinstance(request, ASGIRequest) else export_stream
+    return StreamingHttpResponse(
+        stream(stays, export_format),
+        content_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format}"'
+        },
+    )
+
+
+@async_login_required(login_url="/login/")
+async def export_hospitalization(request, hospitalization_id):
+    # Streams the full record of a hospitalization as CSV, or as NDJSON with ?format=ndjson.
+    hospitalization = await aget_object_or_404(Hospitalization, id=hospitalization_id)
+    stays = Hospitalization.objects.filter(id=hospitalization.id)
+    return _export_response(request, stays, f"hospitalization-{hospitalization.id}")
+
+
+@async_login_required(login_url="/login/")
+async def export_hospitalizations(request):
+    # Streams the full records of every stay between ?from= and ?to= (YYYY-MM-DD).
+    if request.user.profession != "admins":
+        return redirect("access_denied")
+    try:
+        first_day = parse_date(request.GET.get("from", ""))
+        last_day = parse_date(request.GET.get("to", ""))
+    except ValueError:
+        first_day = last_day = None
+    if first_day is None or last_day is None or first_day > last_day:
+        return JsonResponse(
+            {"error": "Give the range as ?from=YYYY-MM-DD&to=YYYY-MM-DD."}, status=400
+        )
+    return _export_response(
+        request,
+        stays_between(first_day, last_day),
+        f"hospitalizations-{first_day}-{last_day}",
+    )
+
+
+@login_required(login_url="/login/")
+def dashboard_cache_stats(request):
+    # Returns the hit and miss counters of the dashboard cache and its chart fragments in this process.
+    return JsonResponse(
+        {
+            "backend": settings.CACHES[CACHE_ALIAS]["BACKEND"],
+            **cache_stats.snapshot(),
+            "fragments": fragment_stats.snapshot(),
+        }
+    )
+
+
+@login_required(login_url="/login/")
+def department_census_json(request):
+    # Returns the census of every department as JSON.
+    departments = []
+    for department in department_census():
+        departments.append(
+            {
+                "id": str(department.id),
+                "name": department.name,
+                "admitted": department.admitted,
+                "admitted_today": department.admitted_today,
+                "discharged_today": department.discharged_today,
+                "mean_length_of_stay_hours": duration_in_hours(
+                    department.mean_length_of_stay
+                ),
+            }
+        )
+
+    data = {
+        "departments": departments,
+        "total_admitted_patients": sum(item["admitted"] for item in departments),
+    }
+    return JsonResponse(data)
+
+
 @login_required(login_url="/login/")
 def create_patient_consultation(request, patient_id, hospitalization_id):
     # Handles the creation of a new patient consultation using a form.
@@ -469,7 +616,10 @@ def create_vital_signs(request, patient_id, hospitalization_id):
             vital = form.save(commit=False)
             vital.created_by = request.user
             vital.hospitalization = hospitalization
-            vital.save()
+            with transaction.atomic():
+                vital.save()
+                derive_news_scores([vital])
+                timeseries.record_on_commit([vital])
             return redirect("department:hospitalization", hospitalization.id)
     else:
 
@@ -484,6 +634,48 @@ def create_vital_signs(request, patient_id, hospitalization_id):
     return render(request, "scale_form.html", context)
 
 
+@login_required(login_url="/login/")
+@require_POST
+def ingest_vital_signs_batch(request):
+    # Stores a batch of bedside monitor readings for any number of hospitalizations.
+    # Valid readings are saved together; rejected ones are reported by their position.
+    if request.user.profession == "secretaries":
+        return JsonResponse({"error": "Access denied."}, status=403)
+    try:
+        readings = parse_readings(request.body, request.content_type)
+    except InvalidBatch as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    created, errors = ingest_vital_signs(readings, request.user)
+    return JsonResponse({"created": created, "errors": errors})
+
+
+@login_required(login_url="/login/")
+def vitals_trend(request, hospitalization_id):
+    # Returns the vital signs of a hospitalization for charts, either summarized per time
+    # bucket (?bucket=5m, 1h or 1d) or downsampled to ?points=N readings, within the
+    # optional ?start= and ?end= and for the optional comma separated ?fields=.
+    hospitalization = get_object_or_404(Hospitalization, id=hospitalization_id)
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+        start = parse_moment(request.GET.get("start"))
+        end = parse_moment(request.GET.get("end"))
+        if "points" in request.GET:
+            points = parse_points(request.GET["points"])
+        else:
+            bucket = parse_bucket(request.GET.get("bucket", "1h"))
+    except InvalidTrend as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    records = load_series(hospitalization.id, start, end, fields)
+    if "points" in request.GET:
+        trend = downsample(records, fields, points)
+    else:
+        trend = summarize(records, fields, bucket)
+    return JsonResponse(
+        {"hospitalization": str(hospitalization.id), "readings": len(records), **trend}
+    )
+
+
 @login_required(login_url="/login/")
 def update_vital_signs(request, patient_id, hospitalization_id, vital_id):
     # Handles the update the vital signs using a form.
@@ -501,7 +693,10 @@ def update_vital_signs(request, patient_id, hospitalization_id, vital_id):
     if request.method == "POST":
         form = VitalSignsForm(request.POST, instance=vital)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                rescore_derived_news(vital)
+                timeseries.record_on_commit([vital])
             return redirect("department:hospitalization", hospitalization.id)
     else:
         form = VitalSignsForm(instance=vital)
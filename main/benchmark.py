@@ -0,0 +1,323 @@
+import gc
+import importlib
+import random
+import statistics
+import threading
+import time
+import warnings
+
+from django.core.cache import caches
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from department.cache import CACHE_ALIAS
+from department.models import (
+    Consultation,
+    Department,
+    Hospitalization,
+    Observation,
+    VitalSigns,
+)
+from department.services import (
+    ingest_vital_signs,
+    record_admission,
+    record_discharge,
+)
+from main.synthetic import SyntheticHospital, clear_synthetic
+from patient import search
+from patient.models import Patient
+from scales.models import (
+    BodyMassIndex,
+    GlasgowComaScale,
+    NewsScale,
+    NortonScale,
+    PainScale,
+)
+
+URL_MODULES = ("department.urls", "patient.urls", "scales.urls")
+DATASETS = {
+    "small": {"departments": 2, "patients": 50},
+    "medium": {"departments": 5, "patients": 500},
+    "large": {"departments": 10, "patients": 2000},
+}
+# Views that cannot be timed as a plain GET request
+SKIPPED = {
+    "department:alerts": "streams events until the client disconnects",
+    "department:vitals_ingest": "accepts POST requests only",
+}
+QUERY_STRINGS = {
+    "department:hospitalizations_export": {"from": "2024-05-25", "to": "2024-06-01"},
+    "patient:search": {"q": "nowak"},
+}
+# Charting entries of the benchmarked stay, by the URL argument naming them
+ENTRY_ARGUMENTS = {
+    "consultation_id": Consultation,
+    "observation_id": Observation,
+    "vital_id": VitalSigns,
+    "bmi_id": BodyMassIndex,
+    "glasgow_id": GlasgowComaScale,
+    "news_id": NewsScale,
+    "norton_id": NortonScale,
+    "pain_id": PainScale,
+}
+
+
+def benchmarked_urls():
+    # (name, URL argument names) of every view of the benchmarked apps
+    urls = []
+    for module_name in URL_MODULES:
+        module = importlib.import_module(module_name)
+        for pattern in module.urlpatterns:
+            if isinstance(pattern, URLPattern):
+                name = f"{module.app_name}:{pattern.name}"
+                urls.append((name, list(pattern.pattern.converters)))
+    return urls
+
+
+def url_arguments(hospitalization):
+    # Values for every URL argument, all pointing at one stay and its charting
+    arguments = {
+        "department_id": hospitalization.department_id,
+        "patient_id": hospitalization.patient_id,
+        "hospitalization_id": hospitalization.id,
+    }
+    for argument, model in ENTRY_ARGUMENTS.items():
+        entry = model.objects.filter(hospitalization=hospitalization).first()
+        arguments[argument] = entry.id if entry else None
+    return arguments
+
+
+def busiest_stay():
+    # The stay with the most readings among those with every kind of charting,
+    # preferring admitted patients as the ward pages do
+    stays = (
+        Hospitalization.objects.filter(consultation__isnull=False)
+        .annotate(readings=Count("vitalsigns", distinct=True))
+        .order_by("-readings")
+    )
+    return stays.filter(is_discharged=False).first() or stays.first()
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+def content(response):
+    # The whole body; async streams are drained through the sync client, which warns
+    if not response.streaming:
+        return response.content
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return b"".join(response)
+
+
+def measure(client, url, params, repeat):
+    # The queries and bytes of a request made with empty caches, then the latency of
+    # repeated requests as a ward sees them, caches warm
+    caches[CACHE_ALIAS].clear()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+        body = content(response)
+    # Counted now, as later requests clear the query log the count is read from
+    query_count = len(queries)
+    timings = []
+    # Collections triggered by earlier views would land on whichever view runs next
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content(client.get(url, params))
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        gc.enable()
+    return {
+        "status": response.status_code,
+        "queries": query_count,
+        "bytes": len(body),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+    }
+
+
+def run_benchmarks(size, repeat=20, seed=0, until=None, progress=None):
+    # Loads a synthetic hospital of the given size into the current database and
+    # measures every view against it. Returns {url name: measurements}.
+    clear_synthetic()
+    hospital = SyntheticHospital(seed=seed, until=until)
+    hospital.generate(**size)
+    # The in-process search index is rebuilt from the new patients
+    search._backend = None
+    client = Client()
+    client.force_login(hospital.admin)
+    arguments = url_arguments(busiest_stay())
+
+    results = {}
+    for name, argument_names in benchmarked_urls():
+        if name in SKIPPED:
+            continue
+        kwargs = {argument: arguments[argument] for argument in argument_names}
+        if None in kwargs.values():
+            continue
+        url = reverse(name, kwargs=kwargs)
+        results[name] = measure(client, url, QUERY_STRINGS.get(name, {}), repeat)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def regressions(
+    baseline, results, latency_threshold=0.5, latency_floor_ms=5, bytes_threshold=0.1
+):
+    # Compares results with a baseline of the same dataset. Any extra query is a
+    # regression. Latency regresses past the threshold at p50 and twice it at p95, the
+    # tail being noisier, and only by more than the floor, so timer noise on fast views
+    # is ignored. Size regresses past its own threshold.
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["status"] != before["status"]:
+            found.append(f"{name}: status {before['status']} -> {result['status']}")
+        if result["queries"] > before["queries"]:
+            found.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+        for key, threshold in (
+            ("p50_ms", latency_threshold),
+            ("p95_ms", 2 * latency_threshold),
+        ):
+            allowed = max(before[key] * (1 + threshold), before[key] + latency_floor_ms)
+            if result[key] > allowed:
+                found.append(f"{name}: {key} {before[key]} -> {result[key]}")
+        if result["bytes"] > before["bytes"] * (1 + bytes_threshold):
+            found.append(f"{name}: {before['bytes']} -> {result['bytes']} bytes")
+    return found
+
+
+# Shares of charting transactions that admit or discharge a patient instead of
+# storing a monitor reading
+ADMISSION_SHARE = 0.1
+DISCHARGE_SHARE = 0.1
+
+
+def monitor_reading(rng, hospitalization_id):
+    return {
+        "hospitalization": str(hospitalization_id),
+        "systolic_blood_pressure": rng.randint(90, 160),
+        "diastolic_blood_pressure": rng.randint(50, 95),
+        "respiratory_rate": rng.randint(10, 26),
+        "oxygen_saturation": rng.randint(88, 100),
+        "temperature": f"{rng.uniform(35.8, 38.6):.1f}",
+        "heart_rate": rng.randint(50, 130),
+    }
+
+
+def admit(rng, patients, departments):
+    with transaction.atomic():
+        stay = Hospitalization.objects.create(
+            patient_id=rng.choice(patients),
+            department_id=rng.choice(departments),
+            main_symptom="Benchmark",
+        )
+        record_admission(stay)
+
+
+def discharge(hospitalization_id):
+    # As the discharge view does: the stay is read under lock before it is written
+    with transaction.atomic():
+        stay = Hospitalization.objects.select_for_update().get(id=hospitalization_id)
+        if not stay.is_discharged:
+            stay.is_discharged = True
+            stay.discharged_on = timezone.now()
+            stay.save()
+            record_discharge(stay)
+
+
+def chart_writes(user, stays, patients, departments, transactions, seed):
+    # One ward station committing transactions one after another: mostly a single
+    # bedside monitor reading with its derived NEWS, sometimes an admission or a
+    # discharge, which lock the department census. Returns (latencies in ms, failed
+    # transactions).
+    rng = random.Random(seed)
+    latencies = []
+    failed = 0
+    try:
+        for _ in range(transactions):
+            started = time.perf_counter()
+            draw = rng.random()
+            try:
+                if draw < ADMISSION_SHARE:
+                    admit(rng, patients, departments)
+                elif draw < ADMISSION_SHARE + DISCHARGE_SHARE:
+                    discharge(rng.choice(stays))
+                else:
+                    reading = monitor_reading(rng, rng.choice(stays))
+                    ingest_vital_signs([reading], user)
+            except DatabaseError:
+                # Typically a write lock not granted in time
+                failed += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        # Connections belong to this thread and would otherwise outlive it
+        connection.close()
+    return latencies, failed
+
+
+def measure_writes(user, threads, transactions, seed=0):
+    # Runs one charting station per thread at the same time against the stays of the
+    # current database and returns the committed write throughput
+    stays = list(
+        Hospitalization.objects.filter(is_discharged=False).values_list("id", flat=True)
+    )
+    patients = list(Patient.objects.values_list("id", flat=True))
+    departments = list(Department.objects.values_list("id", flat=True))
+    results = [None] * threads
+
+    def station(index):
+        results[index] = chart_writes(
+            user, stays, patients, departments, transactions, seed + index
+        )
+
+    workers = [
+        threading.Thread(target=station, args=[index]) for index in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    latencies = [
+        latency for station_latencies, _ in results for latency in station_latencies
+    ]
+    return {
+        "threads": threads,
+        "committed": len(latencies),
+        "failed": sum(failed for _, failed in results),
+        "per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+    }
+
+
+def run_write_benchmark(
+    thread_counts, transactions, size, seed=0, until=None, progress=None
+):
+    # Loads a synthetic hospital into the current database, then measures the write
+    # throughput of increasingly many concurrent charting stations. The tables must be
+    # visible to other threads, so this cannot run inside a test transaction.
+    clear_synthetic()
+    hospital = SyntheticHospital(seed=seed, until=until)
+    hospital.generate(**size)
+    results = []
+    for threads in thread_counts:
+        results.append(measure_writes(hospital.admin, threads, transactions, seed))
+        if progress:
+            progress(results[-1])
+    return results
@@ -0,0 +1,19 @@
+from functools import wraps
+
+from django.contrib.auth.views import redirect_to_login
+
+
+def async_login_required(login_url=None):
+    # login_required for async views. The user is resolved without blocking the event
+    # loop and stored on the request, so templates read it without touching the database.
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request.user = await request.auser()
+            if not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path(), login_url)
+            return await view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,118 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from main.benchmark import DATASETS, run_write_benchmark
+from main.testing import SYNTHETIC_UNTIL
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the write throughput of concurrent charting stations against the "
+        "configured database, in a throwaway test database, and compares it with "
+        "results recorded for other database profiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            nargs="+",
+            type=int,
+            default=[1, 2, 4, 8],
+            help="Concurrent stations of each run.",
+        )
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=100,
+            help="Transactions committed by each station.",
+        )
+        parser.add_argument("--dataset", choices=DATASETS, default="small")
+        parser.add_argument("--results", default="benchmarks/db_writes.json")
+        parser.add_argument(
+            "--save",
+            action="store_true",
+            help="Record the results for this database profile in the results file.",
+        )
+
+    def handle(self, *args, **options):
+        if options["transactions"] < 1 or min(options["threads"]) < 1:
+            raise CommandError("Run at least one station and one transaction.")
+        profile = settings.DATABASE_PROFILE
+        self.stdout.write(f"{profile}: {DATASETS[options['dataset']]}")
+        results = self.run(
+            options["threads"], options["transactions"], DATASETS[options["dataset"]]
+        )
+
+        results_path = Path(options["results"])
+        recorded = {}
+        if results_path.exists():
+            recorded = json.loads(results_path.read_text())["databases"]
+        for other, other_results in sorted(recorded.items()):
+            if other != profile:
+                self.compare(profile, results, other, other_results)
+
+        if options["save"]:
+            recorded[profile] = results
+            results_path.parent.mkdir(parents=True, exist_ok=True)
+            results_path.write_text(
+                json.dumps({"databases": recorded}, indent=2, sort_keys=True) + "\n"
+            )
+            self.stdout.write(self.style.SUCCESS(f"Results written to {results_path}."))
+
+    def run(self, thread_counts, transactions, size):
+        # The stations need committed data visible to every thread. An in-memory SQLite
+        # test database locks whole tables between threads, so SQLite is measured on a
+        # file the way it is deployed.
+        connection = connections[DEFAULT_DB_ALIAS]
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == "sqlite":
+                connection.settings_dict["TEST"]["NAME"] = str(
+                    Path(directory) / "bench_db_writes.sqlite3"
+                )
+            setup_test_environment(debug=False)
+            databases = setup_databases(verbosity=0, interactive=False)
+            try:
+                with override_settings(VITALS_STORE_PATH=None):
+                    return run_write_benchmark(
+                        thread_counts,
+                        transactions,
+                        size,
+                        until=SYNTHETIC_UNTIL,
+                        progress=self.progress,
+                    )
+            finally:
+                teardown_databases(databases, verbosity=0)
+                teardown_test_environment()
+
+    def progress(self, result):
+        self.stdout.write(
+            f"  {result['threads']} threads: {result['per_second']} commits/s, "
+            f"{result['committed']} committed, {result['failed']} failed, "
+            f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms"
+        )
+
+    def compare(self, profile, results, other, other_results):
+        by_threads = {result["threads"]: result for result in other_results}
+        self.stdout.write(f"Compared with {other}:")
+        for result in results:
+            before = by_threads.get(result["threads"])
+            if before is None or not before["per_second"]:
+                continue
+            ratio = result["per_second"] / before["per_second"]
+            self.stdout.write(
+                f"  {result['threads']} threads: {profile} {result['per_second']}/s "
+                f"with {result['failed']} failed, {other} {before['per_second']}/s "
+                f"with {before['failed']} failed ({ratio:.2f}x)"
+            )
@@ -0,0 +1,139 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from department.cache import CACHE_ALIAS
+from main.benchmark import DATASETS, SKIPPED, regressions, run_benchmarks
+from main.testing import SYNTHETIC_UNTIL
+
+
+class Command(BaseCommand):
+    help = (
+        "Times every view of the department, patient and scales apps against "
+        "synthetic hospitals in a throwaway test database, and compares query counts, "
+        "latency and response size with a JSON baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--datasets", nargs="+", choices=DATASETS, default=list(DATASETS)
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Timed requests per view."
+        )
+        parser.add_argument("--baseline", default="benchmarks/views.json")
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Write the results as the new baseline instead of comparing.",
+        )
+        parser.add_argument(
+            "--latency-threshold",
+            type=float,
+            default=0.5,
+            help="Allowed relative growth of p50 latency; p95 may grow twice as much.",
+        )
+        parser.add_argument(
+            "--bytes-threshold",
+            type=float,
+            default=0.1,
+            help="Allowed relative growth of response size.",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("Time at least one request per view.")
+        baseline_path = Path(options["baseline"])
+        baseline = {}
+        if not options["update_baseline"]:
+            if not baseline_path.exists():
+                raise CommandError(
+                    f"No baseline at {baseline_path}; record one with --update-baseline."
+                )
+            baseline = json.loads(baseline_path.read_text())["datasets"]
+
+        results = self.run(options["datasets"], options["repeat"])
+
+        if options["update_baseline"]:
+            recorded = {}
+            if baseline_path.exists():
+                recorded = json.loads(baseline_path.read_text())["datasets"]
+            recorded.update(results)
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(
+                json.dumps({"datasets": recorded}, indent=2, sort_keys=True) + "\n"
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"Baseline written to {baseline_path}.")
+            )
+            return
+
+        found = []
+        for dataset, dataset_results in results.items():
+            if dataset not in baseline:
+                self.stdout.write(f"{dataset}: not in the baseline, not compared")
+                continue
+            for regression in regressions(
+                baseline[dataset],
+                dataset_results,
+                latency_threshold=options["latency_threshold"],
+                bytes_threshold=options["bytes_threshold"],
+            ):
+                found.append(f"{dataset} {regression}")
+        for regression in found:
+            self.stderr.write(regression)
+        if found:
+            raise CommandError(f"{len(found)} regression(s) against {baseline_path}.")
+        self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def run(self, datasets, repeat):
+        # Everything runs in test databases, with a private dashboard cache and vitals
+        # store, so benchmarks never touch the data or caches in use
+        caches = {
+            **settings.CACHES,
+            CACHE_ALIAS: {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "benchmark",
+                "TIMEOUT": None,
+                "OPTIONS": {"MAX_ENTRIES": 10000},
+            },
+        }
+        results = {}
+        setup_test_environment(debug=False)
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            with tempfile.TemporaryDirectory() as store, override_settings(
+                CACHES=caches,
+                VITALS_STORE_PATH=store if settings.VITALS_STORE_PATH else None,
+            ):
+                for dataset in datasets:
+                    self.stdout.write(f"{dataset}: {DATASETS[dataset]}")
+                    results[dataset] = run_benchmarks(
+                        DATASETS[dataset],
+                        repeat,
+                        until=SYNTHETIC_UNTIL,
+                        progress=self.progress,
+                    )
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+        for name, reason in SKIPPED.items():
+            self.stdout.write(f"  {name}: skipped, {reason}")
+        return results
+
+    def progress(self, name, result):
+        self.stdout.write(
+            f"  {name}: {result['status']}, {result['queries']} queries, "
+            f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+            f"{result['bytes']} bytes"
+        )
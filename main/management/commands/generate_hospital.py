@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from main.models import User
+from main.synthetic import (
+    SYNTHETIC_DOMAIN,
+    SYNTHETIC_PASSWORD,
+    SyntheticHospital,
+    clear_synthetic,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a deterministic synthetic hospital with bulk inserts: departments "
+        "and staff, patients with readmissions, and the charting of every stay."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--departments", type=int, default=10)
+        parser.add_argument("--patients", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--until",
+            help="End of the generated history (ISO date and time); defaults to now. "
+            "The same seed and end give the same data.",
+        )
+        parser.add_argument("--history-days", type=int, default=365)
+        parser.add_argument(
+            "--vitals-every", type=float, default=4, help="Hours between readings."
+        )
+        parser.add_argument("--batch-size", type=int, default=20000)
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete a previously generated hospital first.",
+        )
+
+    def handle(self, *args, **options):
+        until = None
+        if options["until"]:
+            until = parse_datetime(options["until"])
+            if until is None:
+                raise CommandError(f"{options['until']!r} is not a date and time.")
+            if is_naive(until):
+                until = make_aware(until)
+        if options["departments"] < 1 or options["vitals_every"] <= 0:
+            raise CommandError("Generate at least one department and some vitals.")
+
+        synthetic = User.objects.filter(email__endswith=f"@{SYNTHETIC_DOMAIN}")
+        if synthetic.exists():
+            if not options["replace"]:
+                raise CommandError(
+                    "A synthetic hospital already exists; pass --replace to regenerate it."
+                )
+            clear_synthetic()
+
+        started = time.perf_counter()
+        hospital = SyntheticHospital(
+            seed=options["seed"],
+            until=until,
+            history_days=options["history_days"],
+            vitals_every=options["vitals_every"],
+            batch_size=options["batch_size"],
+            progress=self.progress,
+        )
+        counts = hospital.generate(options["departments"], options["patients"])
+        elapsed = time.perf_counter() - started
+
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {sum(counts.values())} rows in {elapsed:.1f} s. "
+                f"Staff sign in as {hospital.admin.email} and the like, "
+                f"password {SYNTHETIC_PASSWORD!r}."
+            )
+        )
+
+    def progress(self, counts):
+        self.stdout.write(f"{sum(counts.values())} rows inserted", ending="\r")
+        self.stdout.flush()
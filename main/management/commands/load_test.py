@@ -0,0 +1,147 @@
+import asyncio
+import statistics
+import time
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from department.models import Department, Hospitalization
+from main.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the ASGI application in-process with many concurrent clients "
+        "and reports requests per second and latency for each page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument(
+            "--requests", type=int, default=5000, help="Requests per page."
+        )
+        parser.add_argument(
+            "--url",
+            action="append",
+            dest="urls",
+            help="Page to load; defaults to the ward read pages of the first records.",
+        )
+        parser.add_argument("--email", help="User to authenticate as.")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["email"])
+        urls = options["urls"] or self.default_urls()
+        cookie = self.session_cookie(user)
+
+        from czaro_crm.asgi import application
+
+        self.stdout.write(
+            f"{options['clients']} concurrent clients, {options['requests']} requests per page"
+        )
+        for url in urls:
+            stats = asyncio.run(
+                self.load(
+                    application, url, cookie, options["clients"], options["requests"]
+                )
+            )
+            self.stdout.write(
+                f"{url}: {stats['rps']:.0f} req/s, "
+                f"p50 {stats['p50']:.1f} ms, p95 {stats['p95']:.1f} ms, "
+                f"p99 {stats['p99']:.1f} ms, errors {stats['errors']}"
+            )
+
+    def get_user(self, email):
+        users = User.objects.filter(is_active=True)
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError("No user to authenticate as.")
+        return user
+
+    def default_urls(self):
+        department = Department.objects.first()
+        hospitalization = Hospitalization.objects.first()
+        if department is None or hospitalization is None:
+            raise CommandError("Load some departments and hospitalizations first.")
+        return [
+            reverse("department:department_list"),
+            reverse("department:department_detail", args=[department.id]),
+            reverse("patient:detail", args=[hospitalization.patient_id]),
+            reverse("department:hospitalization", args=[hospitalization.id]),
+        ]
+
+    def session_cookie(self, user):
+        # A logged-in session, as the login view would create it
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        cookie = SimpleCookie({settings.SESSION_COOKIE_NAME: session.session_key})
+        return cookie.output(header="", sep=";").strip()
+
+    async def load(self, application, url, cookie, clients, requests):
+        path, _, query = url.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        latencies = []
+        errors = 0
+        remaining = iter(range(requests))
+
+        async def client():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                status = await self.request(application, scope)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if status != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "rps": len(latencies) / elapsed,
+            "p50": percentiles[49],
+            "p95": percentiles[94],
+            "p99": percentiles[98],
+            "errors": errors,
+        }
+
+    async def request(self, application, scope):
+        sent_request = False
+        disconnected = asyncio.Event()
+        status = None
+
+        async def receive():
+            nonlocal sent_request
+            if not sent_request:
+                sent_request = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await application(dict(scope), receive, send)
+        disconnected.set()
+        return status
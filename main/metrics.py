@@ -0,0 +1,183 @@
+import math
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds, the default buckets of the Prometheus client libraries
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    # A metric family in the Prometheus text format. Values are kept per combination
+    # of label values, given as keyword arguments in any order.
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} is labelled by {', '.join(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        # (name suffix, label pairs, value) of every series
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield "", list(zip(self.labelnames, key)), value
+
+    def exposition(self):
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            for index, upper in enumerate(self.buckets):
+                if value <= upper:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self._values.items()
+            )
+        for key, (counts, total) in values:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for upper, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", labels + [("le", _number(upper))], cumulative
+            yield "_sum", labels, total
+            yield "_count", labels, cumulative
+
+
+class Registry:
+    # The metrics of this process. Each worker process keeps its own, so every worker
+    # has to be a scrape target of its own and queries sum their series. A scrape
+    # through a port several forked workers share reaches one of them at random.
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+    def exposition(self, *collected):
+        # The registered metrics and those collected for this scrape, as one document
+        metrics = [*self._metrics, *collected]
+        return "\n".join(metric.exposition() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.register(
+    Histogram(
+        "czaro_request_duration_seconds",
+        "Time to produce a response, by view.",
+        ["view"],
+    )
+)
+request_queries = registry.register(
+    Histogram(
+        "czaro_request_queries",
+        "Database queries run by a request, by view.",
+        ["view"],
+        buckets=QUERY_COUNT_BUCKETS,
+    )
+)
+request_sql_duration = registry.register(
+    Histogram(
+        "czaro_request_sql_duration_seconds",
+        "Time a request spent in database queries, by view.",
+        ["view"],
+    )
+)
+admissions = registry.register(
+    Counter(
+        "czaro_admissions_total",
+        "Patients admitted, by department.",
+        ["department_id"],
+    )
+)
+discharges = registry.register(
+    Counter(
+        "czaro_discharges_total",
+        "Patients discharged, by department.",
+        ["department_id"],
+    )
+)
+news_alerts = registry.register(
+    Counter(
+        "czaro_news_alerts_total",
+        "NEWS scores raising an alert, by department and band.",
+        ["department_id", "band"],
+    )
+)
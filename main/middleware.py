@@ -0,0 +1,239 @@
+import contextvars
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+from . import metrics
+
+logger = logging.getLogger("main.instrumentation")
+
+# The recorder of the request being handled; the ORM's sync threads inherit it
+_recorder = contextvars.ContextVar("request_recorder", default=None)
+# Literals left in SQL text, so statements differing only in them group together
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class QueryCounter:
+    # Number and time of the queries of a single request, all the metrics need
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+    def record_query(self, sql, params, seconds, many):
+        self.queries += 1
+        self.sql_seconds += seconds
+
+
+class RequestRecorder(QueryCounter):
+    # Queries, grouped by statement, and template rendering of a single request
+
+    def __init__(self):
+        super().__init__()
+        self.started = time.perf_counter()
+        self.template_seconds = 0.0
+        self.rendering = 0
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def record_query(self, sql, params, seconds, many):
+        super().record_query(sql, params, seconds, many)
+        statement = LITERALS.sub("?", sql)
+        self.statements[statement] += 1
+        if not many:
+            self.executions[(statement, repr(params))] += 1
+
+    def repeated(self, threshold):
+        # Statements run at least threshold times, the shape of an N+1 pattern, and how
+        # many of those runs repeated the very same parameters
+        found = []
+        for statement, count in self.statements.most_common():
+            if count < threshold:
+                break
+            identical = sum(
+                executions - 1
+                for (other, _), executions in self.executions.items()
+                if other == statement
+            )
+            found.append(
+                {"sql": statement[:300], "count": count, "identical": identical}
+            )
+        return found
+
+
+def record_sql(execute, sql, params, many, context):
+    # Database execute wrapper timing every statement of the request being recorded
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record_query(sql, params, time.perf_counter() - started, many)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def instrument_connections(**kwargs):
+    # Connections are per thread; request_started runs in the thread that serves the
+    # request's database work, so connections opened before instrumentation are covered
+    for connection in connections.all(initialized_only=True):
+        instrument_connection(None, connection)
+
+
+def record_sql_queries():
+    connection_created.connect(instrument_connection)
+    request_started.connect(instrument_connections)
+    instrument_connections()
+
+
+_template_render = Template.render
+
+
+def render_template(self, context=None, request=None):
+    # Times top-level template renders; includes are part of their parent's time
+    recorder = _recorder.get()
+    if not isinstance(recorder, RequestRecorder) or recorder.rendering:
+        return _template_render(self, context, request)
+    recorder.rendering += 1
+    started = time.perf_counter()
+    try:
+        return _template_render(self, context, request)
+    finally:
+        recorder.template_seconds += time.perf_counter() - started
+        recorder.rendering -= 1
+
+
+class RequestInstrumentationMiddleware:
+    # Opt-in per-request instrumentation, enabled with REQUEST_INSTRUMENTATION.
+    # Adds a Server-Timing header with SQL, template and total time, and logs a JSON
+    # line for a sample of requests and for every request repeating a statement often
+    # enough to look like an N+1 query pattern.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "REQUEST_INSTRUMENTATION_SAMPLE_RATE", 0.1)
+        self.repeat_threshold = getattr(
+            settings, "REQUEST_INSTRUMENTATION_REPEAT_THRESHOLD", 5
+        )
+        record_sql_queries()
+        Template.render = render_template
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = RequestRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder = RequestRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder)
+
+    def finish(self, request, response, recorder):
+        # Streamed bodies are produced after this point and are not part of the timing
+        total = time.perf_counter() - recorder.started
+        match = request.resolver_match
+        view = match.view_name if match else None
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={recorder.sql_seconds * 1000:.1f};desc="{recorder.queries} queries"',
+                f"tpl;dur={recorder.template_seconds * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ]
+            + ([f'view;desc="{view}"'] if view else [])
+        )
+        repeated = recorder.repeated(self.repeat_threshold)
+        if repeated or random.random() < self.sample_rate:
+            record = {
+                "method": request.method,
+                "path": request.path,
+                "view": view,
+                "status": response.status_code,
+                "queries": recorder.queries,
+                "sql_ms": round(recorder.sql_seconds * 1000, 2),
+                "template_ms": round(recorder.template_seconds * 1000, 2),
+                "total_ms": round(total * 1000, 2),
+            }
+            if repeated:
+                record["repeated_queries"] = repeated
+            logger.log(
+                logging.WARNING if repeated else logging.INFO,
+                json.dumps(record),
+            )
+        return response
+
+
+class RequestMetricsMiddleware:
+    # Feeds the request latency and query histograms served at /metrics, by view name.
+    # Shares the recorder of the instrumentation middleware when that one is enabled,
+    # otherwise only counts queries, without grouping their statements.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        record_sql_queries()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        recorder = _recorder.get()
+        token = None if recorder else _recorder.set(recorder := QueryCounter())
+        try:
+            response = self.get_response(request)
+        finally:
+            if token:
+                _recorder.reset(token)
+        self.observe(request, recorder, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        recorder = _recorder.get()
+        token = None if recorder else _recorder.set(recorder := QueryCounter())
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token:
+                _recorder.reset(token)
+        self.observe(request, recorder, started)
+        return response
+
+    def observe(self, request, recorder, started):
+        # Streamed bodies are produced after this point and are not part of the timing
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        metrics.request_duration.observe(time.perf_counter() - started, view=view)
+        metrics.request_queries.observe(recorder.queries, view=view)
+        metrics.request_sql_duration.observe(recorder.sql_seconds, view=view)
@@ -0,0 +1,507 @@
+import datetime
+import math
+import random
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from department import timeseries
+from department.models import (
+    Consultation,
+    Department,
+    Hospitalization,
+    Observation,
+    VitalSigns,
+)
+from department.services import rebuild_admission_history, rebuild_census
+from main.models import User
+from patient.models import Patient
+from scales import news, scoring
+from scales.models import (
+    ACTIVITY_CHOICES,
+    EYE_RESPONSE_CHOICES,
+    INCONTINENCE_CHOICES,
+    MENTAL_CHOICES,
+    MOBILITY_CHOICES,
+    MOTOR_RESPONSE_CHOICES,
+    PHYSICAL_CHOICES,
+    VERBAL_RESPONSE_CHOICES,
+    BodyMassIndex,
+    GlasgowComaScale,
+    NewsScale,
+    NortonScale,
+    PainScale,
+)
+
+# Every generated user has an address in this domain; deleting them removes the rest
+SYNTHETIC_DOMAIN = "synthetic.hospital"
+SYNTHETIC_PASSWORD = "synthetic"
+# Models in the order their rows are inserted, parents first
+MODELS = (
+    User,
+    Department,
+    Patient,
+    Hospitalization,
+    Consultation,
+    Observation,
+    VitalSigns,
+    NewsScale,
+    PainScale,
+    BodyMassIndex,
+    NortonScale,
+    GlasgowComaScale,
+)
+
+DEPARTMENT_NAMES = (
+    "Cardiology",
+    "Internal Medicine",
+    "Neurology",
+    "General Surgery",
+    "Orthopedics",
+    "Pulmonology",
+    "Nephrology",
+    "Oncology",
+    "Geriatrics",
+    "Intensive Care",
+)
+FIRST_NAMES = (
+    "Anna",
+    "Maria",
+    "Katarzyna",
+    "Zofia",
+    "Ewa",
+    "Agnieszka",
+    "Jan",
+    "Piotr",
+    "Krzysztof",
+    "Andrzej",
+    "Tomasz",
+    "Marek",
+    "Paweł",
+    "Łukasz",
+    "Magdalena",
+    "Joanna",
+)
+LAST_NAMES = (
+    "Nowak",
+    "Kowalski",
+    "Wiśniewski",
+    "Wójcik",
+    "Kowalczyk",
+    "Kamiński",
+    "Lewandowski",
+    "Zieliński",
+    "Szymański",
+    "Woźniak",
+    "Dąbrowski",
+    "Kozłowski",
+    "Jankowski",
+    "Mazur",
+    "Krawczyk",
+    "Piotrowski",
+)
+CITIES = ("Warszawa", "Kraków", "Łódź", "Wrocław", "Poznań", "Gdańsk", "Lublin")
+SYMPTOMS = (
+    "Chest pain",
+    "Shortness of breath",
+    "Fever",
+    "Abdominal pain",
+    "Headache",
+    "Syncope",
+    "Fall",
+    "Confusion",
+    "Cough",
+    "Weakness",
+)
+OBSERVATIONS = (
+    "Patient rested well overnight.",
+    "Patient reports mild pain, analgesia given.",
+    "Eating and drinking independently.",
+    "Mobilised with assistance of one.",
+    "Wound clean and dry, dressing changed.",
+    "Patient anxious, reassured.",
+    "Family visited, care plan discussed.",
+)
+CONSULTATIONS = (
+    ("Cardiology consult", "ECG reviewed, continue current treatment."),
+    ("Physiotherapy", "Breathing exercises taught, mobilise twice daily."),
+    ("Dietitian", "Oral nutritional supplements started."),
+    ("Neurology consult", "No focal deficit, no further imaging needed."),
+)
+
+
+def insert(model, instances):
+    # Inserts rows exactly as given, with one executemany per model. bulk_create spends
+    # most of its time preparing each value and would stamp the auto_now timestamps.
+    if not instances:
+        return
+    # The wrapper itself, so values are not prepared through the connection proxy
+    db = connections[DEFAULT_DB_ALIAS]
+    ops = db.ops
+    fields = model._meta.concrete_fields
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        ops.quote_name(model._meta.db_table),
+        ", ".join(ops.quote_name(field.column) for field in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    rows = [
+        tuple(
+            field.get_db_prep_save(getattr(instance, field.attname), db)
+            for field in fields
+        )
+        for instance in instances
+    ]
+    with db.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    # The instances now stand for saved rows, as after bulk_create
+    for instance in instances:
+        instance._state.adding = False
+        instance._state.db = db.alias
+
+
+def clear_synthetic():
+    # Deletes a previously generated hospital; every row cascades from its users
+    User.objects.filter(email__endswith=f"@{SYNTHETIC_DOMAIN}").delete()
+
+
+def _choice(choices):
+    return [value for value, _ in choices]
+
+
+class SyntheticHospital:
+    # Generates a reproducible hospital: departments and their staff, patients with one
+    # or more stays of realistic length, and the charting of every stay. The same seed
+    # and end time always give the same rows, ids included.
+
+    def __init__(
+        self,
+        seed=0,
+        until=None,
+        history_days=365,
+        vitals_every=4,
+        batch_size=5000,
+        progress=None,
+    ):
+        self.rng = random.Random(seed)
+        self.until = until or timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.history_days = history_days
+        self.vitals_every = datetime.timedelta(hours=vitals_every)
+        self.batch_size = batch_size
+        self.progress = progress
+        self.pending = {model: [] for model in MODELS}
+        self.counts = {model.__name__: 0 for model in MODELS}
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def moment(self, start, end):
+        # A random moment between start and end, to the second
+        seconds = int((end - start).total_seconds())
+        return start + datetime.timedelta(seconds=self.rng.randint(0, max(seconds, 0)))
+
+    def add(self, instance):
+        self.pending[type(instance)].append(instance)
+        if sum(map(len, self.pending.values())) >= self.batch_size:
+            self.flush()
+        return instance
+
+    def flush(self):
+        store = timeseries.get_store()
+        with transaction.atomic():
+            for model, instances in self.pending.items():
+                insert(model, instances)
+                self.counts[model.__name__] += len(instances)
+            if store is not None:
+                store.append(self.pending[VitalSigns])
+        self.pending = {model: [] for model in MODELS}
+        if self.progress:
+            self.progress(self.counts)
+
+    def generate(self, departments=5, patients=500):
+        # Inserts the hospital and returns the number of rows of each model
+        started = self.until - datetime.timedelta(days=self.history_days)
+        password = make_password(SYNTHETIC_PASSWORD)
+        self.admin = self.add(self.user("admins", 0, password, started))
+        wards = []
+        for number in range(departments):
+            ward = self.add(
+                Department(
+                    id=self.uuid(),
+                    name=self.department_name(number),
+                    description="Synthetic department",
+                    created_by=self.admin,
+                    created_at=started,
+                )
+            )
+            staff = [
+                self.add(self.user(profession, number * 10 + index, password, started))
+                for index, profession in enumerate(
+                    ("nurses", "nurses", "nurses", "physicians")
+                )
+            ]
+            wards.append((ward, staff))
+        for _ in range(patients):
+            self.patient(wards, started)
+        self.flush()
+        rebuild_census()
+        rebuild_admission_history()
+        return self.counts
+
+    def department_name(self, number):
+        name = DEPARTMENT_NAMES[number % len(DEPARTMENT_NAMES)]
+        if number >= len(DEPARTMENT_NAMES):
+            name = f"{name} {number // len(DEPARTMENT_NAMES) + 1}"
+        return f"{name} (synthetic)"
+
+    def user(self, profession, number, password, joined):
+        return User(
+            id=self.uuid(),
+            email=f"{profession}-{number:04d}@{SYNTHETIC_DOMAIN}",
+            first_name=self.rng.choice(FIRST_NAMES),
+            last_name=self.rng.choice(LAST_NAMES),
+            profession=profession,
+            password=password,
+            is_staff=True,
+            date_joined=joined,
+        )
+
+    def patient(self, wards, started):
+        rng = self.rng
+        registered = self.moment(started, self.until)
+        _, staff = rng.choice(wards)
+        patient = self.add(
+            Patient(
+                id=self.uuid(),
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                date_of_birth=datetime.date(rng.randint(1930, 2005), 1, 1)
+                + datetime.timedelta(days=rng.randint(0, 364)),
+                contact_number=f"+48{rng.randint(500000000, 899999999)}",
+                is_insured=rng.random() < 0.95,
+                insurance=str(rng.randint(10**9, 10**10 - 1)),
+                country="Poland",
+                city=rng.choice(CITIES),
+                street=f"{rng.choice(LAST_NAMES)} {rng.randint(1, 120)}",
+                zip_code=f"{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}",
+                created_by=rng.choice(staff),
+                created_at=registered,
+                modified_at=registered,
+            )
+        )
+        # A quarter of the discharged patients are readmitted, weeks later
+        admitted = registered
+        while admitted < self.until:
+            ward, staff = rng.choice(wards)
+            stay = self.stay(patient, ward, staff, admitted)
+            if not stay.is_discharged or rng.random() >= 0.25:
+                break
+            gap = datetime.timedelta(days=rng.lognormvariate(math.log(30), 0.8))
+            admitted = stay.discharged_on + gap
+
+    def stay(self, patient, ward, staff, admitted):
+        # Stays last four days at the median, with a long tail of complicated ones
+        length = datetime.timedelta(
+            days=min(max(self.rng.lognormvariate(math.log(4), 0.8), 0.25), 60)
+        )
+        discharged = admitted + length
+        ongoing = discharged >= self.until
+        stay = self.add(
+            Hospitalization(
+                id=self.uuid(),
+                patient=patient,
+                department=ward,
+                admitted_on=admitted,
+                discharged_on=None if ongoing else discharged,
+                is_discharged=not ongoing,
+                main_symptom=self.rng.choice(SYMPTOMS),
+            )
+        )
+        self.chart(stay, staff, admitted, min(discharged, self.until))
+        return stay
+
+    def chart(self, stay, staff, admitted, until):
+        rng = self.rng
+        # Every stay starts with a BMI, a Norton and a Glasgow assessment
+        self.assessments(stay, staff, admitted + datetime.timedelta(minutes=30))
+        baseline = {
+            "respiratory_rate": rng.gauss(16, 2),
+            "oxygen_saturation": rng.gauss(96, 1.5),
+            "systolic_blood_pressure": rng.gauss(128, 15),
+            "diastolic_blood_pressure": rng.gauss(78, 8),
+            "heart_rate": rng.gauss(80, 12),
+            "temperature": rng.gauss(36.8, 0.4),
+        }
+        vitals = []
+        moment = admitted + datetime.timedelta(minutes=rng.randint(0, 59))
+        while moment < until:
+            vitals.append(self.vital_signs(stay, staff, moment, baseline))
+            moment += self.vitals_every + datetime.timedelta(
+                minutes=rng.randint(-20, 20)
+            )
+        self.news_scores(vitals)
+
+        day = admitted
+        while day < until:
+            for _ in range(2):
+                self.add(
+                    Observation(
+                        id=self.uuid(),
+                        hospitalization=stay,
+                        observation=f"<p>{rng.choice(OBSERVATIONS)}</p>",
+                        **self.entry(staff, day, until),
+                    )
+                )
+            self.pain_scale(stay, staff, day, until)
+            if rng.random() < 0.2:
+                name, text = rng.choice(CONSULTATIONS)
+                self.add(
+                    Consultation(
+                        id=self.uuid(),
+                        hospitalization=stay,
+                        consultation_name=name,
+                        consultation=f"<p>{text}</p>",
+                        **self.entry(staff, day, until),
+                    )
+                )
+            day += datetime.timedelta(days=1)
+
+    def entry(self, staff, start, until):
+        # Author and time of a charting entry made in the day after start
+        moment = self.moment(start, min(start + datetime.timedelta(days=1), until))
+        return {
+            "created_by": self.rng.choice(staff),
+            "created_at": moment,
+            "modified_at": moment,
+        }
+
+    def vital_signs(self, stay, staff, moment, baseline):
+        rng = self.rng
+
+        def around(field, spread, low, high):
+            return min(max(round(rng.gauss(baseline[field], spread)), low), high)
+
+        return self.add(
+            VitalSigns(
+                id=self.uuid(),
+                hospitalization=stay,
+                created_by=rng.choice(staff),
+                created_at=moment,
+                modified_at=moment,
+                respiratory_rate=around("respiratory_rate", 2, 6, 40),
+                oxygen_saturation=around("oxygen_saturation", 1.5, 70, 100),
+                systolic_blood_pressure=around("systolic_blood_pressure", 10, 70, 240),
+                diastolic_blood_pressure=around("diastolic_blood_pressure", 7, 40, 140),
+                heart_rate=around("heart_rate", 8, 35, 180),
+                temperature=Decimal(
+                    f"{min(max(rng.gauss(baseline['temperature'], 0.3), 34.5), 41.5):.1f}"
+                ),
+            )
+        )
+
+    def news_scores(self, vitals):
+        # Every reading gets its NEWS, as when it is charted through the ward pages
+        if not vitals:
+            return
+        columns = {
+            field: [getattr(vital, field) for vital in vitals]
+            for field in (
+                "respiratory_rate",
+                "oxygen_saturation",
+                "temperature",
+                "systolic_blood_pressure",
+                "heart_rate",
+            )
+        }
+        totals, codes = news.score_news(
+            columns["respiratory_rate"],
+            columns["oxygen_saturation"],
+            False,
+            False,
+            columns["temperature"],
+            columns["systolic_blood_pressure"],
+            columns["heart_rate"],
+            "awake",
+        )
+        for vital, total, code in zip(vitals, totals.tolist(), codes.tolist()):
+            self.add(
+                NewsScale(
+                    id=self.uuid(),
+                    hospitalization=vital.hospitalization,
+                    created_by=vital.created_by,
+                    created_at=vital.created_at,
+                    modified_at=vital.created_at,
+                    vital_signs=vital,
+                    respiratory_rate=vital.respiratory_rate,
+                    oxygen_saturation=vital.oxygen_saturation,
+                    temperature=vital.temperature,
+                    systolic_blood_pressure=vital.systolic_blood_pressure,
+                    diastolic_blood_pressure=vital.diastolic_blood_pressure,
+                    heart_rate=vital.heart_rate,
+                    total_score=total,
+                    score_interpretation=news.interpretation_text(total, code),
+                )
+            )
+
+    def pain_scale(self, stay, staff, day, until):
+        level = str(min(max(round(self.rng.gauss(2, 2)), 0), 10))
+        self.add(
+            PainScale(
+                id=self.uuid(),
+                hospitalization=stay,
+                pain_level=level,
+                pain_interpretation=scoring.get_scale("pain").interpret(int(level)),
+                **self.entry(staff, day, until),
+            )
+        )
+
+    def assessments(self, stay, staff, moment):
+        rng = self.rng
+        entry = {
+            "hospitalization": stay,
+            "created_by": rng.choice(staff),
+            "created_at": moment,
+            "modified_at": moment,
+        }
+        bmi = BodyMassIndex(
+            id=self.uuid(),
+            body_height=rng.randint(150, 195),
+            body_weight=rng.randint(45, 130),
+            **entry,
+        )
+        bmi.bmi = scoring.get_scale("bmi").total(bmi)
+        bmi.interpretation = scoring.get_scale("bmi").interpret(bmi.bmi)
+        norton = NortonScale(
+            id=self.uuid(),
+            physical_condition=rng.choice(_choice(PHYSICAL_CHOICES)),
+            mental_condition=rng.choice(_choice(MENTAL_CHOICES)),
+            activity=rng.choice(_choice(ACTIVITY_CHOICES)),
+            mobility=rng.choice(_choice(MOBILITY_CHOICES)),
+            incontinence=rng.choice(_choice(INCONTINENCE_CHOICES)),
+            **entry,
+        )
+        norton.total_points = scoring.get_scale("norton").total(norton)
+        norton.pressure_risk = scoring.get_scale("norton").interpret(
+            norton.total_points
+        )
+        # Most patients are fully conscious
+        if rng.random() < 0.85:
+            responses = ("4", "5", "6")
+        else:
+            responses = (
+                rng.choice(_choice(EYE_RESPONSE_CHOICES)),
+                rng.choice(_choice(VERBAL_RESPONSE_CHOICES)),
+                rng.choice(_choice(MOTOR_RESPONSE_CHOICES)),
+            )
+        glasgow = GlasgowComaScale(
+            id=self.uuid(),
+            eye_response=responses[0],
+            verbal_response=responses[1],
+            motor_response=responses[2],
+            **entry,
+        )
+        glasgow.total_points = scoring.get_scale("glasgow").total(glasgow)
+        for scale in (bmi, norton, glasgow):
+            self.add(scale)
@@ -0,0 +1,33 @@
+import datetime
+
+from django.test import TestCase
+
+from department.models import Department, Hospitalization
+from main.models import User
+from main.synthetic import SyntheticHospital
+
+# A fixed end keeps the shared dataset identical from run to run
+SYNTHETIC_UNTIL = datetime.datetime(2024, 6, 1, 12, tzinfo=datetime.timezone.utc)
+
+
+class SyntheticHospitalTestCase(TestCase):
+    # Tests against the shared synthetic hospital, generated once per test class.
+    # Subclasses raise the volume with hospital_size to catch per-row queries.
+    hospital_size = {"departments": 3, "patients": 60}
+    hospital_seed = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospital = SyntheticHospital(seed=cls.hospital_seed, until=SYNTHETIC_UNTIL)
+        cls.hospital_counts = cls.hospital.generate(**cls.hospital_size)
+        cls.admin = cls.hospital.admin
+        cls.nurse = User.objects.filter(profession="nurses").order_by("email").first()
+        # The busiest ward and the stay with the most charting
+        cls.department = max(
+            Department.objects.all(),
+            key=lambda department: department.hospitalization_set.count(),
+        )
+        cls.hospitalization = max(
+            Hospitalization.objects.all(),
+            key=lambda stay: stay.vitalsigns_set.count(),
+        )
@@ -0,0 +1,117 @@
+import importlib
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+
+from department.models import Hospitalization, VitalSigns
+from department.services import census_drift
+from main.benchmark import (
+    ENTRY_ARGUMENTS,
+    SKIPPED,
+    URL_MODULES,
+    benchmarked_urls,
+    measure_writes,
+    regressions,
+    run_benchmarks,
+)
+from main.synthetic import SyntheticHospital
+from main.testing import SYNTHETIC_UNTIL
+
+
+class BenchmarkTest(TestCase):
+    def test_every_view_is_covered(self):
+        urls = benchmarked_urls()
+        patterns = sum(
+            len(importlib.import_module(module).urlpatterns) for module in URL_MODULES
+        )
+        self.assertEqual(len(urls), patterns)
+        known = {"department_id", "patient_id", "hospitalization_id", *ENTRY_ARGUMENTS}
+        for name, arguments in urls:
+            self.assertLessEqual(set(arguments), known, name)
+
+    def test_run_measures_every_view(self):
+        results = run_benchmarks(
+            {"departments": 1, "patients": 10}, repeat=1, until=SYNTHETIC_UNTIL
+        )
+        self.assertEqual(
+            set(results), {name for name, _ in benchmarked_urls()} - set(SKIPPED)
+        )
+        for name, result in results.items():
+            self.assertEqual(result["status"], 200, name)
+            self.assertGreater(result["queries"], 0, name)
+            self.assertGreater(result["bytes"], 0, name)
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"], name)
+        # Session, user, hospitalization, section versions and the eight sections
+        self.assertEqual(results["department:hospitalization"]["queries"], 12)
+
+    def test_regressions(self):
+        before = {
+            "status": 200,
+            "queries": 4,
+            "p50_ms": 10,
+            "p95_ms": 20,
+            "bytes": 1000,
+        }
+        baseline = {"view": before}
+        self.assertEqual(regressions(baseline, {"view": dict(before, p50_ms=14)}), [])
+        self.assertEqual(regressions(baseline, {"other": dict(before, queries=9)}), [])
+        self.assertEqual(
+            regressions(
+                baseline,
+                {
+                    "view": dict(
+                        before, queries=5, p50_ms=16, p95_ms=41, bytes=1200, status=302
+                    )
+                },
+            ),
+            [
+                "view: status 200 -> 302",
+                "view: 4 -> 5 queries",
+                "view: p50_ms 10 -> 16",
+                "view: p95_ms 20 -> 41",
+                "view: 1000 -> 1200 bytes",
+            ],
+        )
+        # Fast views only regress by more than the floor
+        fast = {"view": dict(before, p50_ms=1, p95_ms=2)}
+        self.assertEqual(
+            regressions(fast, {"view": dict(before, p50_ms=5, p95_ms=6)}), []
+        )
+
+    def test_missing_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaisesMessage(CommandError, "--update-baseline"):
+                call_command(
+                    "benchmark_views",
+                    "--baseline",
+                    str(Path(directory) / "views.json"),
+                    stdout=StringIO(),
+                )
+
+
+class WriteBenchmarkTest(TransactionTestCase):
+    # The charting stations run in threads of their own, which only see committed rows
+    def test_stations_commit_readings_admissions_and_discharges(self):
+        hospital = SyntheticHospital(seed=0, until=SYNTHETIC_UNTIL)
+        hospital.generate(departments=1, patients=10)
+        stays = Hospitalization.objects.count()
+        readings = VitalSigns.objects.count()
+        result = measure_writes(hospital.admin, threads=1, transactions=40)
+        self.assertEqual(result["threads"], 1)
+        self.assertEqual(result["committed"], 40)
+        self.assertEqual(result["failed"], 0)
+        self.assertGreater(Hospitalization.objects.count(), stays)
+        self.assertGreater(VitalSigns.objects.count(), readings)
+        self.assertTrue(
+            Hospitalization.objects.filter(
+                is_discharged=True, discharged_on__gt=SYNTHETIC_UNTIL
+            ).exists()
+        )
+        self.assertEqual(census_drift(), {})
+
+    def test_invalid_run(self):
+        with self.assertRaises(CommandError):
+            call_command("bench_db_writes", "--threads", "0", stdout=StringIO())
@@ -0,0 +1,237 @@
+from datetime import date
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from department.cache import CACHE_ALIAS, stats as cache_stats
+from department.models import Department, Hospitalization
+from main import metrics, middleware
+from main.models import User
+from patient.models import Patient
+from scales.models import NewsScale
+
+
+def series(document):
+    # Sample values by series, as "name{labels}"
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in document.splitlines()
+        if line and not line.startswith("#")
+    }
+
+
+class ExpositionTest(SimpleTestCase):
+    def test_counter_and_gauge(self):
+        counter = metrics.Counter("things_total", "Things.", ["kind"])
+        counter.inc(kind="a")
+        counter.inc(2, kind="a")
+        counter.inc(kind='b"c')
+        gauge = metrics.Gauge("level", "Level.")
+        gauge.set(0.5)
+        self.assertEqual(
+            metrics.Registry().exposition(counter, gauge),
+            "# HELP things_total Things.\n"
+            "# TYPE things_total counter\n"
+            'things_total{kind="a"} 3\n'
+            'things_total{kind="b\\"c"} 1\n'
+            "# HELP level Level.\n"
+            "# TYPE level gauge\n"
+            "level 0.5\n",
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("took", "Took.", ["view"], buckets=(1, 5))
+        for value in (0.5, 3, 3, 10):
+            histogram.observe(value, view="a")
+        self.assertEqual(
+            series(histogram.exposition()),
+            {
+                'took_bucket{view="a",le="1"}': 1,
+                'took_bucket{view="a",le="5"}': 3,
+                'took_bucket{view="a",le="+Inf"}': 4,
+                'took_sum{view="a"}': 16.5,
+                'took_count{view="a"}': 4,
+            },
+        )
+
+    def test_labels_must_match(self):
+        counter = metrics.Counter("things_total", "Things.", ["kind"])
+        with self.assertRaises(ValueError):
+            counter.inc(colour="red")
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def test_queries_are_counted_without_grouping_statements(self):
+        recorders = []
+
+        def view(request):
+            recorders.append(middleware._recorder.get())
+            User.objects.count()
+            User.objects.count()
+            return HttpResponse()
+
+        metrics.registry.reset()
+        middleware.RequestMetricsMiddleware(view)(RequestFactory().get("/ward/"))
+        [recorder] = recorders
+        self.assertIs(type(recorder), middleware.QueryCounter)
+        self.assertEqual(recorder.queries, 2)
+        self.assertEqual(
+            series(metrics.request_queries.exposition())[
+                'czaro_request_queries_sum{view="unmatched"}'
+            ],
+            2,
+        )
+
+
+@override_settings(METRICS_TOKEN="scrape-secret")
+class MetricsEndpointTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.admin = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.department = Department.objects.create(
+            name="Cardiology", description="Heart", created_by=cls.user
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def scrape(self):
+        response = self.client.get(
+            reverse("main:metrics"), HTTP_AUTHORIZATION="Bearer scrape-secret"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        return series(response.content.decode())
+
+    def test_access(self):
+        url = reverse("main:metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403
+        )
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_admissions_discharges_and_census(self):
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("department:admit_patient", args=[self.patient.id]),
+                {"main_symptom": "Cough", "department_id": self.department.id},
+            )
+        labels = f'department_id="{self.department.id}",department="Cardiology"'
+        found = self.scrape()
+        self.assertEqual(
+            found[f'czaro_admissions_total{{department_id="{self.department.id}"}}'],
+            1,
+        )
+        self.assertEqual(found[f"czaro_department_admitted{{{labels}}}"], 1)
+        self.assertEqual(found[f"czaro_department_admitted_today{{{labels}}}"], 1)
+
+        now = timezone.localtime()
+        hospitalization = Hospitalization.objects.get(patient=self.patient)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("department:discharge", args=[hospitalization.id]),
+                {
+                    "discharge_date": now.strftime("%Y-%m-%d"),
+                    "discharge_time": now.strftime("%H:%M"),
+                },
+            )
+        found = self.scrape()
+        self.assertEqual(
+            found[f'czaro_discharges_total{{department_id="{self.department.id}"}}'],
+            1,
+        )
+        self.assertEqual(found[f"czaro_department_admitted{{{labels}}}"], 0)
+        self.assertEqual(found[f"czaro_department_discharged_today{{{labels}}}"], 1)
+
+    def test_news_alerts_by_band(self):
+        hospitalization = Hospitalization.objects.create(
+            patient=self.patient, department=self.department, main_symptom="Cough"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for heart_rate, respiratory_rate in ((70, 16), (140, 26), (140, 30)):
+                NewsScale.objects.create(
+                    hospitalization=hospitalization,
+                    created_by=self.user,
+                    respiratory_rate=respiratory_rate,
+                    oxygen_saturation=90 if heart_rate == 140 else 98,
+                    temperature=36.6,
+                    systolic_blood_pressure=120,
+                    diastolic_blood_pressure=80,
+                    heart_rate=heart_rate,
+                )
+        found = self.scrape()
+        self.assertEqual(
+            found[
+                f'czaro_news_alerts_total{{department_id="{self.department.id}",'
+                'band="high"}'
+            ],
+            2,
+        )
+        self.assertFalse(any('band="medium"' in name for name in found))
+
+    def test_request_histograms_by_view(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("department:census"))
+        self.client.get(reverse("department:census"))
+        found = self.scrape()
+        self.assertEqual(
+            found['czaro_request_duration_seconds_count{view="department:census"}'], 2
+        )
+        # The census is one query, after the session and the user are loaded
+        self.assertEqual(
+            found['czaro_request_queries_sum{view="department:census"}'], 6
+        )
+        self.assertIn(
+            'czaro_request_sql_duration_seconds_bucket{view="department:census",le="+Inf"}',
+            found,
+        )
+
+    def test_cache_counters(self):
+        caches[CACHE_ALIAS].clear()
+        cache_stats.reset()
+        url = reverse("department:department_detail", args=[self.department.id])
+        self.client.force_login(self.user)
+        self.client.get(url)
+        self.client.get(url)
+        found = self.scrape()
+        self.assertEqual(
+            found['czaro_cache_lookups_total{cache="roster",result="miss"}'], 1
+        )
+        self.assertEqual(
+            found['czaro_cache_lookups_total{cache="roster",result="hit"}'], 1
+        )
+        self.assertEqual(found['czaro_cache_hit_ratio{cache="roster"}'], 0.5)
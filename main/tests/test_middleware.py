@@ -0,0 +1,134 @@
+import json
+import re
+from datetime import date
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from department.models import Department, Hospitalization, Observation
+from main.middleware import RequestInstrumentationMiddleware
+from main.models import User
+from patient.models import Patient
+
+INSTRUMENTED = override_settings(
+    MIDDLEWARE=[
+        "main.middleware.RequestInstrumentationMiddleware",
+        *settings.MIDDLEWARE,
+    ],
+    REQUEST_INSTRUMENTATION_SAMPLE_RATE=1,
+)
+
+
+def timing(response):
+    # Server-Timing metrics by name
+    metrics = {}
+    for metric in response["Server-Timing"].split(", "):
+        name, *parameters = metric.split(";")
+        metrics[name] = dict(parameter.split("=", 1) for parameter in parameters)
+    return metrics
+
+
+@INSTRUMENTED
+class RequestInstrumentationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.department = Department.objects.create(
+            name="Cardiology", description="Heart", created_by=cls.user
+        )
+        patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=patient, department=cls.department, main_symptom="Fever"
+        )
+        Observation.objects.create(
+            hospitalization=cls.hospitalization,
+            observation="<p>Stable</p>",
+            created_by=cls.user,
+        )
+
+    def test_server_timing_and_log(self):
+        self.client.force_login(self.user)
+        url = reverse("department:hospitalization", args=[self.hospitalization.id])
+        with self.assertLogs("main.instrumentation", "INFO") as logs:
+            response = self.client.get(url)
+        metrics = timing(response)
+        self.assertEqual(metrics["view"]["desc"], '"department:hospitalization"')
+        self.assertEqual(metrics["db"]["desc"], '"12 queries"')
+        self.assertGreater(float(metrics["tpl"]["dur"]), 0)
+        self.assertGreaterEqual(
+            float(metrics["total"]["dur"]), float(metrics["db"]["dur"])
+        )
+
+        [line] = logs.records
+        self.assertEqual(line.levelname, "INFO")
+        record = json.loads(line.getMessage())
+        self.assertEqual(record["view"], "department:hospitalization")
+        self.assertEqual(record["path"], url)
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["queries"], 12)
+        self.assertNotIn("repeated_queries", record)
+
+    async def test_async_views_are_measured(self):
+        await self.async_client.aforce_login(self.user)
+        with self.assertLogs("main.instrumentation", "INFO"):
+            response = await self.async_client.get(
+                reverse("department:department_detail", args=[self.department.id])
+            )
+        metrics = timing(response)
+        self.assertEqual(metrics["view"]["desc"], '"department:department_detail"')
+        self.assertEqual(metrics["db"]["desc"], '"5 queries"')
+
+    @override_settings(REQUEST_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_repeated_statements_are_flagged(self):
+        def view(request):
+            # One lookup per row, as an unprefetched foreign key does
+            for observation in Observation.objects.all():
+                for _ in range(3):
+                    User.objects.get(id=observation.created_by_id)
+            for _ in range(3):
+                Department.objects.get(id=self.department.id)
+            return HttpResponse()
+
+        Observation.objects.bulk_create(
+            Observation(
+                hospitalization=self.hospitalization,
+                observation="<p>Stable</p>",
+                created_by=self.user,
+            )
+            for _ in range(2)
+        )
+        middleware = RequestInstrumentationMiddleware(view)
+        request = RequestFactory().get("/ward/")
+        with self.assertLogs("main.instrumentation", "WARNING") as logs:
+            middleware(request)
+        record = json.loads(logs.records[0].getMessage())
+        [repeated] = record["repeated_queries"]
+        self.assertIn('FROM "main_user"', repeated["sql"])
+        self.assertEqual(repeated["count"], 9)
+        self.assertEqual(repeated["identical"], 8)
+
+        # Below the threshold and outside the sample nothing is logged
+        middleware = RequestInstrumentationMiddleware(lambda request: HttpResponse())
+        with self.assertNoLogs("main.instrumentation"):
+            response = middleware(request)
+        self.assertIn('db;dur=0.0;desc="0 queries"', response["Server-Timing"])
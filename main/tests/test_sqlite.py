@@ -0,0 +1,52 @@
+import tempfile
+from pathlib import Path
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class TunedSqliteTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        handler = ConnectionHandler(
+            {
+                "default": {
+                    "ENGINE": "czaro_crm.sqlite",
+                    "NAME": str(Path(directory.name) / "tuned.sqlite3"),
+                    "OPTIONS": {
+                        "init_command": (
+                            "PRAGMA journal_mode = WAL;"
+                            "PRAGMA busy_timeout = 1234;"
+                            "PRAGMA synchronous = NORMAL"
+                        ),
+                        "transaction_mode": "IMMEDIATE",
+                    },
+                }
+            }
+        )
+        self.connection = handler["default"]
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_init_command_runs_on_every_connection(self):
+        for _ in range(2):
+            self.assertEqual(self.pragma("journal_mode"), "wal")
+            self.assertEqual(self.pragma("busy_timeout"), 1234)
+            # NORMAL
+            self.assertEqual(self.pragma("synchronous"), 1)
+            self.connection.close()
+
+    def test_transactions_begin_immediate(self):
+        self.connection.ensure_connection()
+        with CaptureQueriesContext(self.connection) as queries:
+            self.connection._start_transaction_under_autocommit()
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
+        # The write lock is held before anything is written
+        self.assertTrue(self.connection.connection.in_transaction)
+        self.connection.rollback()
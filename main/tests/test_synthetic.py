@@ -0,0 +1,107 @@
+from django.db.models import Count, F, Q
+from django.test import TestCase
+
+from department.models import Hospitalization, Observation, VitalSigns
+from department.services import census_drift
+from main.models import User
+from main.synthetic import SyntheticHospital, clear_synthetic
+from main.testing import SYNTHETIC_UNTIL, SyntheticHospitalTestCase
+from patient.models import Patient
+from scales.models import NewsScale, PainScale
+
+
+class SyntheticHospitalTest(SyntheticHospitalTestCase):
+    def test_counts(self):
+        self.assertEqual(self.hospital_counts["Department"], 3)
+        self.assertEqual(self.hospital_counts["Patient"], 60)
+        # One admin and four staff members per department
+        self.assertEqual(User.objects.count(), 13)
+        self.assertGreater(self.hospital_counts["Hospitalization"], 60)
+        self.assertEqual(
+            self.hospital_counts["NewsScale"], self.hospital_counts["VitalSigns"]
+        )
+        for name, count in self.hospital_counts.items():
+            self.assertGreater(count, 0, name)
+
+    def test_same_seed_same_hospital(self):
+        def snapshot():
+            return (
+                list(Patient.objects.order_by("id").values_list("id", "last_name")),
+                list(
+                    VitalSigns.objects.order_by("id").values_list(
+                        "id", "created_at", "heart_rate", "temperature"
+                    )
+                ),
+            )
+
+        first = snapshot()
+        clear_synthetic()
+        self.assertFalse(Patient.objects.exists())
+        SyntheticHospital(seed=0, until=SYNTHETIC_UNTIL).generate(**self.hospital_size)
+        self.assertEqual(snapshot(), first)
+
+    def test_stays_are_realistic(self):
+        stays = Hospitalization.objects.all()
+        self.assertFalse(stays.filter(admitted_on__gte=SYNTHETIC_UNTIL).exists())
+        self.assertFalse(stays.filter(discharged_on__lte=F("admitted_on")).exists())
+        self.assertFalse(
+            stays.filter(
+                Q(is_discharged=True, discharged_on__isnull=True)
+                | Q(is_discharged=False, discharged_on__isnull=False)
+            ).exists()
+        )
+        # No patient is admitted twice at once
+        ongoing = Patient.objects.annotate(
+            ongoing=Count(
+                "hospitalizations", filter=Q(hospitalizations__is_discharged=False)
+            )
+        )
+        self.assertFalse(ongoing.filter(ongoing__gt=1).exists())
+        self.assertTrue(
+            Patient.objects.annotate(stays=Count("hospitalizations"))
+            .filter(stays__gt=1)
+            .exists()
+        )
+        # Charting happens during the stay
+        for model in (VitalSigns, Observation, PainScale):
+            entries = model.objects.all()
+            self.assertFalse(
+                entries.filter(
+                    created_at__lt=F("hospitalization__admitted_on")
+                ).exists()
+            )
+            self.assertFalse(
+                entries.filter(
+                    created_at__gt=F("hospitalization__discharged_on")
+                ).exists()
+            )
+
+    def test_scores_match_the_scales(self):
+        for score in NewsScale.objects.select_related("vital_signs")[:50]:
+            self.assertEqual(score.total_score, score.calculate_total_score())
+            self.assertEqual(score.heart_rate, score.vital_signs.heart_rate)
+            self.assertIn(f"= {score.total_score}.", score.score_interpretation)
+        pain = PainScale.objects.first()
+        self.assertEqual(pain.pain_interpretation, pain.calculate_pain_intepretation())
+
+    def test_census_is_consistent(self):
+        self.assertEqual(census_drift(), {})
+
+    def test_staff_can_sign_in(self):
+        self.assertTrue(self.client.login(email=self.nurse.email, password="synthetic"))
+
+
+class ClearSyntheticTest(TestCase):
+    def test_only_synthetic_rows_are_removed(self):
+        user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        SyntheticHospital(seed=1, until=SYNTHETIC_UNTIL).generate(1, 5)
+        clear_synthetic()
+        self.assertEqual(list(User.objects.all()), [user])
+        self.assertFalse(Hospitalization.objects.exists())
+        self.assertFalse(NewsScale.objects.exists())
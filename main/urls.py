@@ -9,4 +9,6 @@ urlpatterns = [
     path("login/", views.login_view, name="login"),
     path("signup/", views.signup_view, name="signup"),
     path("logout/", views.logout_view, name="logout"),
+    # Without a trailing slash, the path Prometheus scrapes by default
+    path("metrics", views.metrics, name="metrics"),
 ]
@@ -1,10 +1,18 @@
+import hmac
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
+from django.http import HttpResponse
 from django.shortcuts import render, redirect
 from django.contrib import auth, messages
 from django.contrib.auth.decorators import login_required
 
+from department.cache import fragment_stats, stats as cache_stats
+from department.models import DepartmentCensus
+from department.services import current_census
 
+from . import metrics as prometheus
 from .models import User, USER_CHOICES
 
 @login_required(login_url="/login/")
@@ -90,3 +98,74 @@ def logout_view(request):
     # Logs out the user and redirects to the login page.
     auth.logout(request)
     return redirect("main:login")
+
+
+def _census_metrics():
+    # Occupancy gauges read from the materialized census, one row per department,
+    # instead of counting hospitalizations on every scrape
+    gauges = {
+        field: prometheus.Gauge(
+            f"czaro_department_{field}",
+            description,
+            ["department_id", "department"],
+        )
+        for field, description in (
+            ("admitted", "Patients currently admitted, by department."),
+            ("admitted_today", "Patients admitted since midnight, by department."),
+            ("discharged_today", "Patients discharged since midnight, by department."),
+        )
+    }
+    for census in DepartmentCensus.objects.select_related("department"):
+        census = current_census(census, census.department_id)
+        for field, gauge in gauges.items():
+            gauge.set(
+                getattr(census, field),
+                department_id=census.department_id,
+                department=census.department.name,
+            )
+    return gauges.values()
+
+
+def _cache_metrics():
+    # The dashboard cache counters of this process
+    lookups = prometheus.Counter(
+        "czaro_cache_lookups_total",
+        "Dashboard cache lookups, by cache and result.",
+        ["cache", "result"],
+    )
+    invalidations = prometheus.Counter(
+        "czaro_cache_invalidations_total",
+        "Dashboard cache invalidations, by cache.",
+        ["cache"],
+    )
+    hit_ratio = prometheus.Gauge(
+        "czaro_cache_hit_ratio",
+        "Share of dashboard cache lookups served from the cache, by cache.",
+        ["cache"],
+    )
+    for name, counters in (("roster", cache_stats), ("fragments", fragment_stats)):
+        snapshot = counters.snapshot()
+        lookups.inc(snapshot["hits"], cache=name, result="hit")
+        lookups.inc(snapshot["misses"], cache=name, result="miss")
+        invalidations.inc(snapshot["invalidations"], cache=name)
+        if snapshot["hit_ratio"] is not None:
+            hit_ratio.set(snapshot["hit_ratio"], cache=name)
+    return lookups, invalidations, hit_ratio
+
+
+def _may_scrape(request):
+    # Scrapers send the METRICS_TOKEN as a bearer token; admins may look in a browser
+    token = settings.METRICS_TOKEN
+    if token:
+        given = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if hmac.compare_digest(given.encode(), token.encode()):
+            return True
+    return request.user.is_authenticated and request.user.profession == "admins"
+
+
+def metrics(request):
+    # Serves the metrics of this process in the Prometheus text format.
+    if not _may_scrape(request):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    document = prometheus.registry.exposition(*_census_metrics(), *_cache_metrics())
+    return HttpResponse(document, content_type=prometheus.CONTENT_TYPE)
@@ -0,0 +1,159 @@
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.db import transaction
+
+from . import search
+from .forms import PatientForm
+from .models import Patient
+
+IMPORT_FORMATS = ("csv", "json", "ndjson")
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def import_format(path, requested=None):
+    # The format asked for, or the one the file extension names
+    name = requested or os.path.splitext(path)[1].lstrip(".").lower()
+    if name == "jsonl":
+        name = "ndjson"
+    if name not in IMPORT_FORMATS:
+        raise InvalidImport(
+            f"Cannot tell the format of {path}; pass one of {', '.join(IMPORT_FORMATS)}."
+        )
+    return name
+
+
+def read_rows(source, file_format):
+    # Yields (line, row) pairs from an open text file without reading it whole.
+    # A JSON file holds a list of objects and is the one format parsed in one go.
+    if file_format == "csv":
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == "ndjson":
+        for line, text in enumerate(source, start=1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except ValueError as error:
+                    yield line, error
+    else:
+        try:
+            rows = json.load(source)
+        except ValueError as error:
+            raise InvalidImport(f"Malformed JSON: {error}")
+        if not isinstance(rows, list):
+            raise InvalidImport("Expected a list of patients.")
+        yield from enumerate(rows, start=1)
+
+
+def validate_rows(rows):
+    # Checks rows with the PatientForm rules. Runs in worker processes, so it takes and
+    # returns plain data: (line, cleaned data, None) or (line, None, errors).
+    results = []
+    for line, row in rows:
+        if isinstance(row, Exception):
+            results.append((line, None, {"__all__": [f"Malformed JSON: {row}"]}))
+            continue
+        if not isinstance(row, dict):
+            results.append((line, None, {"__all__": ["Expected an object."]}))
+            continue
+        form = PatientForm(row)
+        if form.is_valid():
+            results.append((line, form.cleaned_data, None))
+        else:
+            errors = {field: list(messages) for field, messages in form.errors.items()}
+            results.append((line, None, errors))
+    return results
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def validated_chunks(rows, chunk_size, workers):
+    # Validates chunks of rows in a pool of worker processes and yields the results in
+    # file order. Only a few chunks per worker are in flight, so the file is still read
+    # as it is consumed. Without workers the rows are validated in this process.
+    chunks = _chunks(rows, chunk_size)
+    if workers <= 1:
+        yield from map(validate_rows, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(validate_rows, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def identity(first_name, last_name, date_of_birth):
+    # Patients are the same person when their names and date of birth match
+    return (
+        search.normalize(first_name.strip()),
+        search.normalize(last_name.strip()),
+        date_of_birth,
+    )
+
+
+def existing_identities():
+    patients = Patient.objects.values_list("first_name", "last_name", "date_of_birth")
+    return {identity(*patient) for patient in patients.iterator(chunk_size=5000)}
+
+
+class PatientImport:
+    # Turns validated rows into patients, skipping people already in the database or
+    # earlier in the file, and inserts them one batch per transaction.
+
+    def __init__(self, user, batch_size=1000):
+        self.user = user
+        self.batch_size = batch_size
+        self.seen = existing_identities()
+        self.pending = []
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = []
+
+    def add(self, results):
+        for line, cleaned_data, errors in results:
+            if errors:
+                self.invalid.append((line, errors))
+                continue
+            key = identity(
+                cleaned_data["first_name"],
+                cleaned_data["last_name"],
+                cleaned_data["date_of_birth"],
+            )
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            self.pending.append(Patient(created_by=self.user, **cleaned_data))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        patients, self.pending = self.pending, []
+        with transaction.atomic():
+            Patient.objects.bulk_create(patients, batch_size=self.batch_size)
+            transaction.on_commit(lambda: _index(patients))
+        self.imported += len(patients)
+
+
+def _index(patients):
+    for patient in patients:
+        search.index_patient(patient)
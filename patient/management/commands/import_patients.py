@@ -0,0 +1,96 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import User
+from patient.importer import (
+    IMPORT_FORMATS,
+    InvalidImport,
+    PatientImport,
+    import_format,
+    read_rows,
+    validated_chunks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports patients from a CSV, JSON or NDJSON file, validated with the patient "
+        "form rules in worker processes and inserted in batches. Patients whose names "
+        "and date of birth are already known are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--email", required=True, help="User recorded as creating the patients."
+        )
+        parser.add_argument("--format", choices=IMPORT_FORMATS)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Validation processes; 1 validates in this process.",
+        )
+        parser.add_argument(
+            "--max-errors",
+            type=int,
+            default=20,
+            help="Invalid rows listed in the report.",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options["email"]).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['email']}.")
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be at least 1.")
+
+        try:
+            file_format = import_format(options["path"], options["format"])
+            with open(options["path"], newline="", encoding="utf-8-sig") as source:
+                patients = self.run(
+                    read_rows(source, file_format),
+                    PatientImport(user, options["batch_size"]),
+                    options["batch_size"],
+                    options["workers"],
+                )
+        except OSError as error:
+            raise CommandError(f"Cannot read {options['path']}: {error.strerror}.")
+        except InvalidImport as error:
+            raise CommandError(str(error))
+
+        for line, errors in patients.invalid[: options["max_errors"]]:
+            for field, messages in errors.items():
+                self.stderr.write(f"Line {line}: {field}: {' '.join(messages)}")
+        if len(patients.invalid) > options["max_errors"]:
+            self.stderr.write(
+                f"... and {len(patients.invalid) - options['max_errors']} more invalid rows"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {patients.imported} patients, skipped {patients.duplicates} "
+                f"duplicates and {len(patients.invalid)} invalid rows."
+            )
+        )
+
+    def run(self, rows, patients, batch_size, workers):
+        started = time.perf_counter()
+        processed = 0
+        for results in validated_chunks(rows, batch_size, workers):
+            patients.add(results)
+            processed += len(results)
+            self.progress(processed, patients, started)
+        patients.flush()
+        return patients
+
+    def progress(self, processed, patients, started):
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{processed} rows read, {patients.imported} imported, "
+            f"{patients.duplicates} duplicates, {len(patients.invalid)} invalid "
+            f"({rate:.0f} rows/s)"
+        )
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Trigram indexes only exist on PostgreSQL; other databases use the in-process index
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in ("first_name", "last_name", "insurance"):
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS patient_{column}_trgm_idx "
+            f"ON patient_patient USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in ("first_name", "last_name", "insurance"):
+        schema_editor.execute(f"DROP INDEX IF EXISTS patient_{column}_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("patient", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
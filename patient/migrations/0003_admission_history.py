@@ -0,0 +1,86 @@
+# Generated by Django 5.0 on 2026-10-18 11:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def populate_admission_history(apps, schema_editor):
+    # Seeds the admission history of every existing patient from their hospitalizations
+    Patient = apps.get_model("patient", "Patient")
+    Hospitalization = apps.get_model("department", "Hospitalization")
+    histories = (
+        Hospitalization.objects.order_by()
+        .values("patient_id")
+        .annotate(
+            ongoing=Count("id", filter=Q(is_discharged=False)),
+            discharged=Count("id", filter=Q(is_discharged=True)),
+            total=Count("id"),
+            latest=Max("discharged_on", filter=Q(is_discharged=True)),
+        )
+    )
+    patients = [
+        Patient(
+            id=history["patient_id"],
+            ongoing_admissions=history["ongoing"] > 0,
+            discharged_admissions=history["discharged"],
+            total_admissions=history["total"],
+            latest_discharge_date=history["latest"],
+        )
+        for history in histories
+    ]
+    Patient.objects.bulk_update(
+        patients,
+        [
+            "ongoing_admissions",
+            "discharged_admissions",
+            "total_admissions",
+            "latest_discharge_date",
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("patient", "0002_search_trigram_indexes"),
+        ("department", "0006_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patient",
+            name="discharged_admissions",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="latest_discharge_date",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="ongoing_admissions",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="total_admissions",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(
+                fields=[
+                    "-ongoing_admissions",
+                    "-discharged_admissions",
+                    "-latest_discharge_date",
+                    "-id",
+                ],
+                name="patient_registry_idx",
+            ),
+        ),
+        migrations.RunPython(populate_admission_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    # Every field the PostgreSQL search matches on needs an index, or the whole match
+    # falls back to a scan. Other databases use the in-process index.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS patient_contact_number_trgm_idx "
+        "ON patient_patient USING gin (contact_number gin_trgm_ops)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS patient_date_of_birth_idx "
+        "ON patient_patient (date_of_birth)"
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS patient_contact_number_trgm_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS patient_date_of_birth_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("patient", "0003_admission_history"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
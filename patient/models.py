@@ -29,6 +29,27 @@ class Patient(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True, null=True)
 
+    # Admission history, the sort keys of the patient registry. Kept in step with the
+    # hospitalizations by the department services, like the department census.
+    ongoing_admissions = models.BooleanField(default=False)
+    discharged_admissions = models.PositiveIntegerField(default=0)
+    total_admissions = models.PositiveIntegerField(default=0)
+    latest_discharge_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The registry order, so a page reads only its own rows
+            models.Index(
+                fields=[
+                    "-ongoing_admissions",
+                    "-discharged_admissions",
+                    "-latest_discharge_date",
+                    "-id",
+                ],
+                name="patient_registry_idx",
+            ),
+        ]
+
     def __str__(self):
         # String representation of the Patient record
         return f"{self.first_name} {self.last_name}"
@@ -0,0 +1,316 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from datetime import date, timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Patient
+
+# Fields searched, in the order they are shown in results
+SEARCH_FIELDS = (
+    "first_name",
+    "last_name",
+    "date_of_birth",
+    "contact_number",
+    "insurance",
+)
+MIN_SIMILARITY = 0.3
+# A year, a month or a day, the prefixes of a date of birth as it is indexed
+DATE_PREFIX = re.compile(r"(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?")
+
+
+def normalize(value):
+    # Lowercases text and strips accents so "Łukasz" and "lukasz" index the same way
+    text = unicodedata.normalize("NFKD", str(value)).casefold()
+    text = text.replace("ł", "l")
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(value):
+    # Splits text into normalized words, keeping dates and phone numbers whole
+    text = normalize(value)
+    for separator in ",;()+":
+        text = text.replace(separator, " ")
+    return text.split()
+
+
+def trigrams(words):
+    # Padded trigrams of every word; the two leading blanks make prefixes score highly
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def patient_document(patient):
+    # The searchable words and the result payload of a patient
+    fields = {field: getattr(patient, field) for field in SEARCH_FIELDS}
+    words = []
+    for value in fields.values():
+        words.extend(tokenize(value))
+    payload = {"id": str(patient.id), **{key: str(value) for key, value in fields.items()}}
+    return words, payload
+
+
+def date_range(term):
+    # The first and last dates starting with a "YYYY", "YYYY-MM" or "YYYY-MM-DD" term
+    match = DATE_PREFIX.fullmatch(term)
+    if match is None:
+        return None
+    year, month, day = (int(part) if part else None for part in match.groups())
+    try:
+        if day:
+            return date(year, month, day), date(year, month, day)
+        if month:
+            following = date(year + month // 12, month % 12 + 1, 1)
+            return date(year, month, 1), following - timedelta(days=1)
+        return date(year, 1, 1), date(year, 12, 31)
+    except ValueError:
+        return None
+
+
+def similarity(term, term_grams, word):
+    # 1 for a prefix match, otherwise the Dice coefficient of the two trigram sets
+    if word.startswith(term):
+        return 1.0
+    word_grams = trigrams([word])
+    return 2 * len(term_grams & word_grams) / (len(term_grams) + len(word_grams))
+
+
+class NgramIndex:
+    # In-process trigram index over patients with prefix and typo tolerant matching.
+    # Posting lists narrow the candidates down, then each query word is scored against
+    # the closest word of every candidate.
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(set)
+        self._documents = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def ids(self):
+        with self._lock:
+            return set(self._documents)
+
+    def add(self, patient_id, words, payload):
+        grams = trigrams(words)
+        with self._lock:
+            self.remove(patient_id)
+            self._documents[patient_id] = (grams, words, payload)
+            for gram in grams:
+                self._postings[gram].add(patient_id)
+
+    def remove(self, patient_id):
+        with self._lock:
+            document = self._documents.pop(patient_id, None)
+            if document is None:
+                return
+            for gram in document[0]:
+                postings = self._postings[gram]
+                postings.discard(patient_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def _candidates(self, term_grams):
+        # A word close enough to the term shares at least half of its trigrams, so it
+        # must appear in one of the rarest len(grams) - required + 1 posting lists.
+        # Scanning only those keeps very common trigrams from dominating the cost.
+        grams = sorted(term_grams, key=lambda gram: len(self._postings.get(gram, ())))
+        required = max(1, len(grams) // 2)
+        candidates = set()
+        for gram in grams[: len(grams) - required + 1]:
+            candidates.update(self._postings.get(gram, ()))
+        return {
+            patient_id: shared
+            for patient_id in candidates
+            if (shared := len(term_grams & self._documents[patient_id][0])) >= required
+        }
+
+    def search(self, query, limit=20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        term_grams = [(term, trigrams([term])) for term in terms]
+        with self._lock:
+            shared = None
+            # Every query word has to match, so intersect starting from the narrowest word
+            for _, grams in term_grams:
+                matches = self._candidates(grams)
+                if shared is None:
+                    shared = matches
+                else:
+                    shared = {
+                        patient_id: count + matches[patient_id]
+                        for patient_id, count in shared.items()
+                        if patient_id in matches
+                    }
+                if not shared:
+                    return []
+            best = heapq.nlargest(max(limit * 10, 200), shared.items(), key=itemgetter(1))
+            candidates = [self._documents[patient_id] for patient_id, _ in best]
+        results = []
+        for _, words, payload in candidates:
+            score = sum(
+                max(similarity(term, grams, word) for word in words)
+                for term, grams in term_grams
+            ) / len(term_grams)
+            if score >= MIN_SIMILARITY:
+                results.append((score, payload))
+        results.sort(key=itemgetter(0), reverse=True)
+        return [dict(payload, score=round(score, 3)) for score, payload in results[:limit]]
+
+
+class InMemorySearchBackend:
+    # Serves searches from an NgramIndex built lazily from the database.
+    # Other processes' writes are picked up by a periodic refresh of recently modified rows,
+    # and their deletions by comparing the indexed patients with the table on each refresh.
+
+    def __init__(self, refresh_seconds=30):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.index = NgramIndex()
+        self._synced_at = None
+        self._checked_at = 0
+
+    def _load(self, patients):
+        for patient in patients.only(*SEARCH_FIELDS).iterator(chunk_size=2000):
+            self.index.add(patient.id, *patient_document(patient))
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            started_at = timezone.now()
+            if self._synced_at is None:
+                self._load(Patient.objects.all())
+            else:
+                self._load(Patient.objects.filter(modified_at__gte=self._synced_at))
+                self._drop_deleted()
+            self._synced_at = started_at
+            self._checked_at = now
+
+    def _drop_deleted(self):
+        # Every existing patient is indexed by now, so a deletion leaves the index larger
+        # than the table. Only then are the ids compared.
+        if Patient.objects.count() >= len(self.index):
+            return
+        existing = set(Patient.objects.values_list("id", flat=True).iterator())
+        for patient_id in self.index.ids() - existing:
+            self.index.remove(patient_id)
+
+    def search(self, query, limit=20):
+        self._ensure_fresh()
+        return self.index.search(query, limit)
+
+    def index_patient(self, patient):
+        if self._synced_at is not None:
+            self.index.add(patient.id, *patient_document(patient))
+
+    def remove_patient(self, patient_id):
+        self.index.remove(patient_id)
+
+
+class PostgresTrigramSearchBackend:
+    # Delegates matching to pg_trgm in PostgreSQL, so the database is the index.
+    # Every word has to match a field through an operator the trigram and date of birth
+    # indexes serve (<% and LIKE, a date range); word similarity only ranks the matches.
+
+    def matches(self, terms):
+        # Patients matching every word, best first
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        query = " ".join(terms)
+        score = Greatest(
+            TrigramWordSimilarity(query, "first_name"),
+            TrigramWordSimilarity(query, "last_name"),
+            TrigramWordSimilarity(query, "insurance"),
+        )
+        matches = Q()
+        for term in terms:
+            match = (
+                Q(first_name__trigram_word_similar=term)
+                | Q(last_name__trigram_word_similar=term)
+                | Q(insurance__trigram_word_similar=term)
+                | Q(insurance__startswith=term)
+                | Q(contact_number__contains=term)
+            )
+            born = date_range(term)
+            if born is not None:
+                match |= Q(date_of_birth__range=born)
+            matches &= match
+        return (
+            Patient.objects.filter(matches)
+            .annotate(score=score)
+            .order_by("-score")
+            .only(*SEARCH_FIELDS)
+        )
+
+    def search(self, query, limit=20):
+        terms = query.split()
+        if not terms:
+            return []
+        # <% matches from pg_trgm.word_similarity_threshold, 0.6 unless set, which misses
+        # transposed letters. It is set for this transaction only, which needs no
+        # privileges and also holds behind a transaction pooler.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(MIN_SIMILARITY)],
+            )
+            patients = list(self.matches(terms)[:limit])
+        results = []
+        for patient in patients:
+            _, payload = patient_document(patient)
+            results.append(dict(payload, score=round(patient.score, 3)))
+        return results
+
+    def index_patient(self, patient):
+        pass
+
+    def remove_patient(self, patient_id):
+        pass
+
+
+_backend = None
+
+
+def get_backend():
+    # Picks the PostgreSQL backend when available unless configured otherwise
+    global _backend
+    if _backend is None:
+        name = getattr(settings, "PATIENT_SEARCH_BACKEND", "auto")
+        if name == "postgres" or (name == "auto" and connection.vendor == "postgresql"):
+            _backend = PostgresTrigramSearchBackend()
+        else:
+            _backend = InMemorySearchBackend(
+                getattr(settings, "PATIENT_SEARCH_REFRESH_SECONDS", 30)
+            )
+    return _backend
+
+
+def find_patients(query, limit=20):
+    return get_backend().search(query, limit)
+
+
+def index_patient(patient):
+    get_backend().index_patient(patient)
+
+
+def remove_patient(patient_id):
+    get_backend().remove_patient(patient_id)
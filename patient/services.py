@@ -0,0 +1,179 @@
+import base64
+import json
+import uuid
+from datetime import date, datetime
+
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.shortcuts import aget_object_or_404
+
+from .models import Patient
+from department.models import Hospitalization
+from department.services import CHART_SECTIONS
+from scales.models import NewsScale, PainScale
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def patient_registry():
+    # Patients by admission history, ongoing admissions first, then the most discharged
+    # and the most recently discharged. The id breaks the remaining ties. The keys are
+    # stored on the patient and patient_registry_idx holds them in this order, so a page
+    # reads its own rows whatever the size of the registry. Only patients never
+    # discharged have no discharge date, so the nulls never meet other dates.
+    return Patient.objects.order_by(
+        "-ongoing_admissions",
+        "-discharged_admissions",
+        "-latest_discharge_date",
+        "-id",
+    )
+
+
+def chart_count(model):
+    # Number of entries a charting table holds for the outer hospitalization
+    return Coalesce(
+        Subquery(
+            model.objects.filter(hospitalization=OuterRef("pk"))
+            .order_by()
+            .values("hospitalization")
+            .annotate(count=Count("id"))
+            .values("count"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def latest_chart_value(model, field):
+    # The field of the newest entry a charting table holds for the outer hospitalization
+    return Subquery(
+        model.objects.filter(hospitalization=OuterRef("pk"))
+        .order_by("-created_at")
+        .values(field)[:1]
+    )
+
+
+def stay_summaries(patient_id):
+    # Stays of a patient, newest admission first, with their departments, the number of
+    # entries in every charting section and the latest NEWS total and pain level.
+    # A single query however many times the patient was admitted.
+    return (
+        Hospitalization.objects.filter(patient_id=patient_id)
+        .select_related("department")
+        .annotate(
+            latest_news=latest_chart_value(NewsScale, "total_score"),
+            latest_pain=latest_chart_value(PainScale, "pain_level"),
+            **{f"{name}_count": chart_count(model) for name, model in CHART_SECTIONS},
+        )
+    )
+
+
+def _summarize(stay):
+    stay.chart_counts = {
+        name: getattr(stay, f"{name}_count") for name, _ in CHART_SECTIONS
+    }
+    stay.chart_entries = sum(stay.chart_counts.values())
+    return stay
+
+
+async def apatient_summary(patient_id):
+    # A patient with the summaries of their stays and their ongoing stay, in two queries.
+    # Returns (patient, stays, ongoing stay or None).
+    patient = await aget_object_or_404(Patient, id=patient_id)
+    stays = [_summarize(stay) async for stay in stay_summaries(patient.id)]
+    ongoing = next((stay for stay in stays if not stay.is_discharged), None)
+    return patient, stays, ongoing
+
+
+def ongoing_departments(patient):
+    # Departments where the patient is currently admitted
+    return list(
+        patient.hospitalizations.filter(is_discharged=False)
+        .order_by()
+        .values_list("department_id", flat=True)
+    )
+
+
+def search_patients(queryset, query):
+    # Narrows patients down to those matching every word of the query.
+    # A word matches the start of the first or last name or of the insurance number,
+    # and a YYYY-MM-DD word matches the date of birth.
+    for term in query.split():
+        try:
+            birth_date = date.fromisoformat(term)
+        except ValueError:
+            queryset = queryset.filter(
+                Q(first_name__istartswith=term)
+                | Q(last_name__istartswith=term)
+                | Q(insurance__startswith=term)
+            )
+        else:
+            queryset = queryset.filter(date_of_birth=birth_date)
+    return queryset
+
+
+def encode_cursor(patient):
+    # Serializes the ordering key of a patient into an opaque URL-safe token
+    latest = patient.latest_discharge_date
+    key = [
+        patient.ongoing_admissions,
+        patient.discharged_admissions,
+        latest.isoformat() if latest else None,
+        str(patient.id),
+    ]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        ongoing, discharged, latest, patient_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+        latest = datetime.fromisoformat(latest) if latest else None
+        return bool(ongoing), int(discharged), latest, uuid.UUID(patient_id)
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidCursor(cursor)
+
+
+def after_cursor(cursor):
+    # Builds the filter selecting the patients ordered after the cursor. It compares the
+    # stored sort keys only, so the database can seek patient_registry_idx to it.
+    ongoing, discharged, latest, patient_id = decode_cursor(cursor)
+    following = Q(ongoing_admissions=False) if ongoing else Q(pk__in=[])
+    same = Q(ongoing_admissions=ongoing)
+    following |= same & Q(discharged_admissions__lt=discharged)
+    same &= Q(discharged_admissions=discharged)
+    if latest is None:
+        same &= Q(latest_discharge_date__isnull=True)
+    else:
+        following |= same & (
+            Q(latest_discharge_date__lt=latest) | Q(latest_discharge_date__isnull=True)
+        )
+        same &= Q(latest_discharge_date=latest)
+    following |= same & Q(id__lt=patient_id)
+    return following
+
+
+def patient_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    # Returns one page of an ordered patient registry and the cursor of the next page
+    if cursor:
+        queryset = queryset.filter(after_cursor(cursor))
+    patients = list(queryset[: page_size + 1])
+    if len(patients) > page_size:
+        patients = patients[:page_size]
+        return patients, encode_cursor(patients[-1])
+    return patients, None
+
+
+def parse_page_size(value):
+    # Clamps a requested page size to the allowed range
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return min(max(page_size, 1), MAX_PAGE_SIZE)
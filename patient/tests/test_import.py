@@ -0,0 +1,158 @@
+import csv
+import json
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from main.models import User
+from patient.importer import PatientImport, validate_rows
+from patient.models import Patient
+
+FIELDS = [
+    "first_name",
+    "last_name",
+    "date_of_birth",
+    "contact_number",
+    "is_insured",
+    "insurance",
+    "country",
+    "city",
+    "street",
+    "zip_code",
+]
+
+
+def patient_row(first_name, last_name="Master", date_of_birth="1999-09-09"):
+    return {
+        "first_name": first_name,
+        "last_name": last_name,
+        "date_of_birth": date_of_birth,
+        "contact_number": "+48600500400",
+        "is_insured": "True",
+        "insurance": "1234567890",
+        "country": "Country",
+        "city": "City",
+        "street": "Street",
+        "zip_code": "00-00",
+    }
+
+
+class ImportPatientsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        Patient.objects.create(created_by=cls.user, **patient_row("Known"))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write_csv(self, rows):
+        path = self.directory / "patients.csv"
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command(
+            "import_patients",
+            str(path),
+            "--email",
+            self.user.email,
+            *args,
+            stdout=out,
+            stderr=err,
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import(self):
+        rows = [patient_row(f"Patient{number}") for number in range(5)]
+        rows.append(dict(patient_row("Broken"), date_of_birth="09.09.1999"))
+        path = self.write_csv(rows)
+        out, err = self.run_import(path, "--workers", "1", "--batch-size", "2")
+
+        self.assertIn(
+            "Imported 5 patients, skipped 0 duplicates and 1 invalid rows", out
+        )
+        self.assertIn("6 rows read", out)
+        self.assertIn("Line 7: date_of_birth:", err)
+        imported = Patient.objects.filter(first_name__startswith="Patient")
+        self.assertEqual(imported.count(), 5)
+        patient = imported.get(first_name="Patient3")
+        self.assertEqual(patient.date_of_birth, date(1999, 9, 9))
+        self.assertTrue(patient.is_insured)
+        self.assertEqual(patient.created_by, self.user)
+
+    def test_duplicates_are_skipped(self):
+        rows = [
+            patient_row("known"),
+            patient_row("Twin"),
+            patient_row(" twin "),
+            patient_row("Twin", date_of_birth="2001-01-01"),
+        ]
+        out, _ = self.run_import(self.write_csv(rows), "--workers", "1")
+        self.assertIn("Imported 2 patients, skipped 2 duplicates", out)
+        self.assertEqual(Patient.objects.filter(first_name="Twin").count(), 2)
+
+    def test_json_and_ndjson_import(self):
+        path = self.directory / "patients.json"
+        path.write_text(json.dumps([patient_row("Json")]))
+        self.run_import(path, "--workers", "1")
+        path = self.directory / "patients.ndjson"
+        path.write_text(
+            json.dumps(patient_row("Ndjson"))
+            + "\n\n{not json\n"
+            + json.dumps([1])
+            + "\n"
+        )
+        out, err = self.run_import(path, "--workers", "1")
+        self.assertIn(
+            "Imported 1 patients, skipped 0 duplicates and 2 invalid rows", out
+        )
+        self.assertIn("Line 3: __all__: Malformed JSON", err)
+        self.assertIn("Line 4: __all__: Expected an object.", err)
+        self.assertTrue(Patient.objects.filter(first_name="Json").exists())
+        self.assertTrue(Patient.objects.filter(first_name="Ndjson").exists())
+
+    def test_worker_processes_validate_in_file_order(self):
+        rows = [patient_row(f"Worker{number}") for number in range(30)]
+        out, _ = self.run_import(
+            self.write_csv(rows), "--workers", "2", "--batch-size", "4"
+        )
+        self.assertIn("Imported 30 patients", out)
+        self.assertEqual(
+            Patient.objects.filter(first_name__startswith="Worker").count(), 30
+        )
+
+    def test_batches_are_bulk_inserted(self):
+        results = validate_rows(
+            (line, patient_row(f"Batch{line}")) for line in range(1, 6)
+        )
+        patients = PatientImport(self.user, batch_size=2)
+        # A single insert per batch, inside the savepoint of its transaction
+        with self.assertNumQueries(3 * 3):
+            patients.add(results)
+            patients.flush()
+        self.assertEqual(patients.imported, 5)
+
+    def test_bad_arguments(self):
+        with self.assertRaisesMessage(CommandError, "Cannot tell the format"):
+            self.run_import(self.directory / "patients.xlsx")
+        with self.assertRaisesMessage(CommandError, "Cannot read"):
+            self.run_import(self.directory / "missing.csv")
+        with self.assertRaisesMessage(CommandError, "No user with email"):
+            call_command("import_patients", "patients.csv", "--email", "nobody@x.com")
@@ -0,0 +1,210 @@
+import uuid
+from datetime import date
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from department.tests.test_indexes import IndexUsageTestMixin
+from main.models import User
+from patient import search
+from patient.models import Patient
+from patient.search import NgramIndex
+
+
+class NgramIndexTest(TestCase):
+    def setUp(self):
+        self.index = NgramIndex()
+        self.ids = {}
+        for first_name, last_name, insurance in [
+            ("Anna", "Kowalska", "1234567890"),
+            ("Łukasz", "Nowak", "5550001111"),
+            ("Jan", "Kowalczyk", "9876543210"),
+        ]:
+            patient_id = uuid.uuid4()
+            self.ids[last_name] = patient_id
+            patient = Patient(
+                id=patient_id,
+                first_name=first_name,
+                last_name=last_name,
+                date_of_birth=date(1980, 1, 2),
+                contact_number="+48600500400",
+                insurance=insurance,
+            )
+            self.index.add(patient_id, *search.patient_document(patient))
+
+    def names(self, query):
+        return [result["last_name"] for result in self.index.search(query)]
+
+    def test_prefix_match(self):
+        self.assertEqual(set(self.names("kowal")), {"Kowalska", "Kowalczyk"})
+
+    def test_multiple_words_narrow_results(self):
+        self.assertEqual(self.names("anna kowal")[0], "Kowalska")
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.names("kowlaska")[0], "Kowalska")
+
+    def test_accents_are_ignored(self):
+        self.assertEqual(self.names("lukasz"), ["Nowak"])
+
+    def test_insurance_and_date_of_birth(self):
+        self.assertEqual(self.names("555000"), ["Nowak"])
+        self.assertEqual(len(self.names("1980-01-02")), 3)
+
+    def test_no_match(self):
+        self.assertEqual(self.names("zzzzzz"), [])
+
+    def test_remove_and_update(self):
+        self.index.remove(self.ids["Nowak"])
+        self.assertEqual(self.names("nowak"), [])
+        self.assertEqual(len(self.index), 2)
+
+    def test_date_range(self):
+        self.assertEqual(
+            search.date_range("1980"), (date(1980, 1, 1), date(1980, 12, 31))
+        )
+        self.assertEqual(
+            search.date_range("1980-12"), (date(1980, 12, 1), date(1980, 12, 31))
+        )
+        self.assertEqual(search.date_range("1980-01-02"), (date(1980, 1, 2),) * 2)
+        self.assertIsNone(search.date_range("1980-13"))
+        self.assertIsNone(search.date_range("kowal"))
+
+
+@override_settings(PATIENT_SEARCH_BACKEND="memory")
+class PatientSearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        search._backend = None
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        search._backend = None
+
+    def find(self, query):
+        response = self.client.get(reverse("patient:search"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [result["id"] for result in response.json()["results"]]
+
+    def test_authentication_required(self):
+        self.client.logout()
+        response = self.client.get(reverse("patient:search"), {"q": "Stefan"})
+        self.assertEqual(response.status_code, 302)
+
+    def test_search_existing_patient(self):
+        self.assertEqual(self.find("stef mast"), [str(self.patient.id)])
+
+    def test_index_follows_create_update_and_delete(self):
+        self.find("warmup")
+        data = {
+            "first_name": "Zofia",
+            "last_name": "Wiśniewska",
+            "date_of_birth": "1970-05-05",
+            "contact_number": "123456789",
+            "is_insured": True,
+            "insurance": "111",
+            "country": "Country",
+            "city": "City",
+            "street": "Street",
+            "zip_code": "00-00",
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("patient:create"), data)
+        patient = Patient.objects.get(first_name="Zofia")
+        self.assertEqual(self.find("wisniew"), [str(patient.id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("patient:update", args=[patient.id]),
+                dict(data, last_name="Zielinska"),
+            )
+        self.assertEqual(self.find("wisniew"), [])
+        self.assertEqual(self.find("zielin"), [str(patient.id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("patient:delete", args=[patient.id]))
+        self.assertEqual(self.find("zielin"), [])
+
+    def test_refresh_drops_patients_deleted_elsewhere(self):
+        self.assertEqual(self.find("stef"), [str(self.patient.id)])
+        # Deleted by another process, which does not touch this process' index
+        Patient.objects.filter(id=self.patient.id).delete()
+        self.assertEqual(self.find("stef"), [str(self.patient.id)])
+        search.get_backend()._checked_at = 0
+        self.assertEqual(self.find("stef"), [])
+
+
+@skipUnless(connection.vendor == "postgresql", "pg_trgm only exists on PostgreSQL")
+class PostgresTrigramSearchTest(IndexUsageTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        for first_name, last_name, insurance, born in [
+            ("Anna", "Kowalska", "1234567890", date(1980, 1, 2)),
+            ("Jan", "Kowalczyk", "9876543210", date(1975, 6, 7)),
+            ("Piotr", "Nowak", "5550001111", date(1980, 12, 3)),
+        ]:
+            Patient.objects.create(
+                first_name=first_name,
+                last_name=last_name,
+                date_of_birth=born,
+                contact_number="+48600500400",
+                insurance=insurance,
+                country="Country",
+                city="City",
+                street="Street",
+                zip_code="00-00",
+                created_by=user,
+            )
+        cls.backend = search.PostgresTrigramSearchBackend()
+
+    def names(self, query):
+        return [result["last_name"] for result in self.backend.search(query)]
+
+    def test_prefix_typo_and_several_words(self):
+        self.assertEqual(set(self.names("kowal")), {"Kowalska", "Kowalczyk"})
+        self.assertEqual(self.names("kowlaska")[0], "Kowalska")
+        self.assertEqual(self.names("anna kowal"), ["Kowalska"])
+
+    def test_insurance_contact_number_and_date_of_birth(self):
+        self.assertEqual(self.names("555000"), ["Nowak"])
+        self.assertEqual(len(self.names("600500")), 3)
+        self.assertEqual(set(self.names("1980")), {"Kowalska", "Nowak"})
+        self.assertEqual(self.names("1980-12"), ["Nowak"])
+        self.assertEqual(self.names("kowal 1980"), ["Kowalska"])
+
+    def test_matching_uses_the_indexes(self):
+        for query in ("kowal", "anna 1980-01-02"):
+            self.assertUsesIndex(
+                self.backend.matches(query.split()), "patient_last_name_trgm_idx"
+            )
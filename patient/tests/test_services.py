@@ -0,0 +1,226 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from department.models import Department, Hospitalization, Observation
+from department.services import rebuild_admission_history
+from main.models import User
+from patient.models import Patient
+from scales.models import NewsScale, PainScale
+from patient.services import (
+    MAX_PAGE_SIZE,
+    parse_page_size,
+    stay_summaries,
+    patient_page,
+    patient_registry,
+    search_patients,
+)
+
+
+def create_patient(user, first_name, last_name, **kwargs):
+    fields = {
+        "date_of_birth": date(1999, 9, 9),
+        "contact_number": "+48600500400",
+        "is_insured": True,
+        "insurance": "1234567890",
+        "country": "Country",
+        "city": "City",
+        "street": "Street",
+        "zip_code": "00-00",
+    }
+    fields.update(kwargs)
+    return Patient.objects.create(
+        first_name=first_name, last_name=last_name, created_by=user, **fields
+    )
+
+
+class PatientRegistryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        discharged_on = timezone.now() - timedelta(days=3)
+        for number in range(12):
+            patient = create_patient(
+                cls.user,
+                f"Name{number}",
+                f"Surname{number}",
+                insurance=f"{number:03d}999",
+            )
+            # Mix ongoing stays, repeated discharges and shared discharge dates
+            for stay in range(number % 3):
+                Hospitalization.objects.create(
+                    patient=patient,
+                    department=cls.department,
+                    main_symptom="Cough",
+                    is_discharged=True,
+                    discharged_on=discharged_on - timedelta(days=number % 2),
+                )
+            if number % 4 == 0:
+                Hospitalization.objects.create(
+                    patient=patient, department=cls.department, main_symptom="Cough"
+                )
+        cls.anna = create_patient(
+            cls.user, "Anna", "Kowalska", date_of_birth=date(1980, 1, 2)
+        )
+        # The stays were created directly, without the admission services
+        rebuild_admission_history()
+
+    def test_pages_cover_the_registry_in_order(self):
+        expected = [patient.id for patient in patient_registry()]
+        seen, cursor = [], None
+        while True:
+            page, cursor = patient_page(patient_registry(), cursor, page_size=5)
+            seen.extend(patient.id for patient in page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_ongoing_admissions_come_first(self):
+        page, _ = patient_page(patient_registry(), page_size=3)
+        self.assertTrue(all(patient.ongoing_admissions for patient in page))
+
+    def test_discharged_admissions_counts_discharged_stays_only(self):
+        patient = patient_registry().get(first_name="Name4")
+        self.assertEqual(patient.discharged_admissions, 1)
+        self.assertEqual(patient.total_admissions, 2)
+        self.assertEqual(
+            patient_registry().get(id=self.anna.id).discharged_admissions, 0
+        )
+
+    def test_page_is_bounded(self):
+        with self.assertNumQueries(1):
+            page, cursor = patient_page(patient_registry(), page_size=4)
+        self.assertEqual(len(page), 4)
+        self.assertIsNotNone(cursor)
+
+    def test_search_by_name_prefix(self):
+        result = search_patients(patient_registry(), "ann kow")
+        self.assertEqual([patient.id for patient in result], [self.anna.id])
+
+    def test_search_by_date_of_birth(self):
+        result = search_patients(patient_registry(), "1980-01-02")
+        self.assertEqual([patient.id for patient in result], [self.anna.id])
+
+    def test_search_by_insurance(self):
+        result = search_patients(patient_registry(), "007")
+        self.assertEqual([patient.first_name for patient in result], ["Name7"])
+
+    def test_parse_page_size(self):
+        self.assertEqual(parse_page_size("10"), 10)
+        self.assertEqual(parse_page_size("100000"), MAX_PAGE_SIZE)
+        self.assertEqual(parse_page_size("0"), 1)
+        self.assertEqual(parse_page_size("abc"), 50)
+
+    def test_index_view_pagination(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("patient:index"), {"page_size": 5})
+        self.assertEqual(len(response.context["patients"]), 5)
+        next_cursor = response.context["next_cursor"]
+        response = self.client.get(
+            reverse("patient:index"), {"page_size": 5, "cursor": next_cursor}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["patients"]), 5)
+
+    def test_index_view_search(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("patient:index"), {"q": "Kowalska"})
+        self.assertEqual(list(response.context["patients"]), [self.anna])
+
+    def test_index_view_rejects_invalid_cursor(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("patient:index"), {"cursor": "nonsense"})
+        self.assertEqual(response.status_code, 400)
+
+
+class PatientSummaryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.department = Department.objects.create(
+            name="Cardiology", description="Heart", created_by=cls.user
+        )
+        cls.patient = create_patient(cls.user, "Anna", "Kowalska")
+        cls.discharged = Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.department,
+            main_symptom="Chest pain",
+            is_discharged=True,
+            discharged_on=timezone.now(),
+        )
+        cls.ongoing = Hospitalization.objects.create(
+            patient=cls.patient, department=cls.department, main_symptom="Fever"
+        )
+        for observation in ("First", "Second"):
+            Observation.objects.create(
+                hospitalization=cls.ongoing,
+                observation=observation,
+                created_by=cls.user,
+            )
+        for pain_level in ("3", "7"):
+            PainScale.objects.create(
+                hospitalization=cls.ongoing, created_by=cls.user, pain_level=pain_level
+            )
+        NewsScale.objects.create(
+            hospitalization=cls.ongoing,
+            created_by=cls.user,
+            respiratory_rate=16,
+            oxygen_saturation=98,
+            temperature=36.6,
+            systolic_blood_pressure=120,
+            diastolic_blood_pressure=80,
+            heart_rate=120,
+        )
+
+    def test_counts_and_latest_scores(self):
+        stays = {stay.id: stay for stay in stay_summaries(self.patient.id)}
+        ongoing = stays[self.ongoing.id]
+        self.assertEqual(ongoing.observations_count, 2)
+        self.assertEqual(ongoing.pain_scales_count, 2)
+        self.assertEqual(ongoing.news_scales_count, 1)
+        self.assertEqual(ongoing.consultations_count, 0)
+        self.assertEqual(ongoing.latest_pain, "7")
+        self.assertEqual(ongoing.latest_news, 2)
+        discharged = stays[self.discharged.id]
+        self.assertEqual(discharged.observations_count, 0)
+        self.assertIsNone(discharged.latest_news)
+
+    def test_detail_view_query_count_does_not_grow_with_stays(self):
+        self.client.force_login(self.user)
+        for _ in range(20):
+            Hospitalization.objects.create(
+                patient=self.patient,
+                department=self.department,
+                main_symptom="Cough",
+                is_discharged=True,
+                discharged_on=timezone.now(),
+            )
+        # Session and user lookups, the patient and the stay summaries
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                reverse("patient:detail", args=[self.patient.id])
+            )
+        self.assertEqual(len(response.context["hospitalizations"]), 22)
+        self.assertEqual(response.context["ongoing_admission"], self.ongoing)
+        self.assertContains(response, "5 chart entries")
+        self.assertContains(response, "Latest NEWS: 2")
+        self.assertContains(response, "Latest pain level: 7")
@@ -5,6 +5,7 @@ app_name = "patient"
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("search/", views.patient_search, name="search"),
     path("<uuid:patient_id>/detail/", views.patient_detail, name="detail"),
     path("add/", views.patient_create, name="create"),
     path("<uuid:patient_id>/update/", views.patient_update, name="update"),
@@ -1,65 +1,69 @@
+import time
+
 from django.contrib.auth.decorators import login_required
-from django.db.models import (
-    Case,
-    Count,
-    Exists,
-    F,
-    IntegerField,
-    Max,
-    OuterRef,
-    When,
-    Value,
-)
+from django.db import transaction
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from . import search
 from .forms import PatientForm
 from .models import Patient
-from department.models import Hospitalization
+from .services import (
+    InvalidCursor,
+    apatient_summary,
+    parse_page_size,
+    patient_page,
+    ongoing_departments,
+    patient_registry,
+    search_patients,
+)
+from department.cache import invalidate_departments
+from department import timeseries
+from department.services import record_removal
+from main.decorators import async_login_required
 
 
 @login_required(login_url="/login/")
 def index(request):
-    # Retrieves a list of patients with annotations and ordering based on their admissions.
-    patients = Patient.objects.annotate(
-        ongoing_admissions=Exists(
-            Hospitalization.objects.filter(patient=OuterRef("pk"), is_discharged=False)
-        ),
-        discharged_admissions=Count(
-            Case(
-                When(hospitalizations__is_discharged=True, then=1),
-                default=Value(0),
-                output_field=IntegerField(),
-            )
-        ),
-        total_admissions=Count("hospitalizations"),
-        latest_discharge_date=Max(
-            Case(
-                When(
-                    hospitalizations__is_discharged=True,
-                    then="hospitalizations__discharged_on",
-                ),
-                default=None,
-            )
-        ),
-    ).order_by(
-        F("ongoing_admissions").desc(),
-        F("discharged_admissions").desc(),
-        F("latest_discharge_date").desc(nulls_last=True),
-    )
+    # Retrieves one page of patients ordered by their admissions, optionally narrowed by a search.
+    query = request.GET.get("q", "").strip()
+    page_size = parse_page_size(request.GET.get("page_size"))
+    patients = search_patients(patient_registry(), query)
+    try:
+        patients, next_cursor = patient_page(
+            patients, request.GET.get("cursor"), page_size
+        )
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid page cursor.")
 
     context = {
+        "next_cursor": next_cursor,
+        "page_size": page_size,
         "patients": patients,
+        "query": query,
         "title": "Patients list",
     }
     return render(request, "patient_list.html", context)
 
 
 @login_required(login_url="/login/")
-def patient_detail(request, patient_id):
+def patient_search(request):
+    # Returns the patients best matching a name, date of birth, phone or insurance query as JSON.
+    query = request.GET.get("q", "")
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    started = time.perf_counter()
+    results = search.find_patients(query, limit)
+    took_ms = round((time.perf_counter() - started) * 1000, 2)
+    return JsonResponse({"query": query, "results": results, "took_ms": took_ms})
+
+
+@async_login_required(login_url="/login/")
+async def patient_detail(request, patient_id):
     # Displays details of a specific patient, including their hospitalizations and ongoing admission.
-    patient = get_object_or_404(Patient, id=patient_id)
-    hospitalizations = patient.hospitalizations.all()
-    ongoing_admission = hospitalizations.filter(is_discharged=False).first()
+    patient, hospitalizations, ongoing_admission = await apatient_summary(patient_id)
     back_url = request.META.get("HTTP_REFERER", reverse("patient:index"))
     context = {
         "patient": patient,
@@ -81,6 +85,7 @@ def patient_create(request):
             patient_form = form.save(commit=False)
             patient_form.created_by = request.user
             patient_form.save()
+            transaction.on_commit(lambda: search.index_patient(patient_form))
             return redirect("patient:index")
     else:
         form = PatientForm()
@@ -100,6 +105,9 @@ def patient_update(request, patient_id):
         form = PatientForm(request.POST, instance=patient)
         if form.is_valid():
             form.save()
+            transaction.on_commit(lambda: search.index_patient(patient))
+            # Names are shown on the rosters of the departments the patient stays in
+            invalidate_departments(*ongoing_departments(patient))
             return redirect("patient:detail", patient.id)
     else:
         form = PatientForm(instance=patient)
@@ -118,7 +126,15 @@ def patient_delete(request, patient_id):
     patient = get_object_or_404(Patient, id=patient_id)
     name = f"{patient.first_name} {patient.last_name}"
     if request.method == "POST":
-        patient.delete()
+        with transaction.atomic():
+            record_removal(patient.hospitalizations.filter(is_discharged=False))
+            invalidate_departments(*ongoing_departments(patient))
+            patient_id = patient.id
+            timeseries.drop_on_commit(
+                patient.hospitalizations.values_list("id", flat=True)
+            )
+            patient.delete()
+            transaction.on_commit(lambda: search.remove_patient(patient_id))
         return redirect("patient:index")
     back_url = reverse("patient:detail", args=[patient.id])
     context= {
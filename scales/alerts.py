@@ -0,0 +1,175 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict, deque
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.urls import reverse
+
+from department.models import Hospitalization
+from main import metrics
+from . import news
+
+# Alert level of each NEWS interpretation that calls for a response
+ALERT_LEVELS = {news.MEDIUM: "medium", news.HIGH: "high"}
+# Alerts replayed to a screen when it connects
+RECENT_ALERTS = 20
+# Alerts buffered for a screen that reads slowly before the oldest are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+
+
+class Subscription:
+    # One ward screen listening to a department, bound to the event loop serving it
+
+    def __init__(self, department_id, backlog):
+        self.department_id = department_id
+        self.backlog = backlog
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, alert):
+        # Runs on the subscriber's loop; a screen that fell behind loses its oldest alert
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(alert)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class AlertBroker:
+    # Fans alerts out to the screens subscribed to each department in this process.
+    # Publishing is thread safe, so sync views and the ORM can publish directly.
+    # Screens connected to other processes never see the alerts published here, which
+    # is why the application is served by a single process.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._recent = defaultdict(lambda: deque(maxlen=RECENT_ALERTS))
+
+    def subscribe(self, department_id):
+        # Must be called from the event loop that will read the subscription
+        department_id = str(department_id)
+        with self._lock:
+            subscription = Subscription(
+                department_id, list(self._recent[department_id])
+            )
+            self._subscribers[department_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.department_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.department_id]
+
+    def subscriber_count(self, department_id):
+        return len(self._subscribers.get(str(department_id), ()))
+
+    def recent(self, department_id):
+        return list(self._recent.get(str(department_id), ()))
+
+    def publish(self, alert):
+        department_id = alert["department"]
+        with self._lock:
+            self._recent[department_id].append(alert)
+            subscribers = list(self._subscribers.get(department_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, alert)
+            except RuntimeError:
+                # The loop serving that screen has shut down
+                self.unsubscribe(subscription)
+
+
+broker = AlertBroker()
+
+
+def alert_level(total_score):
+    if total_score is None:
+        return None
+    return ALERT_LEVELS.get(news.interpretation_code(total_score))
+
+
+def build_alerts(scores):
+    # Alerts for the NEWS scores that reach the medium or high range
+    flagged = [
+        (score, level)
+        for score in scores
+        if (level := alert_level(score.total_score)) is not None
+    ]
+    if not flagged:
+        return []
+    stays = {
+        stay[0]: stay[1:]
+        for stay in Hospitalization.objects.filter(
+            id__in={score.hospitalization_id for score, _ in flagged}
+        )
+        .order_by()
+        .values_list("id", "department_id", "patient__first_name", "patient__last_name")
+    }
+    alerts = []
+    for score, level in flagged:
+        department_id, first_name, last_name = stays[score.hospitalization_id]
+        alerts.append(
+            {
+                "id": str(score.id),
+                "department": str(department_id),
+                "hospitalization": str(score.hospitalization_id),
+                "url": reverse(
+                    "department:hospitalization", args=[score.hospitalization_id]
+                ),
+                "patient": f"{first_name} {last_name}",
+                "total_score": score.total_score,
+                "level": level,
+                "created_at": score.created_at,
+            }
+        )
+    return alerts
+
+
+def publish_alerts(scores):
+    for alert in build_alerts(scores):
+        metrics.news_alerts.inc(department_id=alert["department"], band=alert["level"])
+        broker.publish(alert)
+
+
+def alert_on_commit(scores):
+    # Screens are only told about scores that were actually stored
+    scores = list(scores)
+    transaction.on_commit(lambda: publish_alerts(scores))
+
+
+def streams_alerts(request):
+    # Alerts are only streamed under ASGI, where an open stream waits on the event loop.
+    # A WSGI server would hold one of its worker threads for as long as a screen is on.
+    return isinstance(request, ASGIRequest)
+
+
+def format_event(alert):
+    data = json.dumps(alert, cls=DjangoJSONEncoder)
+    return f"id: {alert['id']}\nevent: alert\ndata: {data}\n\n"
+
+
+async def alert_events(department_id, keepalive=KEEPALIVE_SECONDS):
+    # Server-Sent Events for one screen: recent alerts first, then new ones as they come
+    subscription = broker.subscribe(department_id)
+    try:
+        yield "retry: 5000\n\n"
+        for alert in subscription.backlog:
+            yield format_event(alert)
+        while True:
+            try:
+                alert = await subscription.get(keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(alert)
+    finally:
+        broker.unsubscribe(subscription)
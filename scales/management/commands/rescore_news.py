@@ -0,0 +1,68 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from scales import news
+from scales.models import NewsScale
+from scales.scoring import NewsScoring
+
+
+class Command(BaseCommand):
+    help = "Re-scores stored NEWS readings with the current thresholds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the readings whose score would change.",
+        )
+
+    def handle(self, *args, **options):
+        scanned = changed = 0
+        last_id = None
+        while True:
+            readings = NewsScale.objects.order_by("id")
+            if last_id is not None:
+                readings = readings.filter(id__gt=last_id)
+            rows = list(
+                readings.values_list("id", "total_score", *NewsScoring.fields)[
+                    : options["batch_size"]
+                ]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            scanned += len(rows)
+
+            ids, stored, *inputs = zip(*rows)
+            totals, codes = news.score_news(*inputs)
+            stale = np.flatnonzero(totals != np.array(stored, dtype=float))
+            changed += len(stale)
+            if options["dry_run"] or not len(stale):
+                continue
+            # Bumping modified_at moves the cached chart sections to a new version
+            now = timezone.now()
+            updates = [
+                NewsScale(
+                    id=ids[row],
+                    modified_at=now,
+                    total_score=int(totals[row]),
+                    score_interpretation=news.interpretation_text(
+                        int(totals[row]), int(codes[row])
+                    ),
+                )
+                for row in stale
+            ]
+            with transaction.atomic():
+                NewsScale.objects.bulk_update(
+                    updates,
+                    ["total_score", "score_interpretation", "modified_at"],
+                    batch_size=500,
+                )
+
+        action = "would change" if options["dry_run"] else "changed"
+        self.stdout.write(
+            self.style.SUCCESS(f"Scanned {scanned} NEWS readings, {changed} {action}.")
+        )
@@ -0,0 +1,46 @@
+# Generated by Django 5.0 on 2026-10-18 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0006_hot_path_indexes"),
+        ("scales", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bodymassindex",
+            index=models.Index(
+                fields=["hospitalization", "-created_at"], name="bmi_chart_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="glasgowcomascale",
+            index=models.Index(
+                fields=["hospitalization", "-created_at"], name="glasgow_chart_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="newsscale",
+            index=models.Index(
+                fields=["hospitalization", "-created_at"], name="news_chart_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="nortonscale",
+            index=models.Index(
+                fields=["hospitalization", "-created_at"], name="norton_chart_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="painscale",
+            index=models.Index(
+                fields=["hospitalization", "-created_at"], name="pain_chart_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("department", "0006_hot_path_indexes"),
+        ("scales", "0002_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="newsscale",
+            name="vital_signs",
+            field=models.OneToOneField(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="news_score",
+                to="department.vitalsigns",
+            ),
+        ),
+    ]
@@ -1,8 +1,9 @@
 import uuid
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from department.models import Hospitalization
+from department.models import Hospitalization, VitalSigns
 from main.models import User
+from . import alerts, news, scoring
 
 # Global variables for NortonScale
 PHYSICAL_CHOICES = [
@@ -87,6 +88,66 @@ LOC_CHOICES = [
     ("unresponsive", "Patient is unresponsive to stimulus"),
 ]
 
+# Scoring of each scale, compiled once at import
+BMI_CATEGORIES = scoring.Thresholds(
+    (
+        (18.4, "Underweight"),
+        (24.9, "Normal weight"),
+        (29.9, "Overweight"),
+        (34.9, "Obesity class I"),
+        (39.9, "Obesity class II"),
+        (40, "Obesity class III"),
+    ),
+    above="Error",
+    scale=10,
+)
+PRESSURE_RISKS = scoring.Thresholds(
+    (
+        (9, "Very High Risk"),
+        (13, "High Risk"),
+        (18, "Medium Risk"),
+        (20, "Low Risk"),
+    ),
+    above="Error",
+)
+PAIN_INTERPRETATIONS = scoring.Thresholds(
+    (
+        (-1, "Error"),
+        (0, "No Pain"),
+        (3, "Mild Pain"),
+        (6, "Moderate Pain"),
+    ),
+    above="Severe Pain",
+)
+BMI_SCORING = scoring.register("bmi", scoring.BodyMassIndexScale(BMI_CATEGORIES))
+GLASGOW_SCORING = scoring.register(
+    "glasgow",
+    scoring.ChoiceScale(
+        {
+            "eye_response": EYE_RESPONSE_CHOICES,
+            "verbal_response": VERBAL_RESPONSE_CHOICES,
+            "motor_response": MOTOR_RESPONSE_CHOICES,
+        }
+    ),
+)
+NORTON_SCORING = scoring.register(
+    "norton",
+    scoring.ChoiceScale(
+        {
+            "physical_condition": PHYSICAL_CHOICES,
+            "mental_condition": MENTAL_CHOICES,
+            "activity": ACTIVITY_CHOICES,
+            "mobility": MOBILITY_CHOICES,
+            "incontinence": INCONTINENCE_CHOICES,
+        },
+        PRESSURE_RISKS,
+    ),
+)
+PAIN_SCORING = scoring.register(
+    "pain", scoring.ChoiceScale({"pain_level": PAIN_CHOICES}, PAIN_INTERPRETATIONS)
+)
+NEWS_SCORING = scoring.register("news", scoring.NewsScoring())
+
 
 class BodyMassIndex(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -107,6 +168,11 @@ class BodyMassIndex(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["hospitalization", "-created_at"], name="bmi_chart_idx"
+            ),
+        ]
 
     def __str__(self):
         # String representation of the BMI record
@@ -114,26 +180,11 @@ class BodyMassIndex(models.Model):
 
     def calculate_bmi(self):
         # Method to calculate BMI based on body height and body weight
-        body_height = self.body_height / 100
-        bmi = round((self.body_weight / (body_height**2)), 1)
-        return bmi
+        return BMI_SCORING.total(self)
 
     def interpretation(self):
         # Method to provide interpretation based on BMI value
-        if self.bmi < 18.5:
-            return "Underweight"
-        elif 18.5 <= self.bmi <= 24.9:
-            return "Normal weight"
-        elif 25 <= self.bmi <= 29.9:
-            return "Overweight"
-        elif 30 <= self.bmi <= 34.9:
-            return "Obesity class I"
-        elif 35 <= self.bmi <= 39.9:
-            return "Obesity class II"
-        elif self.bmi <= 40:
-            return "Obesity class III"
-        else:
-            return "Error"
+        return BMI_SCORING.interpret(self.bmi)
 
     def save(self, *args, **kwargs):
         # Overriding the save method to calculate BMI and set interpretation before saving
@@ -155,6 +206,11 @@ class GlasgowComaScale(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["hospitalization", "-created_at"], name="glasgow_chart_idx"
+            ),
+        ]
 
     def __str__(self):
         # String representation of the Glasgow Coma Scale record,
@@ -162,21 +218,7 @@ class GlasgowComaScale(models.Model):
 
     def calculate_total_points(self):
         # Method to calculate total points based on chosen responses
-        choices_values = {
-            "6": 6,
-            "5": 5,
-            "4": 4,
-            "3": 3,
-            "2": 2,
-            "1": 1,
-        }
-
-        total = 0
-        total += choices_values.get(self.eye_response, 0)
-        total += choices_values.get(self.verbal_response, 0)
-        total += choices_values.get(self.motor_response, 0)
-
-        return total
+        return GLASGOW_SCORING.total(self)
 
     def save(self, *args, **kwargs):
         # Overriding the save method to calculate total points before saving
@@ -200,6 +242,11 @@ class NortonScale(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["hospitalization", "-created_at"], name="norton_chart_idx"
+            ),
+        ]
 
     def __str__(self):
         # String representation of the Norton Scale record
@@ -207,36 +254,11 @@ class NortonScale(models.Model):
 
     def calculate_total_points(self):
         # Method to calculate total points based on chosen responses
-        choices_values = {
-            "4": 4,
-            "3": 3,
-            "2": 2,
-            "1": 1,
-        }
-
-        total = 0
-        total += choices_values.get(self.physical_condition, 0)
-        total += choices_values.get(self.mental_condition, 0)
-        total += choices_values.get(self.activity, 0)
-        total += choices_values.get(self.mobility, 0)
-        total += choices_values.get(self.incontinence, 0)
-
-        return total
+        return NORTON_SCORING.total(self)
 
     def calculate_risk(self):
         # Method to calculate pressure risk category based on total points
-        if self.total_points in [19, 20]:
-            risk = "Low Risk"
-        elif 14 <= self.total_points <= 18:
-            risk = "Medium Risk"
-        elif 10 <= self.total_points <= 13:
-            risk = "High Risk"
-        elif self.total_points < 10:
-            risk = "Very High Risk"
-        else:
-            risk = "Error"
-
-        return risk
+        return NORTON_SCORING.interpret(self.total_points)
 
     def save(self, *args, **kwargs):
         # Overriding the save method to calculate total points and pressure risk before saving
@@ -279,9 +301,26 @@ class NewsScale(models.Model):
     )
     total_score = models.IntegerField(blank=True, null=True)
     score_interpretation = models.TextField()
+    # Set when the score was derived from a vital signs reading rather than entered
+    vital_signs = models.OneToOneField(
+        VitalSigns,
+        on_delete=models.CASCADE,
+        related_name="news_score",
+        blank=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["hospitalization", "-created_at"], name="news_chart_idx"
+            ),
+        ]
+
+    # Alert band of the score as last stored, None when it called for no response
+    _stored_level = None
 
     def __str__(self):
         # String representation of the News Scale record
@@ -289,128 +328,79 @@ class NewsScale(models.Model):
 
     def calculate_respiratory_respiratory_rate_score(self):
         # Method to calculate the respiratory rate score based on NEWS criteria
-        if self.respiratory_rate <= 8:
-            return 3
-        elif 9 <= self.respiratory_rate <= 11:
-            return 1
-        elif 12 <= self.respiratory_rate <= 20:
-            return 0
-        elif 21 <= self.respiratory_rate <= 24:
-            return 2
-        else:
-            return 3
+        return int(news.respiratory_rate_score(self.respiratory_rate))
 
     def calculate_oxygen_saturation_score(self):
         # Method to calculate the oxygen saturation score based on NEWS criteria
-        if self.aecopd_state:
-            if self.oxygen_saturation <= 83:
-                return 3
-            elif self.oxygen_saturation in [84, 85]:
-                return 2
-            elif self.oxygen_saturation in [86, 87]:
-                return 1
-            elif (88 <= self.oxygen_saturation <= 92) or (
-                93 <= self.oxygen_saturation and not self.is_on_oxygen
-            ):
-                return 0
-            elif self.is_on_oxygen:
-                if self.oxygen_saturation in [93, 94]:
-                    return 1
-                elif self.oxygen_saturation in [95, 96]:
-                    return 2
-                elif self.oxygen_saturation >= 97:
-                    return 3
-        elif not self.aecopd_state:
-            if self.oxygen_saturation <= 91:
-                return 3
-            elif self.oxygen_saturation in [92, 93]:
-                return 2
-            elif self.oxygen_saturation in [94, 95]:
-                return 1
-            elif self.oxygen_saturation >= 96:
-                return 0
+        return int(
+            news.oxygen_saturation_score(
+                self.oxygen_saturation, self.is_on_oxygen, self.aecopd_state
+            )
+        )
 
     def calculate_is_on_oxygen_score(self):
         # Method to calculate the score based on whether the patient is on oxygen
-        if self.is_on_oxygen:
-            return 2
-        elif not self.is_on_oxygen:
-            return 0
+        return int(news.supplemental_oxygen_score(self.is_on_oxygen))
 
     def calculate_temperature_score(self):
         # Method to calculate the body temperature score based on NEWS criteria
-        if self.temperature <= 35.0:
-            return 3
-        elif 35.1 <= self.temperature <= 36.0:
-            return 1
-        elif 36.1 <= self.temperature <= 38.0:
-            return 0
-        elif 38.1 <= self.temperature <= 39.0:
-            return 1
-        elif self.temperature >= 39.1:
-            return 2
+        return int(news.temperature_score(self.temperature))
 
     def calculate_systolic_blood_pressure_score(self):
         # Method to calculate the systolic blood pressure score based on NEWS criteria
-        if self.systolic_blood_pressure <= 90:
-            return 3
-        elif 91 <= self.systolic_blood_pressure <= 100:
-            return 2
-        elif 101 <= self.systolic_blood_pressure <= 110:
-            return 1
-        elif 111 <= self.systolic_blood_pressure <= 219:
-            return 0
-        elif self.systolic_blood_pressure >= 220:
-            return 3
+        return int(news.systolic_blood_pressure_score(self.systolic_blood_pressure))
 
     def calculate_heart_rate_score(self):
         # Method to calculate the heart rate score based on NEWS criteria
-        if self.heart_rate <= 40:
-            return 3
-        elif 40 <= self.heart_rate <= 50:
-            return 1
-        elif 51 <= self.heart_rate <= 90:
-            return 0
-        elif 91 <= self.heart_rate <= 110:
-            return 1
-        elif 111 <= self.heart_rate <= 130:
-            return 2
-        elif self.heart_rate > 131:
-            return 3
+        return int(news.heart_rate_score(self.heart_rate))
 
     def calculate_level_of_consciousness_score(self):
         # Method to calculate the level of consciousness score based on NEWS criteria
-        if self.level_of_consciousness == "awake":
-            return 0
-        elif self.level_of_consciousness in ["verbal", "pain", "unresponsive"]:
-            return 3
+        return int(news.level_of_consciousness_score(self.level_of_consciousness))
+
+    def news_inputs(self):
+        # The measurements scored by the NEWS engine, in the order it expects them
+        return (
+            self.respiratory_rate,
+            self.oxygen_saturation,
+            self.is_on_oxygen,
+            self.aecopd_state,
+            self.temperature,
+            self.systolic_blood_pressure,
+            self.heart_rate,
+            self.level_of_consciousness,
+        )
 
     def calculate_total_score(self):
         # Method to calculate the total score based on individual scores
-        total = 0
-        total += self.calculate_respiratory_respiratory_rate_score()
-        total += self.calculate_oxygen_saturation_score()
-        total += self.calculate_is_on_oxygen_score()
-        total += self.calculate_temperature_score()
-        total += self.calculate_systolic_blood_pressure_score()
-        total += self.calculate_heart_rate_score()
-        total += self.calculate_level_of_consciousness_score()
-        return total
+        total, _ = news.score_news(*self.news_inputs())
+        return int(total)
 
     def calculate_score_interpretation(self):
         # Method to provide a textual interpretation of the total score
-        if self.total_score <= 4:
-            return f"National Early Warning Score (NEWS) = {self.total_score}. Interpretation: This is a low score that suggests clinical monitoring should be continued and the medical professional, usually a registered nurse will decide further if clinical care needs to be updated."
-        elif self.total_score in [5, 6]:
-            return f"National Early Warning Score (NEWS) = {self.total_score}. Interpretation: This is a medium score that suggests the patient should be reviewed by a medical specialist with competencies in acute illness, even with the possibility of referring the patient to the critical care unit at the end of the assessment."
-        elif 7 <= self.total_score <= 20:
-            return f"National Early Warning Score (NEWS) = {self.total_score}. Interpretation: This is a high score (red score) that is indicative of urgent critical care need and the patient should be transferred to the appropriate specialized department for further care."
+        return news.interpretation_text(self.total_score)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remembers the stored alert band, so saving an edit only alerts when it changes
+        instance = super().from_db(db, field_names, values)
+        if "total_score" in field_names:
+            instance._stored_level = alerts.alert_level(instance.total_score)
+        return instance
 
     def save(self, *args, **kwargs):
         # Overriding the save method to calculate total score and interpretation before saving
-        self.total_score = self.calculate_total_score()
-        self.score_interpretation = self.calculate_score_interpretation()
+        total, code = news.score_news(*self.news_inputs())
+        self.total_score = int(total)
+        self.score_interpretation = news.interpretation_text(self.total_score, int(code))
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        level = alerts.alert_level(self.total_score)
+        # A new score in the alert range alerts, an edit only when it moves to another band
+        if level is not None and (adding or level != self._stored_level):
+            alerts.alert_on_commit([self])
+        self._stored_level = level
+
 
 class PainScale(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -424,6 +414,11 @@ class PainScale(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["hospitalization", "-created_at"], name="pain_chart_idx"
+            ),
+        ]
     
     def __str__(self):
         # String representation of the Pain Scale record
@@ -431,17 +426,7 @@ class PainScale(models.Model):
 
     def calculate_pain_intepretation(self):
         # Method to calculate the textual interpretation of the pain level based on predefined criteria
-        if int(self.pain_level) == 0:
-            interpretation = "No Pain"
-        elif int(self.pain_level) in [1, 2, 3]:
-            interpretation = "Mild Pain"
-        elif int(self.pain_level) in [4, 5, 6]:
-            interpretation = "Moderate Pain"
-        elif int(self.pain_level) > 6:
-            interpretation = "Severe Pain"
-        else:
-            interpretation = "Error"
-        return interpretation
+        return PAIN_SCORING.interpret(int(self.pain_level))
 
     def save(self, *args, **kwargs):
         # Overriding the save method to calculate pain interpretation before saving
@@ -0,0 +1,141 @@
+import numpy as np
+
+# Interpretation codes of a NEWS total
+LOW = 0
+MEDIUM = 1
+HIGH = 2
+
+# Each band is (highest value in the band, points); None closes the last band.
+RESPIRATORY_RATE_BANDS = ((8, 3), (11, 1), (20, 0), (24, 2), (None, 3))
+OXYGEN_SATURATION_BANDS = ((91, 3), (93, 2), (95, 1), (None, 0))
+# SpO2 scale 2, used for patients with AECOPD
+AECOPD_AIR_SATURATION_BANDS = ((83, 3), (85, 2), (87, 1), (None, 0))
+AECOPD_OXYGEN_SATURATION_BANDS = (
+    (83, 3),
+    (85, 2),
+    (87, 1),
+    (92, 0),
+    (94, 1),
+    (96, 2),
+    (None, 3),
+)
+# Temperature bands are in tenths of a degree Celsius
+TEMPERATURE_BANDS = ((350, 3), (360, 1), (380, 0), (390, 1), (None, 2))
+SYSTOLIC_BLOOD_PRESSURE_BANDS = ((90, 3), (100, 2), (110, 1), (219, 0), (None, 3))
+HEART_RATE_BANDS = ((40, 3), (50, 1), (90, 0), (110, 1), (130, 2), (None, 3))
+INTERPRETATION_BANDS = ((4, LOW), (6, MEDIUM), (None, HIGH))
+SUPPLEMENTAL_OXYGEN_POINTS = 2
+# Points for any level of consciousness other than "awake"
+CONSCIOUSNESS_POINTS = 3
+
+INTERPRETATIONS = {
+    LOW: "This is a low score that suggests clinical monitoring should be continued and the medical professional, usually a registered nurse will decide further if clinical care needs to be updated.",
+    MEDIUM: "This is a medium score that suggests the patient should be reviewed by a medical specialist with competencies in acute illness, even with the possibility of referring the patient to the critical care unit at the end of the assessment.",
+    HIGH: "This is a high score (red score) that is indicative of urgent critical care need and the patient should be transferred to the appropriate specialized department for further care.",
+}
+
+
+def lookup_table(bands, size):
+    # Expands score bands into a table indexed directly by the measured value
+    table = np.empty(size, dtype=np.int8)
+    start = 0
+    for upper, points in bands:
+        stop = size if upper is None else upper + 1
+        table[start:stop] = points
+        start = stop
+    return table
+
+
+# Tables cover the range allowed by the model validators
+RESPIRATORY_RATE_TABLE = lookup_table(RESPIRATORY_RATE_BANDS, 101)
+OXYGEN_SATURATION_TABLE = lookup_table(OXYGEN_SATURATION_BANDS, 101)
+AECOPD_AIR_SATURATION_TABLE = lookup_table(AECOPD_AIR_SATURATION_BANDS, 101)
+AECOPD_OXYGEN_SATURATION_TABLE = lookup_table(AECOPD_OXYGEN_SATURATION_BANDS, 101)
+TEMPERATURE_TABLE = lookup_table(TEMPERATURE_BANDS, 501)
+SYSTOLIC_BLOOD_PRESSURE_TABLE = lookup_table(SYSTOLIC_BLOOD_PRESSURE_BANDS, 301)
+HEART_RATE_TABLE = lookup_table(HEART_RATE_BANDS, 301)
+INTERPRETATION_TABLE = lookup_table(INTERPRETATION_BANDS, 21)
+
+
+def _lookup(table, values):
+    # Values outside the table fall into its first or last band
+    indexes = np.clip(np.asarray(values, dtype=np.intp), 0, len(table) - 1)
+    return table[indexes]
+
+
+def respiratory_rate_score(respiratory_rate):
+    return _lookup(RESPIRATORY_RATE_TABLE, respiratory_rate)
+
+
+def oxygen_saturation_score(oxygen_saturation, is_on_oxygen, aecopd_state):
+    aecopd_state = np.asarray(aecopd_state, dtype=bool)
+    is_on_oxygen = np.asarray(is_on_oxygen, dtype=bool)
+    return np.where(
+        aecopd_state,
+        np.where(
+            is_on_oxygen,
+            _lookup(AECOPD_OXYGEN_SATURATION_TABLE, oxygen_saturation),
+            _lookup(AECOPD_AIR_SATURATION_TABLE, oxygen_saturation),
+        ),
+        _lookup(OXYGEN_SATURATION_TABLE, oxygen_saturation),
+    ).astype(np.int8)
+
+
+def supplemental_oxygen_score(is_on_oxygen):
+    is_on_oxygen = np.asarray(is_on_oxygen, dtype=bool)
+    return np.where(is_on_oxygen, SUPPLEMENTAL_OXYGEN_POINTS, 0).astype(np.int8)
+
+
+def temperature_score(temperature):
+    # Temperatures are recorded with one decimal, so they are scored in tenths of a degree
+    tenths = np.rint(np.asarray(temperature, dtype=np.float64) * 10)
+    return _lookup(TEMPERATURE_TABLE, tenths)
+
+
+def systolic_blood_pressure_score(systolic_blood_pressure):
+    return _lookup(SYSTOLIC_BLOOD_PRESSURE_TABLE, systolic_blood_pressure)
+
+
+def heart_rate_score(heart_rate):
+    return _lookup(HEART_RATE_TABLE, heart_rate)
+
+
+def level_of_consciousness_score(level_of_consciousness):
+    return np.where(
+        np.asarray(level_of_consciousness) == "awake", 0, CONSCIOUSNESS_POINTS
+    ).astype(np.int8)
+
+
+def score_news(
+    respiratory_rate,
+    oxygen_saturation,
+    is_on_oxygen,
+    aecopd_state,
+    temperature,
+    systolic_blood_pressure,
+    heart_rate,
+    level_of_consciousness,
+):
+    # Scores any number of NEWS readings given as parallel arrays (or scalars).
+    # Returns the total scores and their interpretation codes (LOW, MEDIUM or HIGH).
+    total = (
+        respiratory_rate_score(respiratory_rate)
+        + oxygen_saturation_score(oxygen_saturation, is_on_oxygen, aecopd_state)
+        + supplemental_oxygen_score(is_on_oxygen)
+        + temperature_score(temperature)
+        + systolic_blood_pressure_score(systolic_blood_pressure)
+        + heart_rate_score(heart_rate)
+        + level_of_consciousness_score(level_of_consciousness)
+    )
+    return total, _lookup(INTERPRETATION_TABLE, total)
+
+
+def interpretation_code(total_score):
+    return int(_lookup(INTERPRETATION_TABLE, total_score))
+
+
+def interpretation_text(total_score, code=None):
+    # The interpretation stored with a reading
+    if code is None:
+        code = interpretation_code(total_score)
+    return f"National Early Warning Score (NEWS) = {total_score}. Interpretation: {INTERPRETATIONS[code]}"
@@ -0,0 +1,134 @@
+import bisect
+
+import numpy as np
+
+from . import news
+
+# Scales by name; models register theirs at import
+SCALES = {}
+
+
+def register(name, scale):
+    SCALES[name] = scale
+    return scale
+
+
+def get_scale(name):
+    return SCALES[name]
+
+
+def score_batch(name, columns):
+    # Scores many readings of one scale given as {field: sequence of values}.
+    # Returns the totals and their interpretations as arrays.
+    scale = get_scale(name)
+    totals = scale.total_batch(columns)
+    return totals, scale.interpret_batch(totals)
+
+
+class Thresholds:
+    # Labels a value with the first band whose inclusive upper bound it does not exceed,
+    # or with `above` past the last band. Values are compared in steps of 1 / scale,
+    # so measurements recorded with one decimal use scale=10.
+
+    def __init__(self, bands, above, scale=1):
+        self.scale = scale
+        self.bounds = [round(upper * scale) for upper, _ in bands]
+        self.labels = [label for _, label in bands] + [above]
+        self._labels = np.array(self.labels, dtype=object)
+
+    def __call__(self, value):
+        return self.labels[bisect.bisect_left(self.bounds, round(value * self.scale))]
+
+    def batch(self, values):
+        steps = np.rint(np.asarray(values, dtype=np.float64) * self.scale)
+        return self._labels[np.searchsorted(self.bounds, steps, side="left")]
+
+
+class ChoiceScale:
+    # A scale scored by summing the points of the option chosen for each field.
+    # The points of an option are its numeric value; unknown options score 0.
+
+    def __init__(self, fields, interpretation=None):
+        self.fields = tuple(fields)
+        self.points = {
+            field: {value: int(value) for value, _ in choices}
+            for field, choices in fields.items()
+        }
+        self.interpretation = interpretation
+
+    def total(self, instance):
+        return sum(
+            self.points[field].get(getattr(instance, field), 0) for field in self.fields
+        )
+
+    def interpret(self, total):
+        return self.interpretation(total)
+
+    def total_batch(self, columns):
+        total = np.zeros(len(columns[self.fields[0]]), dtype=np.int16)
+        for field in self.fields:
+            # Score each distinct option once, then spread the points over the rows
+            options, rows = np.unique(np.asarray(columns[field]), return_inverse=True)
+            points = [self.points[field].get(option, 0) for option in options.tolist()]
+            total += np.array(points, dtype=np.int16)[rows.reshape(-1)]
+        return total
+
+    def interpret_batch(self, totals):
+        if self.interpretation is None:
+            return None
+        return self.interpretation.batch(totals)
+
+
+class BodyMassIndexScale:
+    # Body mass index from height in centimetres and weight in kilograms
+    fields = ("body_height", "body_weight")
+
+    def __init__(self, interpretation):
+        self.interpretation = interpretation
+
+    def total(self, instance):
+        body_height = instance.body_height / 100
+        return round(instance.body_weight / (body_height**2), 1)
+
+    def interpret(self, bmi):
+        return self.interpretation(bmi)
+
+    def total_batch(self, columns):
+        body_height = np.asarray(columns["body_height"], dtype=np.float64) / 100
+        body_weight = np.asarray(columns["body_weight"], dtype=np.float64)
+        return np.round(body_weight / body_height**2, 1)
+
+    def interpret_batch(self, bmis):
+        return self.interpretation.batch(bmis)
+
+
+class NewsScoring:
+    # Exposes the vectorized NEWS engine through the registry interface
+    fields = (
+        "respiratory_rate",
+        "oxygen_saturation",
+        "is_on_oxygen",
+        "aecopd_state",
+        "temperature",
+        "systolic_blood_pressure",
+        "heart_rate",
+        "level_of_consciousness",
+    )
+    # Every possible total has its interpretation prepared up front
+    texts = np.array(
+        [news.interpretation_text(total) for total in range(21)], dtype=object
+    )
+
+    def total(self, instance):
+        total, _ = news.score_news(*(getattr(instance, field) for field in self.fields))
+        return int(total)
+
+    def interpret(self, total):
+        return self.texts[total]
+
+    def total_batch(self, columns):
+        total, _ = news.score_news(*(columns[field] for field in self.fields))
+        return total
+
+    def interpret_batch(self, totals):
+        return self.texts[np.asarray(totals)]
@@ -0,0 +1,202 @@
+import asyncio
+import json
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+
+from department.models import Department, Hospitalization
+from main.models import User
+from patient.models import Patient
+from scales import alerts
+from scales.alerts import AlertBroker
+from scales.models import NewsScale
+
+
+class AlertBrokerTest(TestCase):
+    async def test_fan_out_per_department(self):
+        broker = AlertBroker()
+        first = broker.subscribe("ward-a")
+        second = broker.subscribe("ward-a")
+        other = broker.subscribe("ward-b")
+        alert = {"id": "1", "department": "ward-a"}
+
+        # Alerts are published from sync code running in worker threads
+        await asyncio.to_thread(broker.publish, alert)
+        self.assertEqual(await first.get(1), alert)
+        self.assertEqual(await second.get(1), alert)
+        with self.assertRaises(asyncio.TimeoutError):
+            await other.get(0.05)
+
+        broker.unsubscribe(first)
+        broker.unsubscribe(second)
+        self.assertEqual(broker.subscriber_count("ward-a"), 0)
+        self.assertEqual(broker.subscribe("ward-a").backlog, [alert])
+
+    async def test_slow_screen_drops_oldest_alerts(self):
+        broker = AlertBroker()
+        subscription = broker.subscribe("ward")
+        for number in range(alerts.SUBSCRIBER_QUEUE_SIZE + 5):
+            broker.publish({"id": str(number), "department": "ward"})
+        await asyncio.sleep(0)
+        self.assertEqual(subscription.queue.qsize(), alerts.SUBSCRIBER_QUEUE_SIZE)
+        self.assertEqual((await subscription.get(1))["id"], "5")
+
+
+class NewsAlertTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="NurseTest",
+            last_name="User",
+            email="testnurse@nurse.com",
+            password="nursepassword",
+            profession="nurses",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient, department=cls.department, main_symptom="Cough"
+        )
+
+    def setUp(self):
+        self.original_broker = alerts.broker
+        alerts.broker = AlertBroker()
+
+    def tearDown(self):
+        alerts.broker = self.original_broker
+
+    def create_news(self, **vitals):
+        fields = {
+            "respiratory_rate": 16,
+            "oxygen_saturation": 98,
+            "temperature": 36.6,
+            "systolic_blood_pressure": 120,
+            "diastolic_blood_pressure": 80,
+            "heart_rate": 70,
+        }
+        fields.update(vitals)
+        return NewsScale.objects.create(
+            hospitalization=self.hospitalization, created_by=self.user, **fields
+        )
+
+    def test_scores_in_alert_range_are_published_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_news(heart_rate=120)
+            medium = self.create_news(heart_rate=120, respiratory_rate=26)
+            high = self.create_news(
+                heart_rate=140, respiratory_rate=26, oxygen_saturation=90
+            )
+            self.assertEqual(alerts.broker.recent(self.department.id), [])
+
+        published = alerts.broker.recent(self.department.id)
+        self.assertEqual(
+            [(alert["id"], alert["level"]) for alert in published],
+            [(str(medium.id), "medium"), (str(high.id), "high")],
+        )
+        self.assertEqual(published[0]["patient"], "Stefan Master")
+        self.assertEqual(
+            published[0]["url"],
+            reverse("department:hospitalization", args=[self.hospitalization.id]),
+        )
+
+    def test_edits_only_alert_when_the_band_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            score = self.create_news(heart_rate=120, respiratory_rate=26)
+        score = NewsScale.objects.get(id=score.id)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            score.temperature = 37.0
+            score.save()
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            score.oxygen_saturation = 90
+            score.heart_rate = 140
+            score.save()
+        self.assertEqual(
+            [alert["level"] for alert in alerts.broker.recent(self.department.id)],
+            ["medium", "high"],
+        )
+
+    def test_derived_scores_are_published(self):
+        self.client.force_login(self.user)
+        reading = {
+            "hospitalization": str(self.hospitalization.id),
+            "respiratory_rate": 26,
+            "oxygen_saturation": 90,
+            "temperature": 39.5,
+            "systolic_blood_pressure": 120,
+            "diastolic_blood_pressure": 80,
+            "heart_rate": 140,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("department:vitals_ingest"),
+                json.dumps([reading]),
+                content_type="application/json",
+            )
+        self.assertEqual(
+            [alert["level"] for alert in alerts.broker.recent(self.department.id)],
+            ["high"],
+        )
+
+    async def test_stream_replays_recent_alerts(self):
+        alert = {"id": "abc", "department": str(self.department.id), "level": "high"}
+        alerts.broker.publish(alert)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("department:alerts", args=[self.department.id])
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = response.streaming_content
+        self.assertEqual(await anext(events), b"retry: 5000\n\n")
+        event = (await anext(events)).decode()
+        self.assertIn("id: abc\nevent: alert\n", event)
+        self.assertIn('"level": "high"', event)
+
+    async def test_events_follow_new_alerts_and_unsubscribe_on_close(self):
+        events = alerts.alert_events(self.department.id, keepalive=0.01)
+        self.assertEqual(await anext(events), "retry: 5000\n\n")
+        self.assertEqual(await anext(events), ": keepalive\n\n")
+        alerts.broker.publish({"id": "new", "department": str(self.department.id)})
+        self.assertTrue((await anext(events)).startswith("id: new\n"))
+        await events.aclose()
+        self.assertEqual(alerts.broker.subscriber_count(self.department.id), 0)
+
+    async def test_stream_requires_login(self):
+        response = await self.async_client.get(
+            reverse("department:alerts", args=[self.department.id])
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_stream_and_screen_only_under_asgi(self):
+        # The test client is a WSGI client; the async client speaks ASGI
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("department:alerts", args=[self.department.id])
+        )
+        self.assertEqual(response.status_code, 204)
+        url = reverse("department:department_detail", args=[self.department.id])
+        self.assertNotContains(self.client.get(url), "EventSource")
+
+    async def test_screen_listens_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("department:department_detail", args=[self.department.id])
+        )
+        self.assertContains(response, "EventSource")
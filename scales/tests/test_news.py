@@ -0,0 +1,215 @@
+from datetime import date
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from department.models import Department, Hospitalization
+from main.models import User
+from patient.models import Patient
+from scales import news
+from scales.models import NewsScale
+
+
+def reference_score(rr, spo2, on_oxygen, aecopd, temperature, sbp, hr, loc):
+    # The branch-by-branch NEWS scoring the engine replaced, kept as a reference.
+    # Unlike the original it scores a heart rate of exactly 131 as 3 instead of failing.
+    total = 0
+    if rr <= 8:
+        total += 3
+    elif rr <= 11:
+        total += 1
+    elif rr <= 20:
+        total += 0
+    elif rr <= 24:
+        total += 2
+    else:
+        total += 3
+
+    if aecopd:
+        if spo2 <= 83:
+            total += 3
+        elif spo2 in [84, 85]:
+            total += 2
+        elif spo2 in [86, 87]:
+            total += 1
+        elif 88 <= spo2 <= 92 or not on_oxygen:
+            total += 0
+        elif spo2 in [93, 94]:
+            total += 1
+        elif spo2 in [95, 96]:
+            total += 2
+        else:
+            total += 3
+    elif spo2 <= 91:
+        total += 3
+    elif spo2 in [92, 93]:
+        total += 2
+    elif spo2 in [94, 95]:
+        total += 1
+
+    total += 2 if on_oxygen else 0
+
+    if temperature <= 35.0:
+        total += 3
+    elif 35.1 <= temperature <= 36.0:
+        total += 1
+    elif 38.1 <= temperature <= 39.0:
+        total += 1
+    elif temperature >= 39.1:
+        total += 2
+
+    if sbp <= 90:
+        total += 3
+    elif sbp <= 100:
+        total += 2
+    elif sbp <= 110:
+        total += 1
+    elif sbp >= 220:
+        total += 3
+
+    if hr <= 40:
+        total += 3
+    elif hr <= 50:
+        total += 1
+    elif 91 <= hr <= 110:
+        total += 1
+    elif 111 <= hr <= 130:
+        total += 2
+    elif hr > 130:
+        total += 3
+
+    total += 0 if loc == "awake" else 3
+    return total
+
+
+def random_readings(size, seed=7):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.integers(0, 101, size),
+        rng.integers(0, 101, size),
+        rng.integers(0, 2, size).astype(bool),
+        rng.integers(0, 2, size).astype(bool),
+        rng.integers(300, 430, size) / 10,
+        rng.integers(0, 301, size),
+        rng.integers(0, 301, size),
+        rng.choice(["awake", "verbal", "pain", "unresponsive"], size),
+    )
+
+
+class NewsEngineTest(SimpleTestCase):
+    def test_matches_reference_scoring(self):
+        readings = random_readings(20000)
+        totals, codes = news.score_news(*readings)
+        expected = [reference_score(*row) for row in zip(*readings)]
+        self.assertEqual(totals.tolist(), expected)
+        self.assertEqual(
+            codes.tolist(),
+            [
+                news.LOW if total <= 4 else news.MEDIUM if total <= 6 else news.HIGH
+                for total in expected
+            ],
+        )
+
+    def test_band_edges(self):
+        self.assertEqual(
+            news.temperature_score(
+                [35.0, 35.1, 36.0, 36.1, 38.0, 38.1, 39.0, 39.1]
+            ).tolist(),
+            [3, 1, 1, 0, 0, 1, 1, 2],
+        )
+        self.assertEqual(
+            news.heart_rate_score(
+                [40, 41, 50, 51, 90, 91, 110, 111, 130, 131]
+            ).tolist(),
+            [3, 1, 1, 0, 0, 1, 1, 2, 2, 3],
+        )
+        self.assertEqual(
+            news.oxygen_saturation_score([92, 93, 97], True, True).tolist(), [0, 1, 3]
+        )
+        self.assertEqual(
+            news.oxygen_saturation_score([92, 93, 97], False, True).tolist(), [0, 0, 0]
+        )
+
+    def test_values_outside_the_tables_use_the_outer_bands(self):
+        self.assertEqual(news.respiratory_rate_score([-5, 500]).tolist(), [3, 3])
+        self.assertEqual(news.systolic_blood_pressure_score([-1, 999]).tolist(), [3, 3])
+
+    def test_interpretation_text(self):
+        self.assertEqual(
+            news.interpretation_text(5),
+            f"National Early Warning Score (NEWS) = 5. Interpretation: {news.INTERPRETATIONS[news.MEDIUM]}",
+        )
+
+
+class RescoreNewsCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            first_name="AdminTest",
+            last_name="User",
+            email="testadmin@admin.com",
+            password="adminpassword",
+            profession="admins",
+        )
+        cls.department = Department.objects.create(
+            name="Test Department",
+            description="This is a test department",
+            created_by=cls.user,
+        )
+        cls.patient = Patient.objects.create(
+            first_name="Stefan",
+            last_name="Master",
+            date_of_birth=date(1999, 9, 9),
+            contact_number="+48600500400",
+            is_insured=True,
+            insurance="1234567890",
+            country="Country",
+            city="City",
+            street="Street",
+            zip_code="00-00",
+            created_by=cls.user,
+        )
+        cls.hospitalization = Hospitalization.objects.create(
+            patient=cls.patient,
+            department=cls.department,
+            main_symptom="Cough",
+        )
+
+    def create_news(self, heart_rate):
+        return NewsScale.objects.create(
+            hospitalization=self.hospitalization,
+            created_by=self.user,
+            respiratory_rate=20,
+            oxygen_saturation=99,
+            temperature=36.6,
+            systolic_blood_pressure=120,
+            diastolic_blood_pressure=70,
+            heart_rate=heart_rate,
+        )
+
+    def test_save_uses_the_engine(self):
+        reading = self.create_news(heart_rate=131)
+        self.assertEqual(reading.total_score, 3)
+        self.assertEqual(reading.score_interpretation, news.interpretation_text(3))
+
+    def test_rescores_stale_readings(self):
+        current = self.create_news(heart_rate=64)
+        stale = self.create_news(heart_rate=120)
+        NewsScale.objects.filter(id=stale.id).update(
+            total_score=0, score_interpretation=""
+        )
+
+        out = StringIO()
+        call_command("rescore_news", "--dry-run", stdout=out)
+        self.assertIn("Scanned 2 NEWS readings, 1 would change.", out.getvalue())
+        stale.refresh_from_db()
+        self.assertEqual(stale.total_score, 0)
+
+        call_command("rescore_news", "--batch-size", "1", stdout=StringIO())
+        stale.refresh_from_db()
+        current.refresh_from_db()
+        self.assertEqual(stale.total_score, 2)
+        self.assertEqual(stale.score_interpretation, news.interpretation_text(2))
+        self.assertEqual(current.total_score, 0)
@@ -0,0 +1,204 @@
+import itertools
+from decimal import Decimal
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from scales import scoring
+from scales.models import (
+    ACTIVITY_CHOICES,
+    EYE_RESPONSE_CHOICES,
+    INCONTINENCE_CHOICES,
+    MENTAL_CHOICES,
+    MOBILITY_CHOICES,
+    MOTOR_RESPONSE_CHOICES,
+    PAIN_CHOICES,
+    PHYSICAL_CHOICES,
+    VERBAL_RESPONSE_CHOICES,
+    BodyMassIndex,
+    GlasgowComaScale,
+    NortonScale,
+    PainScale,
+)
+
+# The branch-based implementations the registry replaced, kept as references
+
+
+def reference_bmi_interpretation(bmi):
+    if bmi < 18.5:
+        return "Underweight"
+    elif 18.5 <= bmi <= 24.9:
+        return "Normal weight"
+    elif 25 <= bmi <= 29.9:
+        return "Overweight"
+    elif 30 <= bmi <= 34.9:
+        return "Obesity class I"
+    elif 35 <= bmi <= 39.9:
+        return "Obesity class II"
+    elif bmi <= 40:
+        return "Obesity class III"
+    else:
+        return "Error"
+
+
+def reference_choice_total(values):
+    choices_values = {"6": 6, "5": 5, "4": 4, "3": 3, "2": 2, "1": 1}
+    return sum(choices_values.get(value, 0) for value in values)
+
+
+def reference_pressure_risk(total_points):
+    if total_points in [19, 20]:
+        return "Low Risk"
+    elif 14 <= total_points <= 18:
+        return "Medium Risk"
+    elif 10 <= total_points <= 13:
+        return "High Risk"
+    elif total_points < 10:
+        return "Very High Risk"
+    else:
+        return "Error"
+
+
+def reference_pain_interpretation(pain_level):
+    if int(pain_level) == 0:
+        return "No Pain"
+    elif int(pain_level) in [1, 2, 3]:
+        return "Mild Pain"
+    elif int(pain_level) in [4, 5, 6]:
+        return "Moderate Pain"
+    elif int(pain_level) > 6:
+        return "Severe Pain"
+    else:
+        return "Error"
+
+
+def options(choices):
+    return [value for value, _ in choices]
+
+
+class ScoringEquivalenceTest(SimpleTestCase):
+    # Every combination of options, and a dense sweep of measurements,
+    # must score exactly as the replaced implementations did.
+
+    def test_glasgow_every_combination(self):
+        fields = ("eye_response", "verbal_response", "motor_response")
+        combinations = list(
+            itertools.product(
+                options(EYE_RESPONSE_CHOICES),
+                options(VERBAL_RESPONSE_CHOICES),
+                options(MOTOR_RESPONSE_CHOICES),
+            )
+        )
+        for combination in combinations:
+            scale = GlasgowComaScale(**dict(zip(fields, combination)))
+            self.assertEqual(
+                scale.calculate_total_points(), reference_choice_total(combination)
+            )
+        totals, interpretations = scoring.score_batch(
+            "glasgow", dict(zip(fields, zip(*combinations)))
+        )
+        self.assertEqual(
+            totals.tolist(), [reference_choice_total(c) for c in combinations]
+        )
+        self.assertIsNone(interpretations)
+
+    def test_norton_every_combination(self):
+        fields = (
+            "physical_condition",
+            "mental_condition",
+            "activity",
+            "mobility",
+            "incontinence",
+        )
+        combinations = list(
+            itertools.product(
+                options(PHYSICAL_CHOICES),
+                options(MENTAL_CHOICES),
+                options(ACTIVITY_CHOICES),
+                options(MOBILITY_CHOICES),
+                options(INCONTINENCE_CHOICES),
+            )
+        )
+        expected = []
+        for combination in combinations:
+            total = reference_choice_total(combination)
+            expected.append(reference_pressure_risk(total))
+            scale = NortonScale(**dict(zip(fields, combination)))
+            scale.total_points = scale.calculate_total_points()
+            self.assertEqual(scale.total_points, total)
+            self.assertEqual(scale.calculate_risk(), expected[-1])
+        _, risks = scoring.score_batch("norton", dict(zip(fields, zip(*combinations))))
+        self.assertEqual(risks.tolist(), expected)
+
+    def test_pressure_risk_outside_the_choices(self):
+        for total in range(-5, 30):
+            self.assertEqual(
+                scoring.get_scale("norton").interpret(total),
+                reference_pressure_risk(total),
+            )
+
+    def test_pain_every_level(self):
+        for level in options(PAIN_CHOICES) + ["-1", "11"]:
+            self.assertEqual(
+                PainScale(pain_level=level).calculate_pain_intepretation(),
+                reference_pain_interpretation(level),
+            )
+        _, interpretations = scoring.score_batch(
+            "pain", {"pain_level": options(PAIN_CHOICES)}
+        )
+        self.assertEqual(
+            interpretations.tolist(),
+            [reference_pain_interpretation(level) for level in options(PAIN_CHOICES)],
+        )
+
+    def test_bmi_every_recorded_value(self):
+        # BMI is stored with one decimal. save() interprets the float from calculate_bmi().
+        # A Decimal loaded from the database now gets the same category; the replaced
+        # comparisons against float bounds put 24.9, 29.9, 34.9 and 39.9 in class III.
+        for tenths in range(0, 1000):
+            bmi = tenths / 10
+            expected = reference_bmi_interpretation(bmi)
+            self.assertEqual(BodyMassIndex(bmi=bmi).interpretation(), expected)
+            self.assertEqual(
+                BodyMassIndex(bmi=Decimal(tenths) / 10).interpretation(), expected
+            )
+        values = np.arange(0, 1000) / 10
+        self.assertEqual(
+            scoring.get_scale("bmi").interpret_batch(values).tolist(),
+            [reference_bmi_interpretation(bmi) for bmi in values.tolist()],
+        )
+
+    def test_bmi_batch_matches_scalar(self):
+        rng = np.random.default_rng(3)
+        heights = rng.integers(100, 221, 5000)
+        weights = rng.integers(20, 251, 5000)
+        totals, interpretations = scoring.score_batch(
+            "bmi", {"body_height": heights, "body_weight": weights}
+        )
+        for height, weight, bmi, interpretation in zip(
+            heights.tolist(), weights.tolist(), totals.tolist(), interpretations
+        ):
+            scale = BodyMassIndex(body_height=height, body_weight=weight)
+            self.assertEqual(scale.calculate_bmi(), bmi)
+            scale.bmi = bmi
+            self.assertEqual(scale.interpretation(), interpretation)
+
+
+class ThresholdsTest(SimpleTestCase):
+    def test_bounds_are_inclusive(self):
+        thresholds = scoring.Thresholds(
+            ((1.5, "low"), (3, "mid")), above="high", scale=10
+        )
+        self.assertEqual(
+            [thresholds(value) for value in (1.4, 1.5, 1.6, 3.0, 3.1)],
+            ["low", "low", "mid", "mid", "high"],
+        )
+        self.assertEqual(
+            thresholds.batch([1.4, 1.5, 1.6, 3.0, 3.1]).tolist(),
+            ["low", "low", "mid", "mid", "high"],
+        )
+
+    def test_registry(self):
+        self.assertEqual(
+            set(scoring.SCALES), {"bmi", "glasgow", "norton", "pain", "news"}
+        )